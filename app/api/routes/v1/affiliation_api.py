@@ -6,7 +6,7 @@ from flask import Blueprint, request, Response, Request
 from services.v1.affiliation_api import affiliation_api_service
 from services.work import work_service
 from utils.encoder import JsonEncoder
-from schemas.general import QueryBase
+from schemas.work import WorkQueryParams
 
 router = Blueprint("affiliation_api_v1", __name__)
 
@@ -28,10 +28,12 @@ def affiliation(
             if plot:
                 result = None
             else:
-                params = QueryBase(**request.args)
+                params = WorkQueryParams(**request.args)
                 result = work_service.get_research_products_info_by_affiliation_csv(
                     affiliation_id=idx,
                     affiliation_type=typ,
+                    start_year=params.start_year,
+                    end_year=params.end_year,
                     skip=params.skip,
                     limit=params.max,
                     sort=params.sort,
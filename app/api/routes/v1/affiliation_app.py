@@ -5,15 +5,88 @@ import csv
 
 from flask import Blueprint, request, Response, Request
 
+from core.budget import budget_for, run_with_budget
+from core.swr import run_cached
 from services.v1.affiliation_app import affiliation_app_service
 from services.work import work_service
 from schemas.work import WorkQueryParams
 from utils.encoder import JsonEncoder
 from utils.flatten_json import flatten_json_list
+from utils.years import parse_year
 
 router = Blueprint("affiliation_app_v1", __name__)
 
 
+def products_plot(
+    request: Request,
+    plot: str,
+    idx: str | None,
+    aff_type: str | None,
+    start_year: str | None = None,
+    end_year: str | None = None,
+) -> dict[str, Any] | None:
+    level = int(request.args.get("level", 0))
+    typ = plot.split(",")[-1] if "," in plot else aff_type
+    args = (
+        (idx, level, typ, aff_type)
+        if plot == "products_subject"
+        else (idx, typ, aff_type)
+    )
+    func = affiliation_app_service.plot_mappings[plot]
+    kwargs = {"k": request.args.get("k")} if plot == "collaboration_network" else {}
+    if getattr(func, "year_range", False):
+        kwargs = {"start_year": start_year, "end_year": end_year}
+    return run_cached(
+        ("affiliation", plot, *args, *kwargs.values()),
+        func,
+        *args,
+        budget_ms=budget_for(plot),
+        **kwargs,
+    )
+
+
+def products_plots(
+    request: Request,
+    plots: list[str],
+    idx: str | None,
+    aff_type: str | None,
+    start_year: str | None = None,
+    end_year: str | None = None,
+) -> dict[str, Any]:
+    """
+    Several plots in one response: the ones computed from the affiliation
+    works share a single fetch, the others are run one by one.
+    """
+    shared = [
+        plot
+        for plot in plots
+        if plot in affiliation_app_service.plot_mappings
+        and not (
+            (start_year or end_year)
+            and getattr(
+                affiliation_app_service.plot_mappings[plot], "year_range", False
+            )
+        )
+    ]
+    result = run_cached(
+        ("affiliation", "plots", idx, aff_type, *shared),
+        affiliation_app_service.get_plots,
+        idx,
+        shared,
+        aff_type,
+        aff_type,
+        budget_ms=budget_for("plots"),
+        fallback={},
+    )
+    result = {plot: result[plot] for plot in plots if plot in result}
+    for plot in plots:
+        if plot not in result and plot in affiliation_app_service.plot_mappings:
+            result[plot] = products_plot(
+                request, plot, idx, aff_type, start_year, end_year
+            )
+    return result
+
+
 def affiliation(
     request: Request,
     *,
@@ -23,25 +96,45 @@ def affiliation(
     tab: str | None = None,
 ) -> dict[str, Any] | None:
     result = None
+    start_year = request.args.get("start_year")
+    end_year = request.args.get("end_year")
     if section == "info":
-        result = affiliation_app_service.get_info(idx, aff_type)
+        result = run_cached(
+            ("affiliation", section, idx, aff_type, start_year, end_year),
+            affiliation_app_service.get_info,
+            idx,
+            aff_type,
+            start_year,
+            end_year,
+            budget_ms=budget_for(section),
+            fallback=None,
+        )
     elif section == "affiliations":
-        result = affiliation_app_service.get_affiliations(idx, typ=aff_type)
+        result = run_cached(
+            ("affiliation", section, idx, aff_type),
+            affiliation_app_service.get_affiliations,
+            idx,
+            typ=aff_type,
+            budget_ms=budget_for(section),
+            fallback=None,
+        )
     elif section == "research":
         if tab == "products":
             plot = request.args.get("plot")
-            if plot:
-                level = int(request.args.get("level", 0))
-                typ = plot.split(",")[-1] if "," in plot else aff_type
-                args = (
-                    (idx, level, typ, aff_type)
-                    if plot == "products_subject"
-                    else (idx, typ, aff_type)
+            plots = request.args.getlist("plots")
+            if plots:
+                result = products_plots(
+                    request, plots, idx, aff_type, start_year, end_year
+                )
+            elif plot:
+                result = products_plot(
+                    request, plot, idx, aff_type, start_year, end_year
                 )
-                result = affiliation_app_service.plot_mappings[plot](*args)
             else:
                 params = WorkQueryParams(**request.args)
-                result = work_service.get_research_products_by_affiliation(
+                result = run_with_budget(
+                    ("affiliation", tab, idx, aff_type, *params.model_dump().items()),
+                    work_service.get_research_products_by_affiliation,
                     affiliation_id=idx,
                     affiliation_type=aff_type,
                     start_year=params.start_year,
@@ -49,6 +142,8 @@ def affiliation(
                     skip=params.skip,
                     limit=params.max,
                     sort=params.sort,
+                    budget_ms=budget_for(tab),
+                    fallback={"data": [], "count": 0, "partial": True},
                 )
     else:
         result = None
@@ -91,7 +186,10 @@ def get_affiliation_csv(
     tab: str | None = None,
 ):
     result = work_service.get_research_products_info_by_affiliation_csv(
-        affiliation_id=id, affiliation_type=typ
+        affiliation_id=id,
+        affiliation_type=typ,
+        start_year=parse_year(request.args.get("start_year")),
+        end_year=parse_year(request.args.get("end_year")),
     )
     if result:
         config = {
@@ -4,6 +4,8 @@ import csv
 
 from flask import Blueprint, request, Response, Request
 
+from core.budget import budget_for, run_with_budget
+from core.swr import run_cached
 from services.v1.person_app import person_app_service
 from services.work import work_service
 from schemas.work import WorkQueryParams
@@ -13,6 +15,63 @@ from utils.flatten_json import flatten_json_list
 router = Blueprint("person_app_v1", __name__)
 
 
+def products_plot(
+    request: Request,
+    plot: str,
+    id: str | None,
+    start_year: str | None = None,
+    end_year: str | None = None,
+):
+    level = request.args.get("level", 0)
+    args = (id, level) if plot == "products_subject" else (id,)
+    func = person_app_service.plot_mapping[plot]
+    kwargs = {"k": request.args.get("k")} if plot == "collaboration_network" else {}
+    if getattr(func, "year_range", False):
+        kwargs = {"start_year": start_year, "end_year": end_year}
+    return run_cached(
+        ("person", plot, *args, *kwargs.values()),
+        func,
+        *args,
+        budget_ms=budget_for(plot),
+        **kwargs,
+    )
+
+
+def products_plots(
+    request: Request,
+    plots: list[str],
+    id: str | None,
+    start_year: str | None = None,
+    end_year: str | None = None,
+):
+    """
+    Several plots in one response: the ones computed from the author works
+    share a single fetch, the others are run one by one.
+    """
+    shared = [
+        plot
+        for plot in plots
+        if plot in person_app_service.plot_mapping
+        and not (
+            (start_year or end_year)
+            and getattr(person_app_service.plot_mapping[plot], "year_range", False)
+        )
+    ]
+    result = run_cached(
+        ("person", "plots", id, *shared),
+        person_app_service.get_plots,
+        id,
+        shared,
+        budget_ms=budget_for("plots"),
+        fallback={},
+    )
+    result = {plot: result[plot] for plot in plots if plot in result}
+    for plot in plots:
+        if plot not in result and plot in person_app_service.plot_mapping:
+            result[plot] = products_plot(request, plot, id, start_year, end_year)
+    return result
+
+
 def person(
     request: Request, id: str | None, section: str | None = None, tab: str | None = None
 ):
@@ -20,20 +79,38 @@ def person(
     typ = request.args.get("typ", None)
 
     result = None
+    start_year = request.args.get("start_year")
+    end_year = request.args.get("end_year")
 
     if section == "info":
-        result = person_app_service.get_info(id)
+        result = run_cached(
+            ("person", section, id, start_year, end_year),
+            person_app_service.get_info,
+            id,
+            start_year,
+            end_year,
+            budget_ms=budget_for(section),
+            fallback=None,
+        )
     elif section == "research":
         if tab == "products":
             plot = request.args.get("plot")
-            if plot:
-                level = request.args.get("level", 0)
-                args = (id, level) if plot == "products_subject" else (id,)
-                result = person_app_service.plot_mapping[plot](*args)
+            plots = request.args.getlist("plots")
+            if plots:
+                result = products_plots(request, plots, id, start_year, end_year)
+            elif plot:
+                result = products_plot(request, plot, id, start_year, end_year)
             else:
                 params = WorkQueryParams(**request.args)
-                result = work_service.get_research_products_by_author(
-                    author_id=id, skip=params.skip, limit=params.max, sort=params.sort
+                result = run_with_budget(
+                    ("person", tab, id, *params.model_dump().items()),
+                    work_service.get_research_products_by_author,
+                    author_id=id,
+                    skip=params.skip,
+                    limit=params.max,
+                    sort=params.sort,
+                    budget_ms=budget_for(tab),
+                    fallback={"data": [], "count": 0, "partial": True},
                 )
     else:
         result = None
@@ -0,0 +1,97 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import monotonic
+from typing import Any, Callable, Hashable, Iterator
+
+from pymongo.errors import ExecutionTimeout
+
+from core.cache import LRUCache
+from core.config import settings
+from core.exceptions import BudgetExceeded
+from core.logging import get_logger
+
+log = get_logger(__name__)
+
+_deadline: ContextVar[float | None] = ContextVar("query_deadline", default=None)
+
+#: Last successful result of every budgeted call, served when a later call
+#: runs out of time
+last_results = LRUCache(maxsize=settings.QUERY_BUDGET_FALLBACK_SIZE)
+
+PARTIAL_PLOT = {"plot": None, "partial": True}
+
+
+@contextmanager
+def time_budget(budget_ms: int | None) -> Iterator[None]:
+    """
+    Set the deadline every Mongo query issued in this context has to meet.
+
+    Nested budgets never extend the deadline of the enclosing one.
+    """
+    if not budget_ms:
+        yield
+        return
+    deadline = monotonic() + budget_ms / 1000
+    current = _deadline.get()
+    token = _deadline.set(min(deadline, current) if current else deadline)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+@contextmanager
+def without_budget() -> Iterator[None]:
+    """Lift the current deadline, e.g. to build an in-process snapshot."""
+    token = _deadline.set(None)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining_ms() -> int | None:
+    """
+    Milliseconds left before the current deadline, ``None`` when no budget
+    is set. Raises ``BudgetExceeded`` once the deadline has passed.
+    """
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    remaining = int((deadline - monotonic()) * 1000)
+    if remaining <= 0:
+        raise BudgetExceeded()
+    return remaining
+
+
+def budget_for(endpoint: str | None) -> int:
+    return settings.QUERY_BUDGETS_MS.get(endpoint, settings.QUERY_BUDGET_MS)
+
+
+def run_with_budget(
+    key: Hashable,
+    func: Callable[..., Any],
+    *args,
+    budget_ms: int | None = None,
+    fallback: Any = PARTIAL_PLOT,
+    **kwargs,
+) -> Any:
+    """
+    Run ``func`` under a time budget.
+
+    When the budget runs out the last result stored for ``key`` is returned
+    flagged as ``stale``; without one ``fallback`` is returned instead, so a
+    slow entity never keeps the worker busy past its budget.
+    """
+    try:
+        with time_budget(budget_ms):
+            result = func(*args, **kwargs)
+    except (BudgetExceeded, ExecutionTimeout):
+        log.warning(f"time budget of {budget_ms} ms exceeded for {key}")
+        cached = last_results.get(key)
+        if cached is None:
+            return fallback
+        return {**cached, "stale": True} if isinstance(cached, dict) else cached
+    if result is not None:
+        last_results.set(key, result)
+    return result
@@ -32,8 +32,122 @@ class Settings(BaseSettings):
 
     MONGO_URI: Optional[MongoDsn] = None
 
+    #: Interactive profile: lookups, listings and searches
+    MONGO_INTERACTIVE_MAX_POOL_SIZE: int = 100
+    MONGO_INTERACTIVE_TIMEOUT_MS: int = 5000
+    MONGO_INTERACTIVE_SOCKET_TIMEOUT_MS: int = 30000
+    #: Analytics profile: plots and counts over whole entities
+    MONGO_ANALYTICS_MAX_POOL_SIZE: int = 20
+    MONGO_ANALYTICS_TIMEOUT_MS: int = 10000
+    MONGO_ANALYTICS_SOCKET_TIMEOUT_MS: int = 600000
+    MONGO_ANALYTICS_READ_PREFERENCE: str = "secondaryPreferred"
+    MONGO_ANALYTICS_BATCH_SIZE: int = 1000
+    MONGO_ANALYTICS_ALLOW_DISK_USE: bool = True
+
+    #: Default time budget of a request in milliseconds, propagated to every
+    #: query as maxTimeMS
+    QUERY_BUDGET_MS: int = 60000
+    #: Per endpoint budgets, keyed by section or plot name
+    QUERY_BUDGETS_MS: dict[str, int] = {
+        "info": 10000,
+        "affiliations": 10000,
+        "products": 30000,
+    }
+    #: Number of last good results kept to answer requests out of budget
+    QUERY_BUDGET_FALLBACK_SIZE: int = 2048
+
+    #: Default and maximum number of nodes of the coauthorship network plots
+    COAUTHORSHIP_NETWORK_SIZE: int = 50
+    COAUTHORSHIP_NETWORK_MAX_SIZE: int = 500
+
+    #: Coalesce identical in-flight computations across workers too, through
+    #: a lock and a result stored in this impactu collection
+    SINGLEFLIGHT_SHARED: bool = False
+    SINGLEFLIGHT_COLLECTION: str = "singleflight"
+    #: Seconds a shared lock is held before other workers compute on their own,
+    #: seconds a shared result is kept, and poll interval of the waiting workers
+    SINGLEFLIGHT_LOCK_TTL_S: int = 120
+    SINGLEFLIGHT_RESULT_TTL_S: int = 30
+    SINGLEFLIGHT_POLL_MS: int = 100
+    #: Pickled results larger than this are not shared, well below the 16MB
+    #: document limit of MongoDB
+    SINGLEFLIGHT_MAX_RESULT_BYTES: int = 4 * 1024 * 1024
+
+    #: Entity pages (info and plots) cache: an entry is fresh for FRESH_S
+    #: seconds and served stale for STALE_S more while keys read at least
+    #: HOT_HITS times are recomputed in the background, by at most
+    #: REFRESH_WORKERS threads and MAX_PENDING queued refreshes
+    ENTITY_CACHE_ENABLED: bool = True
+    ENTITY_CACHE_SIZE: int = 4096
+    ENTITY_CACHE_FRESH_S: int = 600
+    ENTITY_CACHE_STALE_S: int = 86400
+    ENTITY_CACHE_HOT_HITS: int = 3
+    ENTITY_CACHE_REFRESH_WORKERS: int = 2
+    ENTITY_CACHE_MAX_PENDING: int = 64
+
+    #: Plot keys whose chart is computed in a process pool of CHART_PROCESS_WORKERS
+    #: processes per server worker, e.g. the CPU heavy "collaboration_worldmap",
+    #: "collaboration_colombiamap", "year_h" and "year_apc". A chart outliving
+    #: the budget of its request holds its process until it ends, and no chart
+    #: is accepted while all of them are held
+    CHART_PROCESS_PLOTS: list[str] = []
+    CHART_PROCESS_WORKERS: int = 2
+
+    #: Author summaries (products, citations and years) kept in memory and
+    #: their time to live in seconds
+    AUTHOR_SUMMARY_CACHE_SIZE: int = 4096
+    AUTHOR_SUMMARY_CACHE_TTL: int = 3600
+
+    #: Per level subject counts of the entities kept in memory and their time
+    #: to live in seconds
+    SUBJECT_COUNTS_CACHE_SIZE: int = 1024
+    SUBJECT_COUNTS_CACHE_TTL: int = 3600
+
+    #: Read group, department and faculty works through the indexed
+    #: affiliation_closure field written by the affiliation_closure job
+    #: instead of going through their authors
+    USE_AFFILIATION_CLOSURE: bool = False
+
+    #: Sort product listings on the scalar sort_keys written by the sort_keys
+    #: job, so they stream from its compound indexes instead of a blocking sort
+    USE_SORT_KEYS: bool = False
+
+    #: Seconds between reloads of the in-memory affiliation hierarchy
+    AFFILIATION_HIERARCHY_REFRESH_S: int = 3600
+
+    #: Seconds between reloads of the in-memory lookup tables (scimago
+    #: quartiles of every source, ...)
+    LOOKUP_REFRESH_S: int = 21600
+
+    #: Answer the plots it covers from the in-memory work fact table, rebuilt
+    #: from Mongo every FACT_TABLE_REFRESH_S seconds
+    USE_FACT_TABLE: bool = False
+    FACT_TABLE_REFRESH_S: int = 21600
+
+    #: impactu collection holding the per year aggregates of every entity
+    YEARLY_STATS_COLLECTION: str = "yearly_stats"
+
     APP_PORT: str | int = 8010
 
+    #: Production server worker model: "sync" and "gthread" prefork processes,
+    #: "gevent" runs green threads inside each process
+    SERVER_WORKER_CLASS: str = "gthread"
+    #: Number of preforked worker processes
+    SERVER_WORKERS: int = 4
+    #: Threads per worker (gthread only)
+    SERVER_THREADS: int = 4
+    #: Simultaneous green threads per worker (gevent only)
+    SERVER_WORKER_CONNECTIONS: int = 1000
+    #: Seconds a worker may stay silent before it is killed and restarted
+    SERVER_TIMEOUT: int = 120
+    SERVER_GRACEFUL_TIMEOUT: int = 30
+    SERVER_KEEPALIVE: int = 5
+    #: Recycle a worker after this many requests (0 disables it)
+    SERVER_MAX_REQUESTS: int = 0
+    SERVER_MAX_REQUESTS_JITTER: int = 0
+    #: Import the app and load the static assets before forking the workers
+    SERVER_PRELOAD: bool = True
+
     @validator("MONGO_URI", pre=True)
     def validate_mongo_uri(cls, v: Optional[str], values: Dict[str, Any]) -> str:
         return MongoDsn.build(
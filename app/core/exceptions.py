@@ -20,3 +20,9 @@ class InvalidCredentials(Exception):
 
     def __init__(self, msg: str | None) -> None:
         self.msg = msg
+
+
+class BudgetExceeded(Exception):
+    """
+    Exception when the request time budget runs out before a query is issued
+    """
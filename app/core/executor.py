@@ -0,0 +1,93 @@
+from collections.abc import Iterator
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from multiprocessing import get_context
+from threading import Lock
+from types import MethodType
+from typing import Any, Callable
+
+from core.budget import remaining_ms
+from core.config import settings
+from core.exceptions import BudgetExceeded
+
+#: Chart builders of a pool process, built once as ``maps`` loads the geojson
+_instances: dict[type, Any] = {}
+
+
+def _call_method(cls: type, name: str, *args) -> Any:
+    instance = _instances.get(cls)
+    if instance is None:
+        instance = _instances[cls] = cls()
+    return getattr(instance, name)(*args)
+
+
+class ChartExecutor:
+    """
+    Runs the ``bars``/``pies``/``maps`` computation of a plot.
+
+    Plots listed in ``CHART_PROCESS_PLOTS`` run in a pool of
+    ``CHART_PROCESS_WORKERS`` processes, so their pure Python loops do not
+    hold the GIL of the request threads; the others run inline. Cursors and
+    generators handed to a pooled chart are read into lists first, so the
+    caller projects the works down to the fields the chart reads, and a
+    ``bars``/``pies``/``maps`` method is sent as its class and name, never
+    with the assets of the instance. The pool is started on first use, after
+    the server workers fork.
+
+    A chart still running when its caller runs out of budget can not be
+    stopped: it keeps its process until it ends. While every process is held
+    by one of them, new charts are rejected with ``BudgetExceeded`` instead
+    of queueing behind them.
+    """
+
+    def __init__(self, plots: list[str], workers: int):
+        self.plots = set(plots)
+        self.workers = workers
+        self._pool: Executor | None = None
+        self._lock = Lock()
+        self._overrunning: set[Future] = set()
+
+    @property
+    def pool(self) -> Executor:
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ProcessPoolExecutor(
+                        max_workers=self.workers, mp_context=get_context("spawn")
+                    )
+        return self._pool
+
+    def run(self, plot: str, func: Callable[..., Any], *args) -> Any:
+        if plot not in self.plots:
+            return func(*args)
+        if len(self._overrunning) >= self.workers:
+            raise BudgetExceeded()
+        args = tuple(list(arg) if isinstance(arg, Iterator) else arg for arg in args)
+        if isinstance(func, MethodType):
+            future = self.pool.submit(
+                _call_method, type(func.__self__), func.__name__, *args
+            )
+        else:
+            future = self.pool.submit(func, *args)
+        timeout = remaining_ms()
+        try:
+            return future.result(None if timeout is None else timeout / 1000)
+        except FutureTimeoutError:
+            if not future.cancel():
+                with self._lock:
+                    self._overrunning.add(future)
+                future.add_done_callback(self._finished)
+            raise BudgetExceeded()
+
+    def _finished(self, future: Future) -> None:
+        with self._lock:
+            self._overrunning.discard(future)
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+            self._overrunning.clear()
+
+
+charts = ChartExecutor(settings.CHART_PROCESS_PLOTS, settings.CHART_PROCESS_WORKERS)
@@ -0,0 +1,180 @@
+import pickle
+from datetime import datetime, timedelta, timezone
+from functools import wraps
+from hashlib import sha1
+from threading import Event, Lock
+from time import monotonic, sleep
+from typing import Any, Callable, Hashable
+
+from bson import Binary
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+from core.budget import remaining_ms
+from core.config import settings
+from core.exceptions import BudgetExceeded
+from core.logging import get_logger
+from infraestructure.mongo.utils.session import get_database
+
+log = get_logger(__name__)
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = Event()
+        self.result: Any = None
+        self.error: BaseException | None = None
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent identical calls: the first caller of a key runs the
+    computation and every caller arriving while it is in flight waits for it
+    and gets the same result (or exception).
+
+    With ``SINGLEFLIGHT_SHARED`` the leader also takes a lock in the
+    ``SINGLEFLIGHT_COLLECTION`` of the impactu database and stores its result
+    there, so the workers of other processes wait for it instead of running
+    the same aggregation. Followers never wait past their own time budget.
+    """
+
+    def __init__(self):
+        self._calls: dict[Hashable, _Call] = {}
+        self._lock = Lock()
+        self._indexed = False
+
+    def do(self, key: Hashable, func: Callable[..., Any], *args, **kwargs) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            return self._wait(call)
+        try:
+            if settings.SINGLEFLIGHT_SHARED:
+                call.result = self._do_shared(key, func, *args, **kwargs)
+            else:
+                call.result = func(*args, **kwargs)
+            return call.result
+        except BaseException as error:
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    @staticmethod
+    def _wait(call: _Call) -> Any:
+        timeout = remaining_ms()
+        if not call.done.wait(None if timeout is None else timeout / 1000):
+            raise BudgetExceeded()
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def _collection(self):
+        collection = get_database(settings.MONGO_IMPACTU_DB)[
+            settings.SINGLEFLIGHT_COLLECTION
+        ]
+        if not self._indexed:
+            collection.create_index("expires_at", expireAfterSeconds=0)
+            self._indexed = True
+        return collection
+
+    def _do_shared(self, key: Hashable, func: Callable[..., Any], *args, **kwargs):
+        collection = self._collection()
+        _id = sha1(repr(key).encode()).hexdigest()
+        deadline = monotonic() + settings.SINGLEFLIGHT_LOCK_TTL_S
+        while True:
+            now = datetime.now(timezone.utc)
+            try:
+                collection.insert_one(
+                    {
+                        "_id": _id,
+                        "expires_at": now
+                        + timedelta(seconds=settings.SINGLEFLIGHT_LOCK_TTL_S),
+                    }
+                )
+                break
+            except DuplicateKeyError:
+                pass
+            flight = collection.find_one({"_id": _id})
+            if flight is None:
+                continue
+            if "result" in flight:
+                return pickle.loads(flight["result"])
+            if flight["expires_at"].replace(tzinfo=timezone.utc) < now:
+                # the leader died holding the lock
+                collection.delete_one({"_id": _id, "expires_at": flight["expires_at"]})
+                continue
+            if monotonic() > deadline:
+                log.warning(f"gave up waiting for the shared flight of {key}")
+                return func(*args, **kwargs)
+            remaining_ms()  # raises once the budget of this caller is spent
+            sleep(settings.SINGLEFLIGHT_POLL_MS / 1000)
+
+        try:
+            result = func(*args, **kwargs)
+        except BaseException:
+            self._release(collection, _id)
+            raise
+        try:
+            payload = pickle.dumps(result)
+            if len(payload) > settings.SINGLEFLIGHT_MAX_RESULT_BYTES:
+                # too large to share: the waiting workers compute their own
+                self._release(collection, _id)
+                return result
+            collection.update_one(
+                {"_id": _id},
+                {
+                    "$set": {
+                        "result": Binary(payload),
+                        "expires_at": datetime.now(timezone.utc)
+                        + timedelta(seconds=settings.SINGLEFLIGHT_RESULT_TTL_S),
+                    }
+                },
+            )
+        except Exception as error:
+            log.warning(f"could not share the result of {key}: {error}")
+            self._release(collection, _id)
+        return result
+
+    @staticmethod
+    def _release(collection, _id: str) -> None:
+        """Drop a shared lock; left to its TTL when the database fails."""
+        try:
+            collection.delete_one({"_id": _id})
+        except PyMongoError as error:
+            log.warning(f"could not release the shared flight {_id}: {error}")
+
+    def wrap(self, func: Callable[..., Any], *, skip_first: bool = False) -> Callable:
+        """
+        ``func`` coalesced on its qualified name and arguments. With
+        ``skip_first`` the first argument (``self`` or ``cls`` of a singleton)
+        is left out of the key.
+        """
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            key = repr(
+                (
+                    func.__module__,
+                    func.__qualname__,
+                    args[1:] if skip_first else args,
+                    sorted(kwargs.items()),
+                )
+            )
+            return self.do(key, func, *args, **kwargs)
+
+        return wrapper
+
+
+single_flight = SingleFlight()
+
+
+def coalesced(method: Callable) -> Callable:
+    """Coalesce concurrent identical calls of a service or repository method."""
+    return single_flight.wrap(method, skip_first=True)
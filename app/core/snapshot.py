@@ -0,0 +1,70 @@
+from threading import Lock, Thread
+from time import monotonic, perf_counter
+from typing import Callable, Generic, TypeVar
+
+from core.budget import without_budget
+from core.logging import get_logger
+
+log = get_logger(__name__)
+
+T = TypeVar("T")
+
+
+class PeriodicSnapshot(Generic[T]):
+    """
+    In-process value built by ``loader`` and rebuilt in a background thread
+    every ``refresh_s`` seconds; readers keep the previous value meanwhile.
+
+    With ``wait_first`` the first ``get`` builds the value in the calling
+    thread, otherwise it returns ``None`` until the first background build
+    is done. Loading is never bound by the time budget of the request that
+    triggers it.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        loader: Callable[[], T],
+        refresh_s: float,
+        *,
+        wait_first: bool = True,
+    ):
+        self.name = name
+        self.loader = loader
+        self.refresh_s = refresh_s
+        self.wait_first = wait_first
+        self._value: T | None = None
+        self._loaded_at = 0.0
+        self._lock = Lock()
+        self._loading = False
+
+    def refresh(self) -> T:
+        start = perf_counter()
+        try:
+            with without_budget():
+                value = self.loader()
+            self._value, self._loaded_at = value, monotonic()
+        finally:
+            self._loading = False
+        log.info(f"{self.name} loaded in {perf_counter() - start:.1f}s")
+        return value
+
+    def _background_refresh(self) -> None:
+        try:
+            self.refresh()
+        except Exception:
+            log.exception(f"could not refresh {self.name}")
+
+    def get(self) -> T | None:
+        if self._value is None and self.wait_first:
+            with self._lock:
+                if self._value is None:
+                    self._loading = True
+                    self.refresh()
+        elif self._value is None or monotonic() - self._loaded_at > self.refresh_s:
+            with self._lock:
+                if self._loading:
+                    return self._value
+                self._loading = True
+            Thread(target=self._background_refresh, daemon=True).start()
+        return self._value
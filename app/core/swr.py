@@ -0,0 +1,155 @@
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from time import monotonic
+from typing import Any, Callable, Hashable
+
+from core.budget import PARTIAL_PLOT, run_with_budget
+from core.cache import LRUCache
+from core.config import settings
+from core.logging import get_logger
+
+log = get_logger(__name__)
+
+
+class FrequencyCounter:
+    """
+    Approximate recent access counts: every count is halved once
+    ``sample_size`` accesses have been recorded, so keys that stop being
+    read fade out.
+    """
+
+    def __init__(self, sample_size: int):
+        self.sample_size = sample_size
+        self._counts: dict[Hashable, int] = {}
+        self._accesses = 0
+        self._lock = Lock()
+
+    def add(self, key: Hashable) -> int:
+        with self._lock:
+            count = self._counts[key] = self._counts.get(key, 0) + 1
+            self._accesses += 1
+            if self._accesses >= self.sample_size:
+                self._counts = {
+                    k: c // 2 for k, c in self._counts.items() if c // 2
+                }
+                self._accesses = 0
+            return count
+
+    def get(self, key: Hashable) -> int:
+        return self._counts.get(key, 0)
+
+    def most_common(self, n: int) -> list[tuple[Hashable, int]]:
+        with self._lock:
+            items = list(self._counts.items())
+        return sorted(items, key=lambda item: item[1], reverse=True)[:n]
+
+
+class StaleWhileRevalidate:
+    """
+    Result cache serving expired entries while they are recomputed.
+
+    An entry is fresh for ``fresh_s`` seconds and can be served stale for
+    ``stale_s`` more. A stale hit on a hot key (read at least ``hot_hits``
+    times recently) returns the stale value at once and schedules the
+    recomputation on a pool of ``workers`` threads, with at most
+    ``max_pending`` refreshes queued so the refreshes can not overload
+    Mongo; cold keys are recomputed by the caller.
+    """
+
+    def __init__(
+        self,
+        *,
+        maxsize: int,
+        fresh_s: float,
+        stale_s: float,
+        workers: int,
+        max_pending: int,
+        hot_hits: int,
+    ):
+        self.fresh_s = fresh_s
+        self.hot_hits = hot_hits
+        self.max_pending = max_pending
+        self.entries = LRUCache(maxsize=maxsize, ttl=fresh_s + stale_s)
+        self.frequency = FrequencyCounter(sample_size=maxsize * 10)
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="swr")
+        self._pending: set[Hashable] = set()
+        self._lock = Lock()
+
+    @staticmethod
+    def cacheable(value: Any) -> bool:
+        if value is None:
+            return False
+        return not (
+            isinstance(value, dict) and (value.get("partial") or value.get("stale"))
+        )
+
+    def _compute(self, key: Hashable, func: Callable[..., Any], *args, **kwargs):
+        value = func(*args, **kwargs)
+        if self.cacheable(value):
+            self.entries.set(key, (monotonic(), value))
+        return value
+
+    def _refresh(self, key: Hashable, func: Callable[..., Any], *args, **kwargs):
+        try:
+            self._compute(key, func, *args, **kwargs)
+        except Exception:
+            log.exception(f"could not refresh {key}")
+        finally:
+            with self._lock:
+                self._pending.discard(key)
+
+    def schedule(self, key: Hashable, func: Callable[..., Any], *args, **kwargs) -> bool:
+        """Queue a background recomputation of ``key`` unless the pool is full."""
+        with self._lock:
+            if key in self._pending or len(self._pending) >= self.max_pending:
+                return False
+            self._pending.add(key)
+        self._pool.submit(self._refresh, key, func, *args, **kwargs)
+        return True
+
+    def get(self, key: Hashable, func: Callable[..., Any], *args, **kwargs) -> Any:
+        hits = self.frequency.add(key)
+        entry = self.entries.get(key)
+        if entry is not None:
+            computed_at, value = entry
+            if monotonic() - computed_at <= self.fresh_s:
+                return value
+            if hits >= self.hot_hits:
+                self.schedule(key, func, *args, **kwargs)
+                return value
+        return self._compute(key, func, *args, **kwargs)
+
+
+entity_pages = StaleWhileRevalidate(
+    maxsize=settings.ENTITY_CACHE_SIZE,
+    fresh_s=settings.ENTITY_CACHE_FRESH_S,
+    stale_s=settings.ENTITY_CACHE_STALE_S,
+    workers=settings.ENTITY_CACHE_REFRESH_WORKERS,
+    max_pending=settings.ENTITY_CACHE_MAX_PENDING,
+    hot_hits=settings.ENTITY_CACHE_HOT_HITS,
+)
+
+
+def run_cached(
+    key: Hashable,
+    func: Callable[..., Any],
+    *args,
+    budget_ms: int | None = None,
+    fallback: Any = PARTIAL_PLOT,
+    **kwargs,
+) -> Any:
+    """``run_with_budget`` behind the stale-while-revalidate entity cache."""
+    if not settings.ENTITY_CACHE_ENABLED:
+        return run_with_budget(
+            key, func, *args, budget_ms=budget_ms, fallback=fallback, **kwargs
+        )
+    return entity_pages.get(
+        key,
+        run_with_budget,
+        key,
+        func,
+        *args,
+        budget_ms=budget_ms,
+        fallback=fallback,
+        **kwargs,
+    )
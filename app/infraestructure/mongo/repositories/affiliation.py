@@ -3,10 +3,11 @@ from typing import Any
 from bson import ObjectId
 
 from infraestructure.mongo.repositories.base import RepositoryBase
+from infraestructure.mongo.repositories.hierarchy import affiliation_hierarchy
 from infraestructure.mongo.repositories.work import WorkRepository
 from infraestructure.mongo.models.affiliation import Affiliation
 from infraestructure.mongo.models.person import Person
-from infraestructure.mongo.utils.session import engine
+from infraestructure.mongo.utils.session import get_collection
 from schemas.affiliation import AffiliationRelated
 from schemas.person import PersonList
 
@@ -15,53 +16,13 @@ class AffiliationRepository(RepositoryBase):
     def get_affiliations_related_type(
         self, idx: str, relation_type: str, affiliation_type: str
     ) -> list[AffiliationRelated]:
-        if affiliation_type in ["department", "faculty"] and relation_type == "group":
-            group_pipeline = [
-                {"$match": {"affiliations.id": ObjectId(idx)}},
-                {"$project": {"affiliations": 1}},
-                {"$unwind": "$affiliations"},
-                {"$match": {"affiliations.types.type": "group"}},
-                {"$project": {"aff_id": "$affiliations.id"}},
-                {
-                    "$lookup": {
-                        "from": "affiliations",
-                        "localField": "aff_id",
-                        "foreignField": "_id",
-                        "as": "affiliation",
-                    }
-                },
-                {"$unwind": "$affiliation"},
-                {
-                    "$group": {
-                        "_id": "$aff_id",
-                        "affiliation": {"$addToSet": "$affiliation"},
-                    }
-                },
-                {"$unwind": "$affiliation"},
-                {"$project": {"_id": 0, "affiliation": 1}},
-                {"$replaceRoot": {"newRoot": "$affiliation"}},
-            ]
-            groups = engine.get_collection(Person).aggregate(group_pipeline)
-            return [
-                AffiliationRelated.model_validate_json(
-                    Affiliation(**group).model_dump_json(exclude={"id"})[:-1]
-                    + ', "id":"'
-                    + str(group.get("_id", "None"))
-                    + '"}'
-                )
-                for group in groups
-            ]
-        results = engine.get_collection(Affiliation).find(
-            {"relations.id": ObjectId(idx), "types.type": relation_type}
-        )
         return [
-            AffiliationRelated.model_validate_json(
-                Affiliation(**result).model_dump_json(exclude={"id"})[:-1]
-                + ', "id":"'
-                + str(result.get("_id", "None"))
-                + '"}'
+            AffiliationRelated.model_validate(
+                {"id": str(node.id), "names": node.names, "types": node.types}
+            )
+            for node in affiliation_hierarchy.related(
+                idx, relation_type, affiliation_type
             )
-            for result in results
         ]
 
     def get_authors_by_affiliation(self, idx: str, typ: str) -> list[Person]:
@@ -69,7 +30,7 @@ class AffiliationRepository(RepositoryBase):
             {"$match": {"affiliations.id": ObjectId(idx)}},
             {"$project": {"full_name": 1}},
         ]
-        authors = engine.get_collection(Person).aggregate(pipeline)
+        authors = get_collection(Person).aggregate(pipeline)
         return [
             PersonList(id=str(author["_id"]), full_name=author["full_name"])
             for author in authors
@@ -90,24 +51,10 @@ class AffiliationRepository(RepositoryBase):
         )
         affiliations_result = []
         for affiliation in affiliations:
-            id = (
-                affiliation["id"]
-                if isinstance(affiliation["id"], ObjectId)
-                else ObjectId(affiliation["id"])
-            )
-            affiliation = engine.get_collection(Affiliation).find_one(
-                {"_id": id}, {"names": 1, "types": 1}
-            )
-            if affiliation:
+            node = affiliation_hierarchy.get(affiliation["id"])
+            if node:
                 affiliations_result.append(
-                    {
-                        "id": str(affiliation["_id"]),
-                        "name": next(
-                            filter(lambda x: x["lang"] == "es", affiliation["names"]),
-                            affiliation["names"][0],
-                        )["name"],
-                        "types": affiliation["types"],
-                    }
+                    {"id": str(node.id), "name": node.name, "types": node.types}
                 )
         return affiliations_result
 
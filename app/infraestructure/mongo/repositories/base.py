@@ -4,7 +4,7 @@ from json import loads
 from odmantic import Model, ObjectId
 from odmantic.query import desc, asc
 
-from infraestructure.mongo.utils.session import engine
+from infraestructure.mongo.utils.session import engine, get_collection
 
 ModelType = TypeVar("ModelType", bound=Model)
 
@@ -54,7 +54,7 @@ class RepositoryBase(Generic[ModelType]):
         #         if sort.endswith("-")
         #         else asc(getattr(self.model, sort))
         #     )
-        session = engine.get_collection(self.model)
+        session = get_collection(self.model)
         results = (
             session.find(filter_criteria, projection)
             .sort(sort_expresion)
@@ -83,7 +83,7 @@ class RepositoryBase(Generic[ModelType]):
 
     @classmethod
     def count_pipeline(cls, pipeline: list[dict[str, Any]], collection: ModelType):
-        collection = engine.get_collection(collection)
+        collection = get_collection(collection)
         aggregation = collection.aggregate(pipeline + [{"$count": "total"}])
         total = next(aggregation, {"total": 0}).get("total", 0)
         return total
@@ -0,0 +1,147 @@
+from itertools import accumulate
+from typing import Any
+
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from core.config import settings
+from infraestructure.mongo.utils.session import ProfiledCollection
+
+
+class CoauthorshipNetworkRepository:
+    """
+    Top-k subgraphs of the ``coauthorship_network`` documents stored in the
+    impactu ``affiliations`` and ``person`` collections.
+
+    ``jobs.coauthorship_network`` stores every network ranked under
+    ``coauthorship_network_ranked``: the nodes by decreasing degree, the
+    edges by the position of their lowest ranked end and ``edge_counts[i]``,
+    the number of edges between the first ``i + 1`` nodes. The top-k
+    subgraph of any ``k`` is then the first ``k`` nodes and the first
+    ``edge_counts[k - 1]`` edges, two slices that only read what is sent.
+    """
+
+    field = "coauthorship_network_ranked"
+
+    @staticmethod
+    def clamp(k: int | str | None) -> int:
+        try:
+            k = int(k)
+        except (TypeError, ValueError):
+            return settings.COAUTHORSHIP_NETWORK_SIZE
+        return max(1, min(k, settings.COAUTHORSHIP_NETWORK_MAX_SIZE))
+
+    @staticmethod
+    def rank(network: dict[str, list] | None) -> dict[str, list]:
+        """``network`` ranked as ``jobs.coauthorship_network`` stores it."""
+        network = network or {}
+        nodes = sorted(
+            network.get("nodes") or [], key=lambda node: -(node.get("degree") or 0)
+        )
+        position = {node["id"]: i for i, node in enumerate(nodes)}
+        edges = sorted(
+            (
+                (max(position[edge["source"]], position[edge["target"]]), edge)
+                for edge in network.get("edges") or []
+                if edge["source"] in position and edge["target"] in position
+            ),
+            key=lambda ranked: ranked[0],
+        )
+        counts = [0] * len(nodes)
+        for rank, _ in edges:
+            counts[rank] += 1
+        return {
+            "nodes": nodes,
+            "edges": [edge for _, edge in edges],
+            "edge_counts": list(accumulate(counts)),
+        }
+
+    @staticmethod
+    def top_k(ranked: dict[str, list], k: int) -> dict[str, list]:
+        """Top-k subgraph of a ranked network."""
+        counts = ranked["edge_counts"]
+        size = counts[k - 1] if k <= len(counts) else len(ranked["edges"])
+        return {"nodes": ranked["nodes"][:k], "edges": ranked["edges"][:size]}
+
+    @classmethod
+    def top_k_expression(cls, k: int) -> dict[str, Any]:
+        """``top_k`` of the stored ranked network, inside the aggregation."""
+        ranked = f"${cls.field}"
+        return {
+            "nodes": {"$slice": [f"{ranked}.nodes", k]},
+            "edges": {
+                "$slice": [
+                    f"{ranked}.edges",
+                    {
+                        "$ifNull": [
+                            {"$arrayElemAt": [f"{ranked}.edge_counts", k - 1]},
+                            {"$size": f"{ranked}.edges"},
+                        ]
+                    },
+                ]
+            },
+        }
+
+    @classmethod
+    def get_top_network(
+        cls, collection: ProfiledCollection, idx: str, k: int | str | None = None
+    ) -> dict[str, list] | None:
+        """
+        Top-k subgraph of the network of ``idx``. Documents the job has not
+        ranked yet send their whole network, ranked here.
+        """
+        k = cls.clamp(k)
+        ranked = {"$gt": [f"${cls.field}", None]}
+        pipeline = [
+            {"$match": {"_id": ObjectId(idx), "coauthorship_network": {"$exists": 1}}},
+            {
+                "$project": {
+                    "_id": 0,
+                    "ranked": ranked,
+                    "network": {
+                        "$cond": [
+                            ranked,
+                            cls.top_k_expression(k),
+                            "$coauthorship_network",
+                        ]
+                    },
+                }
+            },
+        ]
+        result = next(collection.aggregate(pipeline), None)
+        if not result:
+            return None
+        network = result.get("network")
+        if not result.get("ranked"):
+            network = cls.top_k(cls.rank(network), k)
+        if not (network or {}).get("nodes"):
+            return None
+        return network
+
+    @classmethod
+    def precompute(cls, collection: ProfiledCollection, batch_size: int) -> int:
+        """
+        Store the ranked network of every document with a network, in place
+        of the fixed size subgraphs stored before.
+        """
+        updates, modified = [], 0
+        documents = collection.find(
+            {"coauthorship_network": {"$exists": 1}}, {"coauthorship_network": 1}
+        )
+        for document in documents:
+            ranked = cls.rank(document["coauthorship_network"])
+            updates.append(
+                UpdateOne(
+                    {"_id": document["_id"]},
+                    {
+                        "$set": {cls.field: ranked},
+                        "$unset": {"coauthorship_network_top": ""},
+                    },
+                )
+            )
+            if len(updates) >= batch_size:
+                modified += collection.bulk_write(updates, ordered=False).modified_count
+                updates = []
+        if updates:
+            modified += collection.bulk_write(updates, ordered=False).modified_count
+        return modified
@@ -0,0 +1,309 @@
+from typing import Any, Hashable
+
+import numpy as np
+from bson import ObjectId
+
+from core.config import settings
+from core.snapshot import PeriodicSnapshot
+from infraestructure.mongo.utils.session import ProfiledDatabase, get_database
+
+#: Sentinels of the integer columns: the field is absent or it is null
+MISSING = -2
+NULL = -1
+
+SCIENTI_ARTICLE = ("scienti", "Publicado en revista especializada")
+SCIENTI_RANKS = ["A", "A1", "B", "C", "D"]
+
+
+class Vocabulary:
+    """Dense integer codes for the distinct values of a column."""
+
+    def __init__(self):
+        self.codes: dict[Hashable, int] = {}
+        self.values: list[Hashable] = []
+
+    def code(self, value: Hashable) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def get(self, value: Hashable) -> int:
+        return self.codes.get(value, NULL)
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+
+class CSR:
+    """
+    Codes of every row in compressed sparse row layout, plus the inverse
+    index from a code to the rows holding it.
+    """
+
+    def __init__(self, indptr: list[int], codes: list[int], size: int):
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.codes = np.asarray(codes, dtype=np.int32)
+        self.rows = np.repeat(
+            np.arange(len(self.indptr) - 1, dtype=np.int32), np.diff(self.indptr)
+        )
+        self.inverse_rows = self.rows[np.argsort(self.codes, kind="stable")]
+        self.inverse_indptr = np.zeros(size + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.codes, minlength=size), out=self.inverse_indptr[1:])
+
+    def rows_of(self, code: int) -> np.ndarray:
+        if code < 0:
+            return np.empty(0, dtype=np.int32)
+        return self.inverse_rows[self.inverse_indptr[code] : self.inverse_indptr[code + 1]]
+
+    def entries(self, rows: np.ndarray) -> np.ndarray:
+        """Positions in ``codes`` of every code of ``rows``."""
+        starts = self.indptr[rows]
+        lengths = self.indptr[rows + 1] - starts
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+        return offsets + np.arange(lengths.sum())
+
+
+def first_citations(citations_count: list[dict[str, Any]]) -> int:
+    """Citations of the first scholar or openalex count, as the pies read them."""
+    for count in citations_count or []:
+        if count.get("source") in ["scholar", "openalex"]:
+            return count.get("count") or 0
+    return 0
+
+
+def year_code(work: dict[str, Any]) -> int:
+    if "year_published" not in work:
+        return MISSING
+    try:
+        return int(work["year_published"])
+    except (TypeError, ValueError):
+        return NULL
+
+
+class WorkFactTable:
+    """
+    Array backed snapshot of the ``works`` fields the plots group by, one
+    row per work.
+
+    Categorical fields are stored as integer codes into a ``Vocabulary``,
+    and the author and affiliation membership of every work as ``CSR``
+    index arrays, so a chart over a whole institution is a handful of
+    NumPy group-bys instead of a scan over nested documents.
+    """
+
+    projection = {
+        "year_published": 1,
+        "citations_count": 1,
+        "bibliographic_info.is_open_access": 1,
+        "bibliographic_info.open_access_status": 1,
+        "types.source": 1,
+        "types.type": 1,
+        "source.id": 1,
+        "ranking.source": 1,
+        "ranking.rank": 1,
+        "authors.id": 1,
+        "authors.affiliations.id": 1,
+        "affiliation_closure": 1,
+    }
+
+    def __init__(self):
+        self.affiliation_codes = Vocabulary()
+        self.author_codes = Vocabulary()
+        self.type_codes = Vocabulary()
+        self.status_codes = Vocabulary()
+        self.rank_codes = Vocabulary()
+        self.publisher_codes = Vocabulary()
+
+    @classmethod
+    def build(cls, colav_db: ProfiledDatabase) -> "WorkFactTable":
+        table = cls()
+        source_publishers = {}
+        for source in colav_db["sources"].find({}, {"publisher.name": 1}):
+            publisher = source.get("publisher")
+            name = publisher.get("name") if isinstance(publisher, dict) else None
+            if isinstance(name, str) and name:
+                source_publishers[source["_id"]] = table.publisher_codes.code(name)
+
+        year, is_oa, status, rank, rank_has_null, publisher, citations = (
+            [] for _ in range(7)
+        )
+        types, authors, affiliations = ([0], []), ([0], []), ([0], [])
+        for work in colav_db["works"].find({}, cls.projection):
+            year.append(year_code(work))
+            bibliographic_info = work.get("bibliographic_info") or {}
+            if "is_open_access" not in bibliographic_info:
+                is_oa.append(MISSING)
+            elif bibliographic_info["is_open_access"] is None:
+                is_oa.append(NULL)
+            else:
+                is_oa.append(int(bool(bibliographic_info["is_open_access"])))
+            status.append(
+                table.status_codes.code(bibliographic_info["open_access_status"])
+                if bibliographic_info.get("open_access_status") is not None
+                else NULL
+            )
+
+            ranking = work.get("ranking") or []
+            rank_has_null.append(any(r.get("rank") is None for r in ranking))
+            rank.append(
+                next(
+                    (
+                        table.rank_codes.code(r["rank"].split("_")[-1])
+                        for r in ranking
+                        if r.get("source") == "scienti" and isinstance(r.get("rank"), str)
+                    ),
+                    NULL,
+                )
+            )
+            publisher.append(
+                source_publishers.get((work.get("source") or {}).get("id"), NULL)
+            )
+            citations.append(first_citations(work.get("citations_count")))
+
+            types[1].extend(
+                table.type_codes.code((typ.get("source"), typ.get("type")))
+                for typ in work.get("types") or []
+            )
+            types[0].append(len(types[1]))
+            work_authors = work.get("authors") or []
+            authors[1].extend(
+                table.author_codes.code(author_id)
+                for author_id in {a["id"] for a in work_authors if a.get("id")}
+            )
+            authors[0].append(len(authors[1]))
+            affiliation_ids = set(work.get("affiliation_closure") or [])
+            for author in work_authors:
+                affiliation_ids.update(
+                    aff["id"] for aff in author.get("affiliations") or [] if aff.get("id")
+                )
+            affiliations[1].extend(
+                table.affiliation_codes.code(aff_id) for aff_id in affiliation_ids
+            )
+            affiliations[0].append(len(affiliations[1]))
+
+        table.year = np.asarray(year, dtype=np.int32)
+        table.is_oa = np.asarray(is_oa, dtype=np.int8)
+        table.status = np.asarray(status, dtype=np.int16)
+        table.rank = np.asarray(rank, dtype=np.int16)
+        table.rank_has_null = np.asarray(rank_has_null, dtype=bool)
+        table.publisher = np.asarray(publisher, dtype=np.int32)
+        table.citations = np.asarray(citations, dtype=np.int64)
+        table.types = CSR(*types, len(table.type_codes))
+        table.authors = CSR(*authors, len(table.author_codes))
+        table.affiliations = CSR(*affiliations, len(table.affiliation_codes))
+        return table
+
+    def __len__(self) -> int:
+        return len(self.year)
+
+    def affiliation_rows(self, idx: str | ObjectId) -> np.ndarray:
+        return self.affiliations.rows_of(self.affiliation_codes.get(ObjectId(idx)))
+
+    def author_rows(self, idx: str | ObjectId) -> np.ndarray:
+        return self.authors.rows_of(self.author_codes.get(ObjectId(idx)))
+
+    @staticmethod
+    def _counts(codes: np.ndarray, vocabulary: Vocabulary) -> dict[Hashable, int]:
+        counts = np.bincount(codes, minlength=len(vocabulary))
+        return {
+            vocabulary.values[code]: int(counts[code]) for code in np.flatnonzero(counts)
+        }
+
+    def products_by_year_by_type(
+        self, rows: np.ndarray, source: str = SCIENTI_ARTICLE[0], typ: str = SCIENTI_ARTICLE[1]
+    ) -> list[dict[str, Any]]:
+        """Same output as ``bars.products_by_year_by_type``."""
+        entries = self.types.entries(rows)
+        matches = entries[self.types.codes[entries] == self.type_codes.get((source, typ))]
+        years = self.year[self.types.rows[matches]]
+        years, counts = np.unique(years[years > 0], return_counts=True)
+        return [
+            {"x": int(year), "y": int(count), "type": typ}
+            for year, count in zip(years, counts)
+        ]
+
+    def oa_by_year(self, rows: np.ndarray) -> list[dict[str, Any]]:
+        """Same output as ``bars.oa_by_year`` for known years and access."""
+        rows = rows[(self.is_oa[rows] >= 0) & (self.year[rows] >= 0)]
+        result = []
+        for year in np.unique(self.year[rows]):
+            is_oa = self.is_oa[rows[self.year[rows] == year]]
+            opened = int(np.count_nonzero(is_oa))
+            result += [
+                {"x": int(year), "y": opened, "type": "open"},
+                {"x": int(year), "y": len(is_oa) - opened, "type": "closed"},
+            ]
+        return result
+
+    def products_by_year_by_publisher(
+        self, rows: np.ndarray, top: int = 5
+    ) -> list[dict[str, Any]]:
+        """Same output as ``bars.products_by_year_by_publisher``."""
+        rows = rows[(self.year[rows] >= 0) & (self.publisher[rows] >= 0)]
+        if not len(rows):
+            return []
+        years = self.year[rows]
+        publishers = self.publisher[rows]
+        totals = np.bincount(publishers, minlength=len(self.publisher_codes))
+        top_codes = [
+            code for code in np.argsort(-totals, kind="stable")[:top] if totals[code]
+        ]
+        unique_years, year_index = np.unique(years, return_inverse=True)
+        counts = {
+            code: np.bincount(
+                year_index[publishers == code], minlength=len(unique_years)
+            )
+            for code in top_codes
+        }
+        return [
+            {
+                "x": int(year),
+                "y": int(counts[code][i]),
+                "type": self.publisher_codes.values[code],
+            }
+            for i, year in enumerate(unique_years)
+            for code in top_codes
+        ]
+
+    def publisher_counts(self, rows: np.ndarray) -> dict[str, int]:
+        publishers = self.publisher[rows]
+        return self._counts(publishers[publishers >= 0], self.publisher_codes)
+
+    def open_access_status_counts(self, rows: np.ndarray) -> dict[str, int]:
+        status = self.status[rows]
+        return self._counts(status[status >= 0], self.status_codes)
+
+    def scienti_rank_counts(
+        self, rows: np.ndarray, *, skip_null_ranks: bool = True
+    ) -> dict[str, int]:
+        if skip_null_ranks:
+            rows = rows[~self.rank_has_null[rows]]
+        ranks = self.rank[rows]
+        counts = self._counts(ranks[ranks >= 0], self.rank_codes)
+        return {rank: count for rank, count in counts.items() if rank in SCIENTI_RANKS}
+
+    def cited_products_count(self, rows: np.ndarray) -> int:
+        return int(np.count_nonzero(self.citations[rows]))
+
+    def cited_products_citations(self, rows: np.ndarray) -> list[int]:
+        citations = self.citations[rows]
+        return citations[citations != 0].tolist()
+
+
+work_facts: PeriodicSnapshot[WorkFactTable] = PeriodicSnapshot(
+    "work fact table",
+    lambda: WorkFactTable.build(
+        get_database(settings.MONGO_INITDB_DATABASE, "analytics")
+    ),
+    settings.FACT_TABLE_REFRESH_S,
+    wait_first=False,
+)
+
+
+def get_work_facts() -> WorkFactTable | None:
+    """The fact table when ``USE_FACT_TABLE`` is set and it is already built."""
+    if not settings.USE_FACT_TABLE:
+        return None
+    return work_facts.get()
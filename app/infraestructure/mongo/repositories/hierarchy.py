@@ -0,0 +1,170 @@
+from dataclasses import dataclass, field
+from typing import Any, Iterable
+
+from bson import ObjectId
+
+from core.config import settings
+from core.snapshot import PeriodicSnapshot
+from infraestructure.mongo.utils.session import ProfiledDatabase, get_database
+
+#: Level of every affiliation type, any other type is an institution
+LEVELS = {"group": 0, "department": 1, "faculty": 2}
+INSTITUTION = 3
+
+
+def level(types: list[dict[str, Any]] | None) -> int:
+    for typ in types or []:
+        if typ.get("type") in LEVELS:
+            return LEVELS[typ["type"]]
+    return INSTITUTION
+
+
+@dataclass(slots=True)
+class AffiliationNode:
+    id: ObjectId
+    names: list[dict[str, Any]]
+    types: list[dict[str, Any]]
+    level: int
+    #: Affiliations above this one listed in its relations
+    parents: set[ObjectId] = field(default_factory=set)
+    #: Affiliations below this one listing it in their relations
+    children: set[ObjectId] = field(default_factory=set)
+    #: Any affiliation listing this one in its relations
+    referrers: set[ObjectId] = field(default_factory=set)
+    #: Groups sharing at least one member with this affiliation
+    member_groups: set[ObjectId] = field(default_factory=set)
+
+    @property
+    def name(self) -> str:
+        es_name = next(filter(lambda x: x.get("lang") == "es", self.names), None)
+        if es_name:
+            return es_name["name"]
+        return self.names[0]["name"] if self.names else ""
+
+    @property
+    def type(self) -> str | None:
+        return self.types[0]["type"] if self.types else None
+
+    def has_type(self, typ: str) -> bool:
+        return any(t.get("type") == typ for t in self.types)
+
+
+class AffiliationHierarchy:
+    """
+    In-process index of the group, department, faculty and institution
+    hierarchy with the names and types of every affiliation.
+
+    The index is loaded from the ``affiliations`` collection on first use
+    and rebuilt in the background every ``AFFILIATION_HIERARCHY_REFRESH_S``
+    seconds; requests keep reading the previous snapshot meanwhile. Groups
+    of departments and faculties come from the affiliations their members
+    share, so they are derived from ``person`` at refresh time too.
+    """
+
+    def __init__(self, refresh_s: int = settings.AFFILIATION_HIERARCHY_REFRESH_S):
+        self._snapshot = PeriodicSnapshot(
+            "affiliation hierarchy", lambda: self.load(get_database()), refresh_s
+        )
+
+    @staticmethod
+    def load(colav_db: ProfiledDatabase) -> dict[ObjectId, AffiliationNode]:
+        nodes: dict[ObjectId, AffiliationNode] = {}
+        relations: dict[ObjectId, list[dict[str, Any]]] = {}
+        for affiliation in colav_db["affiliations"].find(
+            {}, {"names": 1, "types": 1, "relations.id": 1, "relations.types": 1}
+        ):
+            nodes[affiliation["_id"]] = AffiliationNode(
+                id=affiliation["_id"],
+                names=affiliation.get("names") or [],
+                types=affiliation.get("types") or [],
+                level=level(affiliation.get("types")),
+            )
+            relations[affiliation["_id"]] = affiliation.get("relations") or []
+
+        for aff_id, aff_relations in relations.items():
+            node = nodes[aff_id]
+            for relation in aff_relations:
+                if not relation.get("id"):
+                    continue
+                relation_id = ObjectId(relation["id"])
+                related = nodes.get(relation_id)
+                if related is None:
+                    continue
+                related.referrers.add(aff_id)
+                if level(relation.get("types")) > node.level:
+                    node.parents.add(relation_id)
+                    related.children.add(aff_id)
+
+        for author in colav_db["person"].find(
+            {"affiliations.types.type": "group"},
+            {"affiliations.id": 1, "affiliations.types": 1},
+        ):
+            groups, units = [], []
+            for aff in author.get("affiliations") or []:
+                if aff.get("id") not in nodes:
+                    continue
+                if level(aff.get("types")) == LEVELS["group"]:
+                    groups.append(aff["id"])
+                else:
+                    units.append(aff["id"])
+            for unit in units:
+                nodes[unit].member_groups.update(groups)
+        return nodes
+
+    def refresh(self) -> None:
+        self._snapshot.refresh()
+
+    @property
+    def nodes(self) -> dict[ObjectId, AffiliationNode]:
+        return self._snapshot.get()
+
+    def get(self, idx: str | ObjectId) -> AffiliationNode | None:
+        return self.nodes.get(ObjectId(idx))
+
+    def _walk(self, idx: str | ObjectId, edges: str) -> list[AffiliationNode]:
+        nodes = self.nodes
+        seen: set[ObjectId] = set()
+        stack = [ObjectId(idx)]
+        while stack:
+            node = nodes.get(stack.pop())
+            if node is None:
+                continue
+            for next_id in getattr(node, edges):
+                if next_id not in seen:
+                    seen.add(next_id)
+                    stack.append(next_id)
+        return [nodes[aff_id] for aff_id in seen if aff_id in nodes]
+
+    def ancestors(self, idx: str | ObjectId) -> list[AffiliationNode]:
+        return self._walk(idx, "parents")
+
+    def descendants(self, idx: str | ObjectId) -> list[AffiliationNode]:
+        return self._walk(idx, "children")
+
+    def related(
+        self, idx: str | ObjectId, relation_type: str, affiliation_type: str
+    ) -> list[AffiliationNode]:
+        """
+        Affiliations of ``relation_type`` related to ``idx``: the groups its
+        members belong to for departments and faculties, the affiliations
+        listing it in their relations otherwise.
+        """
+        node = self.get(idx)
+        if node is None:
+            return []
+        if affiliation_type in ["department", "faculty"] and relation_type == "group":
+            related_ids: Iterable[ObjectId] = node.member_groups
+        else:
+            related_ids = node.referrers
+        nodes = self.nodes
+        return sorted(
+            (
+                nodes[aff_id]
+                for aff_id in related_ids
+                if aff_id in nodes and nodes[aff_id].has_type(relation_type)
+            ),
+            key=lambda related: related.name,
+        )
+
+
+affiliation_hierarchy = AffiliationHierarchy()
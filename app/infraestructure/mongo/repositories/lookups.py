@@ -0,0 +1,267 @@
+from bisect import bisect_right
+from datetime import datetime, timezone
+from itertools import accumulate
+from typing import Any, Generic, Hashable, Iterable, Iterator, TypeVar
+
+from bson import ObjectId
+
+from core.config import settings
+from core.snapshot import PeriodicSnapshot
+from infraestructure.mongo.repositories.hierarchy import affiliation_hierarchy
+from infraestructure.mongo.utils.session import ProfiledDatabase, get_database
+from jobs.sort_keys import name_key
+from utils.assets import municipalities
+
+V = TypeVar("V")
+
+
+class CachedLookup(Generic[V]):
+    """
+    In-process table of ``V`` per key, built by ``load`` from the analytics
+    database on first use and rebuilt in the background every
+    ``LOOKUP_REFRESH_S`` seconds.
+    """
+
+    name: str = "lookup"
+
+    def __init__(self, refresh_s: int = settings.LOOKUP_REFRESH_S):
+        self._snapshot = PeriodicSnapshot(
+            self.name,
+            lambda: self.load(
+                get_database(settings.MONGO_INITDB_DATABASE, "analytics")
+            ),
+            refresh_s,
+        )
+
+    def load(self, colav_db: ProfiledDatabase) -> dict[Hashable, V]:
+        raise NotImplementedError
+
+    def refresh(self) -> None:
+        self._snapshot.refresh()
+
+    @property
+    def table(self) -> dict[Hashable, V]:
+        return self._snapshot.get()
+
+    def get(self, key: Hashable, default: V | None = None) -> V | None:
+        return self.table.get(key, default)
+
+
+#: Start dates, end dates, ranks and positions in the ``ranking`` list of the
+#: intervals of a document by start date, with the latest end date up to each
+Intervals = tuple[list[int], list[int], list[str], list[int], list[int]]
+
+
+class RankingIntervals(CachedLookup[Intervals]):
+    """
+    Validity intervals of the ``ranking`` entries from ``ranking_source`` of
+    every document of ``collection`` matching ``query``, sorted by start
+    date so the intervals that may hold a date are found with a bisection.
+    Intervals may overlap: the rank at a date is that of the first one
+    holding it in the ``ranking`` list, as when the list was scanned.
+    """
+
+    collection: str
+    query: dict[str, Any] = {}
+    ranking_source: str
+
+    def load(self, colav_db: ProfiledDatabase) -> dict[ObjectId, Intervals]:
+        table = {}
+        for document in colav_db[self.collection].find(
+            {**self.query, "ranking.source": self.ranking_source},
+            {
+                "ranking.source": 1,
+                "ranking.rank": 1,
+                "ranking.from_date": 1,
+                "ranking.to_date": 1,
+            },
+        ):
+            intervals = sorted(
+                (
+                    (ranking["from_date"], ranking["to_date"], ranking["rank"], order)
+                    for order, ranking in enumerate(document["ranking"])
+                    if ranking.get("source") == self.ranking_source
+                    and ranking.get("from_date") is not None
+                    and ranking.get("to_date") is not None
+                ),
+                key=lambda interval: (interval[0], interval[3]),
+            )
+            if intervals:
+                from_dates, to_dates, ranks, orders = map(list, zip(*intervals))
+                table[document["_id"]] = (
+                    from_dates,
+                    to_dates,
+                    ranks,
+                    orders,
+                    list(accumulate(to_dates, max)),
+                )
+        return table
+
+    def rank_at(self, idx: ObjectId, date: int | float) -> str | None:
+        """Rank of the first interval with ``from_date <= date < to_date``."""
+        intervals = self.get(idx)
+        if intervals is None:
+            return None
+        from_dates, to_dates, ranks, orders, latest_ends = intervals
+        found = None
+        position = bisect_right(from_dates, date) - 1
+        # no interval starting before position ends after date once the latest
+        # end up to it does not
+        while position >= 0 and latest_ends[position] > date:
+            if to_dates[position] > date and (
+                found is None or orders[position] < orders[found]
+            ):
+                found = position
+            position -= 1
+        return None if found is None else ranks[found]
+
+
+class ScimagoQuartiles(RankingIntervals):
+    """Scimago best quartile of every source over time."""
+
+    name = "scimago quartiles"
+    collection = "sources"
+    ranking_source = "scimago Best Quartile"
+
+    def quartiles(self, works: Iterable[dict[str, Any]]) -> Iterator[str]:
+        """Quartiles of the works read with ``source.id`` and ``date_published``."""
+        for work in works:
+            source_id = (work.get("source") or {}).get("id")
+            if source_id is None or work.get("date_published") is None:
+                continue
+            rank = self.rank_at(source_id, work["date_published"])
+            if rank is not None:
+                yield rank
+
+
+class GroupCategories(RankingIntervals):
+    """Scienti category of every group over time."""
+
+    name = "group categories"
+    collection = "affiliations"
+    query = {"types.type": "group"}
+    ranking_source = "scienti"
+
+    def category(self, group_id: ObjectId, year: int | None) -> str | None:
+        """Category of the group at the start of ``year``, if it is known."""
+        if year is None:
+            return None
+        category = self.rank_at(
+            group_id, datetime.strptime(str(year), "%Y").timestamp()
+        )
+        return category or None
+
+
+class BirthYears(CachedLookup[int]):
+    """Birth year of every author with a known birthdate."""
+
+    name = "author birth years"
+
+    def load(self, colav_db: ProfiledDatabase) -> dict[ObjectId, int]:
+        table = {}
+        for author in colav_db["person"].find(
+            {"birthdate": {"$nin": [-1, "", 0, None]}}, {"birthdate": 1}
+        ):
+            if isinstance(author["birthdate"], (int, float)):
+                table[author["_id"]] = datetime.fromtimestamp(
+                    author["birthdate"], timezone.utc
+                ).year
+        return table
+
+
+#: Country code, country, city and colombian department of an address
+Location = tuple[str | None, str | None, str | None, str | None]
+
+
+class AffiliationLocations(CachedLookup[list[Location]]):
+    """
+    Locations of the addresses of every affiliation, rolling up counts per
+    affiliation into counts per country or per colombian department.
+    """
+
+    name = "affiliation locations"
+
+    def load(self, colav_db: ProfiledDatabase) -> dict[ObjectId, list[Location]]:
+        departments = {}
+        towns = municipalities()
+        for city, department in zip(towns["MUNICIPIO"], towns["DEPARTAMENTO"]):
+            departments.setdefault(city, department)
+        table = {}
+        for affiliation in colav_db["affiliations"].find(
+            {"addresses": {"$ne": []}},
+            {"addresses.country_code": 1, "addresses.country": 1, "addresses.city": 1},
+        ):
+            table[affiliation["_id"]] = [
+                (
+                    address.get("country_code"),
+                    address.get("country"),
+                    address.get("city"),
+                    departments.get(address.get("city")),
+                )
+                for address in affiliation.get("addresses") or []
+            ]
+        return table
+
+    def by_country(self, counts: dict[ObjectId, int]) -> dict[str, dict[str, Any]]:
+        """Counts and names per country code, for ``maps``."""
+        countries = {}
+        for aff_id, count in counts.items():
+            for country_code, country, _, _ in self.get(aff_id, []):
+                if not country_code or not country:
+                    continue
+                if country_code in countries:
+                    countries[country_code]["count"] += count
+                else:
+                    countries[country_code] = {"count": count, "name": country}
+        return countries
+
+    def by_department(self, counts: dict[ObjectId, int]) -> dict[str, dict[str, Any]]:
+        """Counts per colombian department of the address city, for ``maps``."""
+        departments = {}
+        for aff_id, count in counts.items():
+            for country_code, _, city, department in self.get(aff_id, []):
+                if not country_code or not city or department is None:
+                    continue
+                if department in departments:
+                    departments[department]["count"] += count
+                else:
+                    departments[department] = {"count": count, "name": department}
+        return departments
+
+
+class PublisherKeys(CachedLookup[str]):
+    """Normalized publisher name of every source with a named publisher."""
+
+    name = "publisher keys"
+
+    def load(self, colav_db: ProfiledDatabase) -> dict[ObjectId, str]:
+        table = {}
+        for source in colav_db["sources"].find(
+            {"publisher.name": {"$type": "string", "$ne": ""}}, {"publisher.name": 1}
+        ):
+            key = name_key(source["publisher"]["name"])
+            if key:
+                table[source["_id"]] = key
+        return table
+
+    def publishers(self, works: Iterable[dict[str, Any]]) -> Iterator[str]:
+        """Publisher keys of the works read with ``source.id``."""
+        for work in works:
+            key = self.get((work.get("source") or {}).get("id"))
+            if key is not None:
+                yield key
+
+
+def institution_name_keys(institution_id: str | ObjectId | None) -> set[str]:
+    """Normalized names of an affiliation, matched against ``PublisherKeys``."""
+    node = affiliation_hierarchy.get(institution_id) if institution_id else None
+    if node is None:
+        return set()
+    return {name_key(name["name"]) for name in node.names if name.get("name")}
+
+
+scimago_quartiles = ScimagoQuartiles()
+group_categories = GroupCategories()
+birth_years = BirthYears()
+affiliation_locations = AffiliationLocations()
+publisher_keys = PublisherKeys()
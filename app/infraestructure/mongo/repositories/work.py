@@ -4,15 +4,33 @@ from typing import Any, Iterable
 from odmantic.query import desc, asc
 from bson import ObjectId
 
+from core.cache import LRUCache
+from core.config import settings
+from core.singleflight import coalesced
 from infraestructure.mongo.repositories.base import RepositoryBase
 from infraestructure.mongo.models.work import Work
 from infraestructure.mongo.models.person import Person
-from infraestructure.mongo.utils.session import engine
+from infraestructure.mongo.utils.session import get_collection
 from schemas.work import WorkCsv, WorkListApp
 
+#: Per author header data shared by the profile, search and listing endpoints
+author_summaries = LRUCache(
+    maxsize=settings.AUTHOR_SUMMARY_CACHE_SIZE, ttl=settings.AUTHOR_SUMMARY_CACHE_TTL
+)
+
 
 class WorkRepository(RepositoryBase):
 
+    @staticmethod
+    def year_match(start_year: int | None, end_year: int | None) -> dict[str, Any]:
+        """``year_published`` filter of a year range, either end may be open."""
+        year_published = {}
+        if start_year:
+            year_published["$gte"] = start_year
+        if end_year:
+            year_published["$lte"] = end_year
+        return {"year_published": year_published} if year_published else {}
+
     @classmethod
     def wrap_pipeline(
         cls,
@@ -23,115 +41,173 @@ class WorkRepository(RepositoryBase):
         end_year: int = None,
         sort: str = "citations",
     ) -> list[dict[str, Any]]:
-        match_works = (
-            {"works.year_published": {"$gte": start_year, "$lte": end_year}}
-            if start_year and end_year
-            else {}
-        )
+        """
+        Works of an affiliation. The year range goes in the first ``$match``
+        on the works, so it is answered by the ``(filter, year_published)``
+        indexes of ``jobs.sort_keys``; when starting from the authors it is
+        applied inside the ``$lookup``, before the works are unwound.
+        """
+        year_match = cls.year_match(start_year, end_year)
         if affiliation_type == "institution":
-            pipeline = [
+            return [
                 {
                     "$match": {
                         "authors.affiliations.id": ObjectId(affiliation_id),
+                        **year_match,
                     },
                 },
-                # {"$sort": {cls.sort_traduction[sort_field]: -1}},
             ]
-            year_published_match = (
-                [{"$match": {"year_published": {"$gte": start_year, "$lte": end_year}}}]
-                if start_year and end_year
-                else []
-            )
-            return pipeline + year_published_match
+        if settings.USE_AFFILIATION_CLOSURE:
+            return [
+                {
+                    "$match": {
+                        "affiliation_closure": ObjectId(affiliation_id),
+                        **year_match,
+                    }
+                }
+            ]
+        lookup = {
+            "from": "works",
+            "localField": "_id",
+            "foreignField": "authors.id",
+            "as": "works",
+        }
+        if year_match:
+            lookup["pipeline"] = [{"$match": year_match}]
         pipeline = [
             {"$match": {"affiliations.id": ObjectId(affiliation_id)}},
             {"$project": {"affiliations": 1, "full_name": 1, "_id": 1}},
-            {
-                "$lookup": {
-                    "from": "works",
-                    "localField": "_id",
-                    "foreignField": "authors.id",
-                    "as": "works",
-                }
-            },
+            {"$lookup": lookup},
             {"$unwind": "$works"},
-            {"$match": match_works},
             {"$group": {"_id": "$works._id", "works": {"$first": "$works"}}},
         ]
         return pipeline
 
     @classmethod
-    def count_citations_by_author(cls, *, author_id: str) -> int:
-        count_citations_pipeline = [
+    def get_author_summary(
+        cls,
+        *,
+        author_id: str,
+        start_year: int | None = None,
+        end_year: int | None = None,
+    ) -> dict[str, Any]:
+        """
+        Products count, citations per source and first and last publication
+        year of an author, computed in a single ``$facet`` and cached per
+        author and year range for ``AUTHOR_SUMMARY_CACHE_TTL`` seconds.
+        """
+        key = (str(author_id), start_year, end_year)
+        summary = author_summaries.get(key)
+        if summary is not None:
+            return summary
+        summary_pipeline = [
             {
                 "$match": {
                     "authors.id": ObjectId(author_id),
-                },
-            },
-            {"$unwind": "$citations_count"},
-            {
-                "$group": {
-                    "_id": "$citations_count.source",
-                    "count": {"$sum": "$citations_count.count"},
-                },
+                    **cls.year_match(start_year, end_year),
+                }
             },
             {
-                "$group": {
-                    "_id": None,
-                    "counts": {
-                        "$push": {
-                            "source": "$_id",
-                            "count": "$count",
+                "$facet": {
+                    "products": [{"$count": "total"}],
+                    "citations": [
+                        {"$unwind": "$citations_count"},
+                        {
+                            "$group": {
+                                "_id": "$citations_count.source",
+                                "count": {"$sum": "$citations_count.count"},
+                            },
                         },
-                    },
+                        {"$project": {"_id": 0, "source": "$_id", "count": 1}},
+                    ],
+                    "years": [
+                        {"$match": {"year_published": {"$exists": 1}}},
+                        {
+                            "$group": {
+                                "_id": None,
+                                "start_year": {"$min": "$year_published"},
+                                "end_year": {"$max": "$year_published"},
+                            },
+                        },
+                        {"$project": {"_id": 0}},
+                    ],
                 },
             },
-            {"$project": {"_id": 0, "counts": 1}},
         ]
-        citations_count = next(
-            engine.get_collection(Work).aggregate(count_citations_pipeline),
-            {"counts": []},
-        ).get("counts")
-        return citations_count
+        result = next(
+            get_collection(Work, "analytics").aggregate(summary_pipeline), {}
+        )
+        products = result.get("products") or [{}]
+        years = result.get("years") or [{}]
+        summary = {
+            "products_count": products[0].get("total", 0),
+            "citations_count": result.get("citations", []),
+            "start_year": years[0].get("start_year"),
+            "end_year": years[0].get("end_year"),
+        }
+        author_summaries.set(key, summary)
+        return summary
+
+    @staticmethod
+    def source_collection(affiliation_type: str) -> type[Person] | type[Work]:
+        """Collection ``wrap_pipeline`` starts from for ``affiliation_type``."""
+        if affiliation_type == "institution" or settings.USE_AFFILIATION_CLOSURE:
+            return Work
+        return Person
+
+    @classmethod
+    def count_citations_by_author(cls, *, author_id: str) -> list[dict[str, Any]]:
+        return cls.get_author_summary(author_id=author_id)["citations_count"]
 
     @classmethod
     def count_papers_by_author(cls, *, author_id: str) -> int:
-        count_papers_pipeline = [
-            {"$match": {"authors.id": ObjectId(author_id)}},
-            {"$count": "total"},
-        ]
-        papers_count = next(
-            engine.get_collection(Work).aggregate(count_papers_pipeline),
-            {"total": 0},
-        ).get("total", 0)
-        return papers_count
+        return cls.get_author_summary(author_id=author_id)["products_count"]
 
     @classmethod
-    def count_papers(cls, *, affiliation_id: str, affiliation_type: str) -> int:
+    @coalesced
+    def count_papers(
+        cls,
+        *,
+        affiliation_id: str,
+        affiliation_type: str,
+        start_year: int | None = None,
+        end_year: int | None = None,
+    ) -> int:
         affiliation_type = (
             "institution" if affiliation_type == "Education" else affiliation_type
         )
-        count_papers_pipeline = cls.wrap_pipeline(affiliation_id, affiliation_type)
+        count_papers_pipeline = cls.wrap_pipeline(
+            affiliation_id, affiliation_type, start_year=start_year, end_year=end_year
+        )
         count_papers_pipeline.append({"$count": "total"})
-        collection = Person if affiliation_type != "institution" else Work
+        collection = cls.source_collection(affiliation_type)
         papers_count = next(
-            engine.get_collection(collection).aggregate(count_papers_pipeline),
+            get_collection(collection, "analytics").aggregate(count_papers_pipeline),
             {"total": 0},
         ).get("total", 0)
         return papers_count
 
     @classmethod
+    @coalesced
     def count_citations(
-        cls, *, affiliation_id: str, affiliation_type: str
+        cls,
+        *,
+        affiliation_id: str,
+        affiliation_type: str,
+        start_year: int | None = None,
+        end_year: int | None = None,
     ) -> list[dict[str, str | int]]:
         affiliation_type = (
             "institution" if affiliation_type == "Education" else affiliation_type
         )
-        count_citations_pipeline = cls.wrap_pipeline(affiliation_id, affiliation_type)
+        count_citations_pipeline = cls.wrap_pipeline(
+            affiliation_id, affiliation_type, start_year=start_year, end_year=end_year
+        )
+        collection = cls.source_collection(affiliation_type)
         count_citations_pipeline += [
             {
                 "$project": {
-                    "citations_count": f"${'works.' if affiliation_type!='institution' else ''}citations_count"
+                    "citations_count": f"${'works.' if collection != Work else ''}citations_count"
                 }
             },
             {"$unwind": "$citations_count"},
@@ -150,13 +226,28 @@ class WorkRepository(RepositoryBase):
             },
             {"$project": {"_id": 0, "counts": 1}},
         ]
-        collection = Person if affiliation_type != "institution" else Work
         citations_count = next(
-            engine.get_collection(collection).aggregate(count_citations_pipeline),
+            get_collection(collection, "analytics").aggregate(count_citations_pipeline),
             {"counts": []},
         ).get("counts", [])
         return citations_count
 
+    @staticmethod
+    def count_coauthors_by_affiliation(match: dict[str, Any]) -> dict[ObjectId, int]:
+        """Authors of the works matching ``match`` per affiliation id."""
+        pipeline = [
+            {"$match": match},
+            {"$project": {"authors.affiliations.id": 1}},
+            {"$unwind": "$authors"},
+            {"$unwind": "$authors.affiliations"},
+            {"$group": {"_id": "$authors.affiliations.id", "count": {"$sum": 1}}},
+        ]
+        return {
+            entry["_id"]: entry["count"]
+            for entry in get_collection(Work, "analytics").aggregate(pipeline)
+            if entry["_id"] is not None
+        }
+
     @staticmethod
     def get_sort_direction(sort: str = "title") -> list[dict]:
         sort_field, direction = (sort[:-1], -1) if sort.endswith("-") else (sort, 1)
@@ -166,14 +257,19 @@ class WorkRepository(RepositoryBase):
             "title": "titles.0.title",
             "alphabetical": "titles.0.title",
         }
+        if settings.USE_SORT_KEYS:
+            sort_traduction |= {
+                "citations": "sort_keys.citations",
+                "title": "sort_keys.title",
+                "alphabetical": "sort_keys.title",
+            }
         pipeline = []
         if sort_field == "year":
             pipeline += [{"$match": {"year_published": {"$ne": None}}}]
         if sort_field == "citations":
             pipeline += [{"$match": {"citations_count": {"$ne": []}}}]
-        pipeline += [
-            {"$sort": {sort_traduction.get(sort_field, "titles.0.title"): direction}}
-        ]
+        sort_key = sort_traduction.get(sort_field, sort_traduction["title"])
+        pipeline += [{"$sort": {sort_key: direction}}]
         return pipeline
 
     @classmethod
@@ -191,15 +287,17 @@ class WorkRepository(RepositoryBase):
         affiliation_type = (
             "institution" if affiliation_type == "Education" else affiliation_type
         )
-        works_pipeline = cls.wrap_pipeline(affiliation_id, affiliation_type)
-        collection = Person if affiliation_type != "institution" else Work
+        works_pipeline = cls.wrap_pipeline(
+            affiliation_id, affiliation_type, start_year=start_year, end_year=end_year
+        )
+        collection = cls.source_collection(affiliation_type)
         works_pipeline += (
             [{"$replaceRoot": {"newRoot": "$works"}}] if collection != Work else []
         )
         works_pipeline += cls.get_sort_direction(sort)
         works_pipeline += [{"$skip": skip}] if skip else []
         works_pipeline += [{"$limit": limit}] if limit else []
-        results = engine.get_collection(collection).aggregate(works_pipeline)
+        results = get_collection(collection).aggregate(works_pipeline)
         return results
 
     @classmethod
@@ -277,7 +375,7 @@ class WorkRepository(RepositoryBase):
         works_pipeline += cls.get_sort_direction(sort)
         works_pipeline += [{"$skip": skip}] if skip else []
         works_pipeline += [{"$limit": limit}] if limit else []
-        return engine.get_collection(Work).aggregate(works_pipeline)
+        return get_collection(Work).aggregate(works_pipeline)
 
     @classmethod
     def get_research_products_by_author(
@@ -0,0 +1,190 @@
+from typing import Any
+
+from bson import ObjectId
+
+from core.config import settings
+from infraestructure.mongo.utils.session import get_database
+
+SCIENTI_ARTICLE = ("scienti", "Publicado en revista especializada")
+
+
+class YearlyStatsRepository:
+    """
+    Per entity and per year partial aggregates of the works, stored in the
+    impactu ``yearly_stats`` collection by ``jobs.yearly_stats``::
+
+        {
+            "_id": <person or affiliation id>,
+            "entity": "person" | "affiliation",
+            "years": [
+                {
+                    "year": 2020,
+                    "products": 10,
+                    "citations": [{"source": "openalex", "count": 5}],
+                    "open": 4,
+                    "closed": 6,
+                    "types": [{"source": "scienti", "type": "...", "count": 3}],
+                    "apc": 1234.5,
+                    "sexes": [{"sex": "Mujer", "count": 7}],
+                    "researcher_categories": [{"rank": "...", "count": 2}],
+                },
+            ],
+        }
+
+    Any ``start_year``/``end_year`` range is answered by summing the buckets
+    inside it, so it costs O(years) whatever the number of works. The works
+    without a publication year are in a bucket with a ``None`` year, read
+    only by the all time totals.
+    """
+
+    @staticmethod
+    def collection():
+        return get_database(settings.MONGO_IMPACTU_DB)[settings.YEARLY_STATS_COLLECTION]
+
+    @classmethod
+    def get_years(
+        cls,
+        entity_id: str | ObjectId,
+        start_year: int | None = None,
+        end_year: int | None = None,
+        undated: bool = False,
+    ) -> list[dict[str, Any]] | None:
+        """
+        Buckets inside the range, ``None`` when the entity has no stats. With
+        ``undated`` and no range, the bucket of the undated works too.
+        """
+        stats = cls.collection().find_one({"_id": ObjectId(entity_id)}, {"years": 1})
+        if stats is None:
+            return None
+        keep_undated = undated and start_year is None and end_year is None
+        return [
+            bucket
+            for bucket in stats.get("years", [])
+            if (bucket["year"] is None and keep_undated)
+            or (
+                bucket["year"] is not None
+                and (start_year is None or bucket["year"] >= start_year)
+                and (end_year is None or bucket["year"] <= end_year)
+            )
+        ]
+
+    @classmethod
+    def summarize(
+        cls,
+        entity_id: str | ObjectId,
+        start_year: int | None = None,
+        end_year: int | None = None,
+    ) -> dict[str, Any] | None:
+        """Products and citations per source published inside the range."""
+        years = cls.get_years(entity_id, start_year, end_year, undated=True)
+        if years is None:
+            return None
+        citations: dict[str, int] = {}
+        for bucket in years:
+            for count in bucket["citations"]:
+                citations[count["source"]] = (
+                    citations.get(count["source"], 0) + count["count"]
+                )
+        return {
+            "products_count": sum(bucket["products"] for bucket in years),
+            "citations_count": [
+                {"source": source, "count": count}
+                for source, count in citations.items()
+            ],
+        }
+
+    @classmethod
+    def products_by_year_by_type(
+        cls,
+        entity_id: str | ObjectId,
+        start_year: int | None = None,
+        end_year: int | None = None,
+    ) -> list[dict[str, Any]] | None:
+        """Same output as ``bars.products_by_year_by_type``."""
+        years = cls.get_years(entity_id, start_year, end_year)
+        if years is None:
+            return None
+        source, typ = SCIENTI_ARTICLE
+        result = []
+        for bucket in years:
+            count = sum(
+                t["count"]
+                for t in bucket["types"]
+                if t["source"] == source and t["type"] == typ
+            )
+            if count:
+                result.append({"x": bucket["year"], "y": count, "type": typ})
+        return result
+
+    @classmethod
+    def oa_by_year(
+        cls,
+        entity_id: str | ObjectId,
+        start_year: int | None = None,
+        end_year: int | None = None,
+    ) -> list[dict[str, Any]] | None:
+        """Same output as ``bars.oa_by_year``."""
+        years = cls.get_years(entity_id, start_year, end_year)
+        if years is None:
+            return None
+        result = []
+        for bucket in years:
+            if bucket["open"] or bucket["closed"]:
+                result += [
+                    {"x": bucket["year"], "y": bucket["open"], "type": "open"},
+                    {"x": bucket["year"], "y": bucket["closed"], "type": "closed"},
+                ]
+        return result
+
+    @classmethod
+    def apc_by_year(
+        cls,
+        entity_id: str | ObjectId,
+        start_year: int | None = None,
+        end_year: int | None = None,
+    ) -> list[dict[str, Any]] | None:
+        """Same output as ``bars.apc_by_year``."""
+        years = cls.get_years(entity_id, start_year, end_year)
+        if years is None:
+            return None
+        return [
+            {"x": bucket["year"], "y": int(bucket["apc"])}
+            for bucket in years
+            if bucket["apc"]
+        ]
+
+    @classmethod
+    def products_by_sex(
+        cls,
+        entity_id: str | ObjectId,
+        start_year: int | None = None,
+        end_year: int | None = None,
+    ) -> dict[str, int] | None:
+        """Products per author sex, ``None`` without the sex breakdown."""
+        years = cls.get_years(entity_id, start_year, end_year, undated=True)
+        if years is None or any("sexes" not in bucket for bucket in years):
+            return None
+        counts: dict[str, int] = {}
+        for bucket in years:
+            for sex in bucket["sexes"]:
+                counts[sex["sex"]] = counts.get(sex["sex"], 0) + sex["count"]
+        return counts
+
+    @classmethod
+    def products_by_year_by_researcher_category(
+        cls,
+        entity_id: str | ObjectId,
+        start_year: int | None = None,
+        end_year: int | None = None,
+    ) -> list[dict[str, Any]] | None:
+        """Same output as ``bars.products_by_year_by_researcher_category``."""
+        years = cls.get_years(entity_id, start_year, end_year)
+        if years is None or any(
+            "researcher_categories" not in bucket for bucket in years
+        ):
+            return None
+        return [
+            {"x": bucket["year"], "y": category["count"], "type": category["rank"]}
+            for bucket in years
+            for category in bucket["researcher_categories"]
+        ]
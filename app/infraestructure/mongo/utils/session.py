@@ -1,8 +1,194 @@
+import os
+from threading import Lock
+from typing import Any, Callable, Generic, Literal, TypeVar
+
+from odmantic import Model
 from odmantic.engine import SyncEngine
+from pydantic import BaseModel, Field
 from pymongo import MongoClient
+from pymongo.collection import Collection
+from pymongo.database import Database
 
+from core.budget import remaining_ms
 from core.config import settings
 
-client = MongoClient(host=str(settings.MONGO_URI))
+T = TypeVar("T")
+
+ProfileName = Literal["interactive", "analytics"]
+
+
+class ProcessLocal(Generic[T]):
+    """
+    Lazily builds a value the first time it is used in the current process.
+
+    A ``MongoClient`` owns sockets and monitor threads that must never be
+    shared across ``fork``, so the value is rebuilt whenever the process id
+    changes (e.g. inside a preforked server worker).
+    """
+
+    def __init__(self, factory: Callable[[], T]):
+        self._factory = factory
+        self._value: T | None = None
+        self._pid: int | None = None
+        self._lock = Lock()
+
+    def get(self) -> T:
+        pid = os.getpid()
+        if self._pid != pid:
+            with self._lock:
+                if self._pid != pid:
+                    self._value = self._factory()
+                    self._pid = pid
+        return self._value
+
+    def reset(self) -> None:
+        self._lock = Lock()
+        self._value = None
+        self._pid = None
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.get(), name)
+
+    def __getitem__(self, name: str) -> Any:
+        return self.get()[name]
+
+
+class ConnectionProfile(BaseModel):
+    """
+    Pool settings plus the cursor defaults applied to every query issued
+    through the profile.
+    """
+
+    name: ProfileName
+    client_options: dict[str, Any] = Field(default_factory=dict)
+    find_options: dict[str, Any] = Field(default_factory=dict)
+    aggregate_options: dict[str, Any] = Field(default_factory=dict)
+
+
+profiles: dict[ProfileName, ConnectionProfile] = {
+    "interactive": ConnectionProfile(
+        name="interactive",
+        client_options={
+            "maxPoolSize": settings.MONGO_INTERACTIVE_MAX_POOL_SIZE,
+            "serverSelectionTimeoutMS": settings.MONGO_INTERACTIVE_TIMEOUT_MS,
+            "connectTimeoutMS": settings.MONGO_INTERACTIVE_TIMEOUT_MS,
+            "socketTimeoutMS": settings.MONGO_INTERACTIVE_SOCKET_TIMEOUT_MS,
+        },
+    ),
+    "analytics": ConnectionProfile(
+        name="analytics",
+        client_options={
+            "maxPoolSize": settings.MONGO_ANALYTICS_MAX_POOL_SIZE,
+            "serverSelectionTimeoutMS": settings.MONGO_ANALYTICS_TIMEOUT_MS,
+            "connectTimeoutMS": settings.MONGO_ANALYTICS_TIMEOUT_MS,
+            "socketTimeoutMS": settings.MONGO_ANALYTICS_SOCKET_TIMEOUT_MS,
+            "readPreference": settings.MONGO_ANALYTICS_READ_PREFERENCE,
+        },
+        find_options={
+            "batch_size": settings.MONGO_ANALYTICS_BATCH_SIZE,
+            "allow_disk_use": settings.MONGO_ANALYTICS_ALLOW_DISK_USE,
+        },
+        aggregate_options={
+            "batchSize": settings.MONGO_ANALYTICS_BATCH_SIZE,
+            "allowDiskUse": settings.MONGO_ANALYTICS_ALLOW_DISK_USE,
+        },
+    ),
+}
+
+
+class ProfiledCollection:
+    """
+    ``Collection`` proxy that adds the profile cursor defaults to
+    ``find``, ``find_one``, ``aggregate`` and ``count_documents``, plus the
+    time left in the current request budget as ``maxTimeMS``. Explicit
+    keyword arguments always win over the defaults.
+    """
+
+    def __init__(self, collection: Collection, profile: ConnectionProfile):
+        self.collection = collection
+        self.profile = profile
+
+    @staticmethod
+    def deadline_options(key: str) -> dict[str, int]:
+        remaining = remaining_ms()
+        return {key: remaining} if remaining is not None else {}
+
+    def find(self, *args, **kwargs):
+        return self.collection.find(
+            *args,
+            **{
+                **self.profile.find_options,
+                **self.deadline_options("max_time_ms"),
+                **kwargs,
+            },
+        )
+
+    def find_one(self, filter: Any = None, *args, **kwargs):
+        return self.collection.find_one(
+            filter, *args, **{**self.deadline_options("max_time_ms"), **kwargs}
+        )
+
+    def aggregate(self, pipeline: list[dict[str, Any]], **kwargs):
+        return self.collection.aggregate(
+            pipeline,
+            **{
+                **self.profile.aggregate_options,
+                **self.deadline_options("maxTimeMS"),
+                **kwargs,
+            },
+        )
+
+    def count_documents(self, filter: dict[str, Any], **kwargs) -> int:
+        return self.collection.count_documents(
+            filter, **{**self.deadline_options("maxTimeMS"), **kwargs}
+        )
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.collection, name)
+
+
+class ProfiledDatabase:
+    def __init__(self, database: Database, profile: ConnectionProfile):
+        self.database = database
+        self.profile = profile
+
+    def __getitem__(self, name: str) -> ProfiledCollection:
+        return ProfiledCollection(self.database[name], self.profile)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.database, name)
+
+
+def _client_factory(profile: ConnectionProfile) -> Callable[[], MongoClient]:
+    return lambda: MongoClient(host=str(settings.MONGO_URI), **profile.client_options)
+
+
+clients: dict[ProfileName, ProcessLocal[MongoClient]] = {
+    name: ProcessLocal(_client_factory(profile)) for name, profile in profiles.items()
+}
+
+client: ProcessLocal[MongoClient] = clients["interactive"]
+
+engine: ProcessLocal[SyncEngine] = ProcessLocal(
+    lambda: SyncEngine(client=client.get(), database=settings.MONGO_INITDB_DATABASE)
+)
+
+
+def get_database(
+    name: str = settings.MONGO_INITDB_DATABASE, profile: ProfileName = "interactive"
+) -> ProfiledDatabase:
+    return ProfiledDatabase(clients[profile][name], profiles[profile])
+
+
+def get_collection(
+    model: type[Model], profile: ProfileName = "interactive"
+) -> ProfiledCollection:
+    """Same collection ``engine.get_collection`` returns, bound to ``profile``."""
+    return get_database(profile=profile)[model.__collection__]
+
 
-engine = SyncEngine(client=client, database=settings.MONGO_INITDB_DATABASE)
\ No newline at end of file
+def reset_clients() -> None:
+    """Drop the clients inherited from the parent process after a fork."""
+    engine.reset()
+    for process_client in clients.values():
+        process_client.reset()
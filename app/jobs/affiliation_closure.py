@@ -0,0 +1,92 @@
+"""
+Write the ``affiliation_closure`` of every work: the ids of the groups,
+departments, faculties and institutions its authors belonged to when it was
+published, plus every affiliation above them.
+
+Membership is decided on ``date_published``. Works without it keep every
+affiliation of their authors, as the per author queries the closure replaces
+did; a year range is applied afterwards on ``year_published``, like on every
+other affiliation, and leaves out the works without one.
+
+Run from the ``app`` directory after each data load, then set
+``USE_AFFILIATION_CLOSURE``: ``python -m jobs.affiliation_closure``
+"""
+from argparse import ArgumentParser
+from time import perf_counter
+from typing import Any
+
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from core.config import settings
+from core.logging import get_logger
+from infraestructure.mongo.repositories.hierarchy import AffiliationHierarchy
+from infraestructure.mongo.utils.session import get_database
+from utils.membership import MembershipIndex
+
+log = get_logger(__name__)
+
+
+def closure(
+    work: dict[str, Any],
+    memberships: MembershipIndex,
+    ancestors: dict[ObjectId, set[ObjectId]],
+) -> list[ObjectId]:
+    result = set()
+    for aff_id in memberships.affiliations_of(work):
+        result.add(aff_id)
+        result |= ancestors.get(aff_id, set())
+    return sorted(result)
+
+
+def main() -> None:
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--batch-size", type=int, default=1000, help="works updated per bulk write"
+    )
+    args = parser.parse_args()
+
+    colav_db = get_database(settings.MONGO_INITDB_DATABASE, "analytics")
+    start = perf_counter()
+    hierarchy = AffiliationHierarchy()
+    hierarchy.refresh()
+    ancestors = {
+        aff_id: {ancestor.id for ancestor in hierarchy.ancestors(aff_id)}
+        for aff_id in hierarchy.nodes
+    }
+    memberships = MembershipIndex.from_authors(
+        colav_db["person"].find(
+            {"affiliations": {"$ne": []}},
+            {
+                "affiliations.id": 1,
+                "affiliations.start_date": 1,
+                "affiliations.end_date": 1,
+            },
+        )
+    )
+    log.info(
+        f"{len(ancestors)} affiliations and {len(memberships)} authors loaded "
+        f"in {perf_counter() - start:.1f}s"
+    )
+
+    works = colav_db["works"]
+    updates, modified = [], 0
+    for work in works.find({}, {"authors.id": 1, "date_published": 1}):
+        updates.append(
+            UpdateOne(
+                {"_id": work["_id"]},
+                {"$set": {"affiliation_closure": closure(work, memberships, ancestors)}},
+            )
+        )
+        if len(updates) >= args.batch_size:
+            modified += works.bulk_write(updates, ordered=False).modified_count
+            updates = []
+    if updates:
+        modified += works.bulk_write(updates, ordered=False).modified_count
+
+    works.create_index("affiliation_closure")
+    log.info(f"{modified} works updated in {perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+"""
+Rank the coauthorship networks after each data load, so the top-k
+subgraph of any size is read as two slices.
+
+Run from the ``app`` directory: ``python -m jobs.coauthorship_network``
+"""
+from argparse import ArgumentParser
+from time import perf_counter
+
+from core.config import settings
+from core.logging import get_logger
+from infraestructure.mongo.repositories.coauthorship import (
+    CoauthorshipNetworkRepository,
+)
+from infraestructure.mongo.utils.session import get_database
+
+log = get_logger(__name__)
+
+
+def main() -> None:
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--batch-size", type=int, default=100, help="networks updated per bulk write"
+    )
+    args = parser.parse_args()
+
+    impactu_db = get_database(settings.MONGO_IMPACTU_DB, "analytics")
+    for collection in ["affiliations", "person"]:
+        start = perf_counter()
+        modified = CoauthorshipNetworkRepository.precompute(
+            impactu_db[collection], args.batch_size
+        )
+        log.info(
+            f"{collection}: {modified} networks ranked in {perf_counter() - start:.1f}s"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Write the scalar ``sort_keys`` of every work and the compound indexes the
+sorted product listings read from:
+
+- ``sort_keys.citations``: citations of the first scholar or openalex count,
+  the precedence the citation charts use, instead of sorting on the
+  ``citations_count.count`` array.
+- ``sort_keys.title``: first title lowercased, without accents and with its
+  whitespace collapsed, instead of the positional ``titles.0.title``.
+
+Run from the ``app`` directory after each data load and
+``jobs.affiliation_closure``, then set ``USE_SORT_KEYS``:
+``python -m jobs.sort_keys``
+"""
+import re
+import unicodedata
+from argparse import ArgumentParser
+from time import perf_counter
+from typing import Any
+
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+
+from core.config import settings
+from core.logging import get_logger
+from infraestructure.mongo.utils.session import get_database
+
+log = get_logger(__name__)
+
+#: Fields the product listings filter on before sorting
+FILTER_FIELDS = ["authors.id", "authors.affiliations.id", "affiliation_closure"]
+SORT_FIELDS = [
+    ("sort_keys.citations", DESCENDING),
+    ("sort_keys.title", ASCENDING),
+    ("year_published", DESCENDING),
+]
+
+
+def citations_key(citations_count: list[dict[str, Any]] | None) -> int:
+    for count in citations_count or []:
+        if count.get("source") in ["scholar", "openalex"]:
+            return count.get("count") or 0
+    return 0
+
+
+def name_key(name: str) -> str:
+    """Lowercased ``name`` without accents and with its whitespace collapsed."""
+    name = "".join(
+        char
+        for char in unicodedata.normalize("NFKD", name.lower())
+        if not unicodedata.combining(char)
+    )
+    return re.sub(r"\s+", " ", name).strip()
+
+
+def title_key(titles: list[dict[str, Any]] | None) -> str:
+    return name_key((titles or [{}])[0].get("title") or "")
+
+
+def main() -> None:
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--batch-size", type=int, default=1000, help="works updated per bulk write"
+    )
+    args = parser.parse_args()
+
+    works = get_database(settings.MONGO_INITDB_DATABASE, "analytics")["works"]
+    start = perf_counter()
+    updates, modified = [], 0
+    for work in works.find({}, {"citations_count": 1, "titles.title": 1}):
+        sort_keys = {
+            "citations": citations_key(work.get("citations_count")),
+            "title": title_key(work.get("titles")),
+        }
+        updates.append(
+            UpdateOne({"_id": work["_id"]}, {"$set": {"sort_keys": sort_keys}})
+        )
+        if len(updates) >= args.batch_size:
+            modified += works.bulk_write(updates, ordered=False).modified_count
+            updates = []
+    if updates:
+        modified += works.bulk_write(updates, ordered=False).modified_count
+    log.info(f"{modified} works updated in {perf_counter() - start:.1f}s")
+
+    for filter_field in FILTER_FIELDS:
+        for sort_field in SORT_FIELDS:
+            works.create_index([(filter_field, ASCENDING), sort_field])
+    log.info(f"indexes built in {perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
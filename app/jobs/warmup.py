@@ -0,0 +1,182 @@
+"""
+Warm the entity page caches of a running server after each data load.
+
+The top N institutions, faculties, departments, groups and authors, ranked
+by products (from ``jobs.yearly_stats``) or by their hits in an access log,
+get their info, affiliations and every plot requested through the HTTP
+API, so the results land in the caches of the server workers and the works
+they read in the Mongo cache.
+
+Run from the ``app`` directory once the server is up:
+``python -m jobs.warmup --top 50 --parallelism 4``
+"""
+import re
+from argparse import ArgumentParser
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from time import perf_counter
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlencode
+from urllib.request import urlopen
+
+from bson import ObjectId
+
+from core.config import settings
+from core.logging import get_logger
+from infraestructure.mongo.repositories.hierarchy import (
+    INSTITUTION,
+    LEVELS,
+    AffiliationHierarchy,
+)
+from infraestructure.mongo.utils.session import get_database
+from services.v1.affiliation_app import affiliation_app_service
+from services.v1.person_app import person_app_service
+
+log = get_logger(__name__)
+
+LEVEL_NAMES = {**{level: name for name, level in LEVELS.items()}, INSTITUTION: "institution"}
+ACCESS_LOG_PATH = re.compile(
+    rf"{settings.APP_V1_STR}/(?:affiliation/(?P<typ>\w+)|person)/(?P<id>[0-9a-f]{{24}})"
+)
+
+
+@dataclass(slots=True)
+class Entity:
+    kind: str
+    id: str
+
+    def urls(self, base_url: str) -> list[str]:
+        if self.kind == "person":
+            root = f"{base_url}{settings.APP_V1_STR}/person/{self.id}"
+            plots = person_app_service.plot_mapping
+            urls = [root]
+        else:
+            root = f"{base_url}{settings.APP_V1_STR}/affiliation/{self.kind}/{self.id}"
+            plots = affiliation_app_service.plot_mappings
+            urls = [root, f"{root}/affiliations"]
+        return urls + [
+            f"{root}/research/products?{urlencode({'plot': plot})}" for plot in plots
+        ]
+
+
+def top_by_products(top: int) -> list[Entity]:
+    """Entities with the most products of every kind, from the yearly stats."""
+    stats = get_database(settings.MONGO_IMPACTU_DB, "analytics")[
+        settings.YEARLY_STATS_COLLECTION
+    ]
+    nodes = AffiliationHierarchy.load(
+        get_database(settings.MONGO_INITDB_DATABASE, "analytics")
+    )
+    ranked = stats.aggregate(
+        [
+            {"$project": {"entity": 1, "products": {"$sum": "$years.products"}}},
+            {"$sort": {"products": -1}},
+        ]
+    )
+    counts: Counter = Counter()
+    entities = []
+    for entry in ranked:
+        if entry["entity"] == "person":
+            kind = "person"
+        else:
+            node = nodes.get(entry["_id"])
+            if node is None:
+                continue
+            kind = LEVEL_NAMES[node.level]
+        if counts[kind] < top:
+            counts[kind] += 1
+            entities.append(Entity(kind, str(entry["_id"])))
+        if len(counts) == len(LEVEL_NAMES) + 1 and min(counts.values()) >= top:
+            break
+    return entities
+
+
+def top_by_access_log(path: str, top: int) -> list[Entity]:
+    """Entities with the most page hits in an access log."""
+    hits: Counter = Counter()
+    with open(path) as log_file:
+        for line in log_file:
+            for match in ACCESS_LOG_PATH.finditer(line):
+                hits[(match["typ"] or "person", match["id"])] += 1
+    counts: Counter = Counter()
+    entities = []
+    for (kind, idx), _ in hits.most_common():
+        if counts[kind] < top and ObjectId.is_valid(idx):
+            counts[kind] += 1
+            entities.append(Entity(kind, idx))
+    return entities
+
+
+def fetch(url: str, timeout: float) -> tuple[int, float]:
+    start = perf_counter()
+    try:
+        with urlopen(url, timeout=timeout) as response:
+            response.read()
+            status = response.status
+    except HTTPError as error:
+        status = error.code
+    return status, perf_counter() - start
+
+
+def main() -> None:
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument("--top", type=int, default=50, help="entities of every kind")
+    parser.add_argument(
+        "--parallelism", type=int, default=4, help="requests in flight at once"
+    )
+    parser.add_argument(
+        "--base-url",
+        default=f"http://localhost:{settings.APP_PORT}",
+        help="server to warm",
+    )
+    parser.add_argument(
+        "--access-log", help="rank the entities by their hits in this access log"
+    )
+    parser.add_argument(
+        "--timeout", type=float, default=300, help="seconds allowed per request"
+    )
+    args = parser.parse_args()
+
+    if args.access_log:
+        entities = top_by_access_log(args.access_log, args.top)
+    else:
+        entities = top_by_products(args.top)
+    urls = [url for entity in entities for url in entity.urls(args.base_url)]
+    log.info(f"warming {len(entities)} entities with {len(urls)} requests")
+    if not urls:
+        return
+
+    start = perf_counter()
+    latencies: list[float] = []
+    failures: list[tuple[str, str]] = []
+    with ThreadPoolExecutor(max_workers=args.parallelism) as pool:
+        futures = {pool.submit(fetch, url, args.timeout): url for url in urls}
+        for future in as_completed(futures):
+            try:
+                status, latency = future.result()
+            except (URLError, OSError) as error:
+                failures.append((futures[future], str(error)))
+                continue
+            latencies.append(latency)
+            if status >= 400:
+                failures.append((futures[future], f"HTTP {status}"))
+    elapsed = perf_counter() - start
+
+    latencies.sort()
+    log.info(
+        f"{len(urls)} requests in {elapsed:.1f}s ({len(urls) / elapsed:.1f} req/s), "
+        f"{len(failures)} failed"
+    )
+    if latencies:
+        log.info(
+            f"latency p50 {latencies[len(latencies) // 2]:.2f}s, "
+            f"p95 {latencies[int(len(latencies) * 0.95)]:.2f}s, "
+            f"max {latencies[-1]:.2f}s"
+        )
+    for url, reason in failures:
+        log.warning(f"{reason}: {url}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+"""
+Store the per year partial aggregates of every person and affiliation read
+by ``YearlyStatsRepository``.
+
+The products of every year are also broken down by author sex and scienti
+researcher category: a person counts only itself and an affiliation every
+author of its works, except for the researcher categories of an
+institution, which count only the authors affiliated to it, as the per
+request charts did. Works without a publication year go to a bucket with a
+``None`` year, counted in the all time totals only.
+
+Run from the ``app`` directory after each data load (and after
+``jobs.affiliation_closure``): ``python -m jobs.yearly_stats``
+"""
+from argparse import ArgumentParser
+from collections import defaultdict
+from time import perf_counter
+from typing import Any
+
+from pymongo import ReplaceOne
+
+from core.config import settings
+from core.logging import get_logger
+from infraestructure.mongo.repositories.hierarchy import (
+    INSTITUTION,
+    AffiliationHierarchy,
+)
+from infraestructure.mongo.utils.session import get_database
+from utils.bars import bars
+
+log = get_logger(__name__)
+
+#: Year the APC charges are inflated to, as in the APC charts
+APC_BASE_YEAR = 2022
+
+
+#: Sex and scienti researcher categories of an author
+AuthorInfo = tuple[str | None, list[str]]
+
+
+class YearBucket:
+    __slots__ = (
+        "products",
+        "citations",
+        "open",
+        "closed",
+        "types",
+        "apc",
+        "sexes",
+        "researcher_categories",
+    )
+
+    def __init__(self):
+        self.products = 0
+        self.citations: dict[str, int] = defaultdict(int)
+        self.open = 0
+        self.closed = 0
+        self.types: dict[tuple[str, str], int] = defaultdict(int)
+        self.apc = 0.0
+        self.sexes: dict[str, int] = defaultdict(int)
+        self.researcher_categories: dict[str, int] = defaultdict(int)
+
+    def add(
+        self,
+        work: dict[str, Any],
+        apc: float,
+        sex_authors: list[AuthorInfo],
+        category_authors: list[AuthorInfo],
+    ) -> None:
+        """
+        Count ``work`` once, once per author in ``sex_authors`` for the sex
+        breakdown and once per author in ``category_authors`` for the
+        researcher category breakdown.
+        """
+        self.products += 1
+        for sex, _ in sex_authors:
+            if sex is not None:
+                self.sexes[sex] += 1
+        for _, categories in category_authors:
+            for category in categories:
+                self.researcher_categories[category] += 1
+        for count in work.get("citations_count") or []:
+            self.citations[count["source"]] += count.get("count") or 0
+        is_open_access = (work.get("bibliographic_info") or {}).get("is_open_access")
+        if is_open_access is not None:
+            if is_open_access:
+                self.open += 1
+            else:
+                self.closed += 1
+        for typ in work.get("types") or []:
+            self.types[(typ.get("source"), typ.get("type"))] += 1
+        self.apc += apc
+
+    def to_dict(self, year: int | None) -> dict[str, Any]:
+        return {
+            "year": year,
+            "products": self.products,
+            "citations": [
+                {"source": source, "count": count}
+                for source, count in self.citations.items()
+            ],
+            "open": self.open,
+            "closed": self.closed,
+            "types": [
+                {"source": source, "type": typ, "count": count}
+                for (source, typ), count in self.types.items()
+            ],
+            "apc": self.apc,
+            "sexes": [
+                {"sex": sex, "count": count} for sex, count in self.sexes.items()
+            ],
+            "researcher_categories": [
+                {"rank": rank, "count": count}
+                for rank, count in self.researcher_categories.items()
+            ],
+        }
+
+
+def load_apcs(sources) -> dict[Any, dict[str, Any]]:
+    return {
+        source["_id"]: source["apc"]
+        for source in sources.find({"apc": {"$nin": [None, {}]}}, {"apc": 1})
+        if source.get("apc")
+    }
+
+
+def load_authors(person) -> dict[Any, AuthorInfo]:
+    """Sex and scienti ranks of the authors having any of them."""
+    authors = {}
+    for author in person.find(
+        {"$or": [{"sex": {"$nin": ["", None]}}, {"ranking.source": "scienti"}]},
+        {"sex": 1, "ranking.source": 1, "ranking.rank": 1},
+    ):
+        sex = author.get("sex") or None
+        categories = [
+            rank.get("rank")
+            for rank in author.get("ranking") or []
+            if rank.get("source") == "scienti"
+        ]
+        authors[author["_id"]] = (sex, categories)
+    return authors
+
+
+def work_apc(work: dict[str, Any], apcs: dict[Any, dict[str, Any]]) -> float:
+    apc = apcs.get((work.get("source") or {}).get("id"))
+    if not apc or work.get("year_published") is None:
+        return 0.0
+    try:
+        return float(bars.apc_value(apc, work["year_published"], APC_BASE_YEAR) or 0)
+    except Exception:
+        return 0.0
+
+
+def main() -> None:
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--batch-size", type=int, default=1000, help="entities written per bulk write"
+    )
+    args = parser.parse_args()
+
+    colav_db = get_database(settings.MONGO_INITDB_DATABASE, "analytics")
+    start = perf_counter()
+    apcs = load_apcs(colav_db["sources"])
+    authors_info = load_authors(colav_db["person"])
+    nodes = AffiliationHierarchy.load(colav_db)
+
+    stats: dict[str, dict[Any, dict[int | None, YearBucket]]] = {
+        "person": defaultdict(lambda: defaultdict(YearBucket)),
+        "affiliation": defaultdict(lambda: defaultdict(YearBucket)),
+    }
+    for work in colav_db["works"].find(
+        {},
+        {
+            "year_published": 1,
+            "citations_count": 1,
+            "bibliographic_info.is_open_access": 1,
+            "types.source": 1,
+            "types.type": 1,
+            "source.id": 1,
+            "authors.id": 1,
+            "authors.affiliations.id": 1,
+            "affiliation_closure": 1,
+        },
+    ):
+        year = work.get("year_published")
+        year = int(year) if isinstance(year, (int, float)) else None
+        apc = work_apc(work, apcs)
+        authors = work.get("authors") or []
+        affiliations = set(work.get("affiliation_closure") or [])
+        for author in authors:
+            affiliations.update(
+                aff["id"] for aff in author.get("affiliations") or [] if aff.get("id")
+            )
+        for author_id in {author["id"] for author in authors if author.get("id")}:
+            author_info = (
+                [authors_info[author_id]] if author_id in authors_info else []
+            )
+            stats["person"][author_id][year].add(work, apc, author_info, author_info)
+        all_authors = [
+            authors_info[author["id"]]
+            for author in authors
+            if author.get("id") in authors_info
+        ]
+        for aff_id in affiliations:
+            node = nodes.get(aff_id)
+            if node is None or node.level == INSTITUTION:
+                # Institutions only break down the categories of the authors
+                # affiliated to them
+                category_authors = [
+                    authors_info[author["id"]]
+                    for author in authors
+                    if author.get("id") in authors_info
+                    and any(
+                        aff.get("id") == aff_id
+                        for aff in author.get("affiliations") or []
+                    )
+                ]
+            else:
+                category_authors = all_authors
+            stats["affiliation"][aff_id][year].add(
+                work, apc, all_authors, category_authors
+            )
+    log.info(
+        f"{len(stats['person'])} persons and {len(stats['affiliation'])} affiliations "
+        f"aggregated in {perf_counter() - start:.1f}s"
+    )
+
+    collection = get_database(settings.MONGO_IMPACTU_DB)[
+        settings.YEARLY_STATS_COLLECTION
+    ]
+    updates = []
+    for entity, entities in stats.items():
+        for entity_id, years in entities.items():
+            updates.append(
+                ReplaceOne(
+                    {"_id": entity_id},
+                    {
+                        "entity": entity,
+                        "years": [
+                            years[year].to_dict(year)
+                            for year in sorted(
+                                years, key=lambda year: (year is not None, year or 0)
+                            )
+                        ],
+                    },
+                    upsert=True,
+                )
+            )
+            if len(updates) >= args.batch_size:
+                collection.bulk_write(updates, ordered=False)
+                updates = []
+    if updates:
+        collection.bulk_write(updates, ordered=False)
+    log.info(f"yearly stats stored in {perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Production entrypoint.
+
+Runs the Flask app on gunicorn with the worker model configured in
+``Settings``: ``python app/server.py``. ``main.py`` keeps the development
+server.
+"""
+import os
+
+# The gevent patch must run before anything imports socket, ssl or threading,
+# core.config included (it pulls in pymongo), so SERVER_WORKER_CLASS is read
+# straight from the environment, case insensitively as Settings does.
+if any(
+    key.upper() == "SERVER_WORKER_CLASS" and value == "gevent"
+    for key, value in os.environ.items()
+):
+    from gevent import monkey
+
+    monkey.patch_all()
+
+import gc
+
+from gunicorn.app.base import BaseApplication
+
+from core.config import settings
+
+from core.logging import get_logger
+from infraestructure.mongo.repositories.facts import work_facts
+from infraestructure.mongo.utils.session import reset_clients
+from utils import assets
+
+log = get_logger(__name__)
+
+
+def post_fork(server, worker) -> None:
+    # every worker opens its own connection pools
+    reset_clients()
+    log.info(f"worker {worker.pid} ready")
+
+
+class ImpactuServer(BaseApplication):
+    def __init__(self, options: dict | None = None):
+        self.options = options or {}
+        self.application = None
+        super().__init__()
+
+    def load_config(self) -> None:
+        for key, value in self.options.items():
+            if key in self.cfg.settings and value is not None:
+                self.cfg.set(key, value)
+
+    def load(self):
+        if self.application is None:
+            from main import app
+
+            self.application = app
+        return self.application
+
+
+def get_options() -> dict:
+    return {
+        "bind": f"0.0.0.0:{settings.APP_PORT}",
+        "worker_class": settings.SERVER_WORKER_CLASS,
+        "workers": settings.SERVER_WORKERS,
+        "threads": settings.SERVER_THREADS,
+        "worker_connections": settings.SERVER_WORKER_CONNECTIONS,
+        "timeout": settings.SERVER_TIMEOUT,
+        "graceful_timeout": settings.SERVER_GRACEFUL_TIMEOUT,
+        "keepalive": settings.SERVER_KEEPALIVE,
+        "max_requests": settings.SERVER_MAX_REQUESTS,
+        "max_requests_jitter": settings.SERVER_MAX_REQUESTS_JITTER,
+        "preload_app": settings.SERVER_PRELOAD,
+        "post_fork": post_fork,
+    }
+
+
+def run() -> None:
+    server = ImpactuServer(get_options())
+    if settings.SERVER_PRELOAD:
+        assets.preload()
+        if settings.USE_FACT_TABLE:
+            work_facts.refresh()
+        server.load()
+        # keep the preloaded objects out of the collector so the workers do
+        # not touch (and copy) the shared pages
+        gc.collect()
+        gc.freeze()
+    server.run()
+
+
+if __name__ == "__main__":
+    run()
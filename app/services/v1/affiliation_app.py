@@ -1,30 +1,65 @@
 from math import nan
-from typing import Any, Callable
+from typing import Any, Callable, Iterator
 
 from bson import ObjectId
 from pymongo import ASCENDING, DESCENDING
-
-from infraestructure.mongo.utils.session import client
+from infraestructure.mongo.utils.session import ProfiledDatabase, get_database
+from infraestructure.mongo.repositories.coauthorship import (
+    CoauthorshipNetworkRepository,
+)
+from infraestructure.mongo.repositories.facts import WorkFactTable, get_work_facts
+from infraestructure.mongo.repositories.hierarchy import affiliation_hierarchy
+from infraestructure.mongo.repositories.lookups import (
+    affiliation_locations,
+    birth_years,
+    group_categories,
+    institution_name_keys,
+    publisher_keys,
+    scimago_quartiles,
+)
 from infraestructure.mongo.repositories.work import WorkRepository
+from infraestructure.mongo.repositories.yearly_stats import YearlyStatsRepository
 from infraestructure.mongo.repositories.affiliation import (
     AffiliationRepository,
     affiliation_repository,
 )
 from core.config import settings
+from core.executor import charts
+from core.singleflight import single_flight
+from services.v1.work_plots import (
+    SUBJECT_PROJECTION,
+    WORK_PLOTS,
+    reduce_works,
+    scienti_rank_plot,
+    subjects_by_level,
+    work_projection,
+)
 from utils.bars import bars
 from utils.maps import maps
+from utils.membership import MembershipIndex
 from utils.pies import pies
+from utils.years import parse_year, year_range
 from schemas.affiliation import AffiliationRelatedInfo
 
 
 class AffiliationAppService:
     def __init__(self):
-        self.colav_db = client[settings.MONGO_INITDB_DATABASE]
-        self.impactu_db = client[settings.MONGO_IMPACTU_DB]
         self.bars = bars()
         self.pies = pies()
         self.maps = maps()
 
+    @property
+    def colav_db(self) -> ProfiledDatabase:
+        return get_database(settings.MONGO_INITDB_DATABASE)
+
+    @property
+    def analytics_db(self) -> ProfiledDatabase:
+        return get_database(settings.MONGO_INITDB_DATABASE, "analytics")
+
+    @property
+    def impactu_db(self) -> ProfiledDatabase:
+        return get_database(settings.MONGO_IMPACTU_DB)
+
     def get_info(self, idx, typ, start_year=None, end_year=None):
 
         pipeline = [
@@ -57,16 +92,37 @@ class AffiliationAppService:
                 if ext["source"] == "logo":
                     logo = ext["url"]
 
+            start_year, end_year = parse_year(start_year), parse_year(end_year)
+            affiliation_type = affiliation["types"][0]["type"]
+            # Below institutions the yearly stats count the affiliation_closure
+            # works, so they only agree with the counts when those read it too
+            summary = (
+                YearlyStatsRepository.summarize(affiliation["_id"], start_year, end_year)
+                if (start_year is not None or end_year is not None)
+                and (
+                    affiliation_type in ["institution", "Education"]
+                    or settings.USE_AFFILIATION_CLOSURE
+                )
+                else None
+            )
             entry = {
                 "id": affiliation["_id"],
                 "name": name,
-                "citations_count": WorkRepository.count_citations(
+                "citations_count": summary["citations_count"]
+                if summary
+                else WorkRepository.count_citations(
                     affiliation_id=affiliation["_id"],
-                    affiliation_type=affiliation["types"][0]["type"],
+                    affiliation_type=affiliation_type,
+                    start_year=start_year,
+                    end_year=end_year,
                 ),
-                "products_count": WorkRepository.count_papers(
+                "products_count": summary["products_count"]
+                if summary
+                else WorkRepository.count_papers(
                     affiliation_id=affiliation["_id"],
-                    affiliation_type=affiliation["types"][0]["type"],
+                    affiliation_type=affiliation_type,
+                    start_year=start_year,
+                    end_year=end_year,
                 ),
                 "external_urls": [
                     ext
@@ -297,7 +353,7 @@ class AffiliationAppService:
             max_results = 250
 
         if typ:
-            if typ != "institution":
+            if self._uses_authors(typ):
                 work_ids = []
                 match_works = {}
                 if start_year or end_year:
@@ -383,7 +439,7 @@ class AffiliationAppService:
                         papers.append(self.process_work(w))
                         work_ids.append(w["_id"])
 
-            elif typ == "institution":
+            else:
                 search_dict = {}
                 if start_year or end_year:
                     search_dict["year_published"] = {}
@@ -392,7 +448,7 @@ class AffiliationAppService:
                 if end_year:
                     search_dict["year_published"]["$lte"] = end_year
                 if idx:
-                    search_dict = {"authors.affiliations.id": ObjectId(idx)}
+                    search_dict = self._works_match(idx, typ)
                 search_dict["types.type"] = {"$nin": ["department", "faculty", "group"]}
                 total = self.colav_db["works"].count_documents(search_dict)
                 cursor = self.colav_db["works"].find(search_dict)
@@ -419,26 +475,130 @@ class AffiliationAppService:
         else:
             return None
 
-    def get_products_by_year_by_type(self, idx, typ=None, aff_type: str | None = None):
-        data = []
+    def _works_match(self, idx, typ=None) -> dict[str, Any]:
+        """Filter on ``works`` selecting the products of an affiliation."""
         if typ in ["group", "department", "faculty"]:
-            for author in self.colav_db["person"].find(
-                {"affiliations.id": ObjectId(idx)}, {"affiliations": 1}
+            return {"affiliation_closure": ObjectId(idx)}
+        return {"authors.affiliations.id": ObjectId(idx)}
+
+    def _uses_authors(self, typ) -> bool:
+        return (
+            typ in ["group", "department", "faculty"]
+            and not settings.USE_AFFILIATION_CLOSURE
+        )
+
+    def _facts(self, typ) -> WorkFactTable | None:
+        """Fact table, when it holds the works of ``typ`` affiliations."""
+        if self._uses_authors(typ):
+            return None
+        return get_work_facts()
+
+    def _iter_works(
+        self, idx, typ, query: dict[str, Any], projection: dict[str, Any]
+    ) -> Iterator[dict[str, Any]]:
+        """
+        Works of an affiliation matching ``query``.
+
+        Group, department and faculty works are read with a single indexed
+        ``find`` on ``affiliation_closure`` once ``jobs.affiliation_closure``
+        has run and ``USE_AFFILIATION_CLOSURE`` is set, and author by author
+        otherwise.
+        """
+        if self._uses_authors(typ):
+            for author in self.analytics_db["person"].find(
+                {"affiliations.id": ObjectId(idx)}, {"_id": 1}
             ):
-                for work in self.colav_db["works"].find(
-                    {"authors.id": author["_id"], "year_published": {"$exists": 1}},
-                    {"year_published": 1, "types": 1},
-                ):
-                    data.append(work)
-        else:
-            for work in self.colav_db["works"].find(
+                yield from self.analytics_db["works"].find(
+                    {"authors.id": author["_id"], **query}, projection
+                )
+            return
+        yield from self.analytics_db["works"].find(
+            {**self._works_match(idx, typ), **query}, projection
+        )
+
+    def _aggregate_works(
+        self, idx, typ, query: dict[str, Any], stages: list[dict[str, Any]]
+    ) -> Iterator[dict[str, Any]]:
+        """Same as ``_iter_works`` running ``stages`` after the match."""
+        if self._uses_authors(typ):
+            for author in self.analytics_db["person"].find(
+                {"affiliations.id": ObjectId(idx)}, {"_id": 1}
+            ):
+                yield from self.analytics_db["works"].aggregate(
+                    [{"$match": {"authors.id": author["_id"], **query}}, *stages]
+                )
+            return
+        yield from self.analytics_db["works"].aggregate(
+            [{"$match": {**self._works_match(idx, typ), **query}}, *stages]
+        )
+
+    def _works_by_affiliation_id(
+        self, aff_ids: list[ObjectId], query: dict[str, Any], projection: dict[str, Any]
+    ) -> dict[ObjectId, list[dict[str, Any]]]:
+        """
+        Works matching ``query`` published by the members of every
+        affiliation in ``aff_ids`` while they belonged to it.
+
+        The works of all the affiliations are read with a single ``find``: on
+        ``affiliation_closure`` when it is set, else on their members, which
+        a ``MembershipIndex`` built from one read of the authors assigns to
+        the affiliations they count toward.
+        """
+        data = {aff_id: [] for aff_id in aff_ids}
+        if settings.USE_AFFILIATION_CLOSURE:
+            for work in self.analytics_db["works"].find(
+                {"affiliation_closure": {"$in": aff_ids}, **query},
+                {**projection, "affiliation_closure": 1},
+            ):
+                for aff_id in work["affiliation_closure"]:
+                    if aff_id in data:
+                        data[aff_id].append(work)
+            return data
+        memberships = MembershipIndex.from_authors(
+            self.analytics_db["person"].find(
+                {"affiliations.id": {"$in": aff_ids}},
                 {
-                    "authors.affiliations.id": ObjectId(idx),
-                    "year_published": {"$exists": 1},
+                    "affiliations.id": 1,
+                    "affiliations.start_date": 1,
+                    "affiliations.end_date": 1,
                 },
-                {"year_published": 1, "types": 1},
-            ):
-                data.append(work)
+            ),
+            aff_ids,
+        )
+        if not memberships:
+            return data
+        for work in self.analytics_db["works"].find(
+            {"authors.id": {"$in": memberships.authors()}, **query},
+            {**projection, "authors.id": 1, "date_published": 1},
+        ):
+            for aff_id in memberships.affiliations_of(work):
+                data[aff_id].append(work)
+        return data
+
+    def _works_by_affiliation(
+        self, affiliations, query: dict[str, Any], projection: dict[str, Any]
+    ) -> dict[str, list[dict[str, Any]]]:
+        """``_works_by_affiliation_id`` of sub affiliations, keyed by name."""
+        names = {ObjectId(aff.id): aff.name for aff in affiliations}
+        data = {name: [] for name in names.values()}
+        for aff_id, works in self._works_by_affiliation_id(
+            list(names), query, projection
+        ).items():
+            data[names[aff_id]] += works
+        return data
+
+    @year_range(YearlyStatsRepository.products_by_year_by_type)
+    def get_products_by_year_by_type(self, idx, typ=None, aff_type: str | None = None):
+        facts = self._facts(typ)
+        if facts is not None:
+            result = facts.products_by_year_by_type(facts.affiliation_rows(idx))
+            return {"plot": result or None}
+        data = self._iter_works(
+            idx,
+            typ,
+            {"year_published": {"$ne": None}},
+            {"year_published": 1, "types": 1},
+        )
         result = self.bars.products_by_year_by_type(data)
         if result:
             return {"plot": result}
@@ -478,7 +638,7 @@ class AffiliationAppService:
             },
         ]
         data = {}
-        for _data in self.colav_db["person"].aggregate(pipeline):
+        for _data in self.analytics_db["person"].aggregate(pipeline):
             if not data.get(_data["name"], False):
                 data[_data["name"]] = []
             data[_data["name"]].append(_data["work"])
@@ -486,120 +646,62 @@ class AffiliationAppService:
         return {"plot": self.bars.products_by_affiliation_by_type(data)}
 
     def get_citations_by_year(self, idx, typ=None, aff_type: str | None = None):
-        data = []
-        if typ in ["group", "department", "faculty"]:
-            for author in self.colav_db["person"].find(
-                {"affiliations.id": ObjectId(idx)}, {"affiliations": 1}
-            ):
-                for work in self.colav_db["works"].find(
-                    {
-                        "authors.id": author["_id"],
-                        "citations_by_year": {"$ne": []},
-                        "year_published": {"$exists": 1},
-                    },
-                    {"year_published": 1, "citations_by_year": 1},
-                ):
-                    data.append(work)
-        else:
-            for work in self.colav_db["works"].find(
-                {
-                    "authors.affiliations.id": ObjectId(idx),
-                    "citations_by_year": {"$ne": []},
-                    "year_published": {"$exists": 1},
-                },
-                {"year_published": 1, "citations_by_year": 1},
-            ):
-                data.append(work)
+        data = self._iter_works(
+            idx,
+            typ,
+            {"citations_by_year": {"$ne": []}, "year_published": {"$ne": None}},
+            {"year_published": 1, "citations_by_year": 1},
+        )
         result = self.bars.citations_by_year(data)
         if result:
             return {"plot": result}
         else:
             return {"plot": None}
 
+    @year_range(YearlyStatsRepository.apc_by_year)
     def get_apc_by_year(self, idx, typ=None, aff_type: str | None = None):
         data = []
-        if typ in ["group", "department", "faculty"]:
-            for author in self.colav_db["person"].find(
-                {"affiliations.id": ObjectId(idx)}, {"affiliations": 1}
-            ):
-                for work in self.colav_db["works"].find(
-                    {
-                        "authors.id": author["_id"],
-                        "year_published": {"$exists": 1},
-                        "source.id": {"$exists": 1},
-                    },
-                    {"year_published": 1, "source": 1},
-                ):
-                    if not "source" in work.keys():
-                        continue
-                    if not "id" in work["source"].keys():
-                        continue
-                    source_db = self.colav_db["sources"].find_one(
-                        {"_id": work["source"]["id"]}
+        for work in self._iter_works(
+            idx,
+            typ,
+            {"year_published": {"$ne": None}, "source.id": {"$exists": 1}},
+            {"year_published": 1, "source": 1},
+        ):
+            if not "source" in work.keys():
+                continue
+            if not "id" in work["source"].keys():
+                continue
+            source_db = self.analytics_db["sources"].find_one(
+                {"_id": work["source"]["id"]}
+            )
+            if source_db:
+                if source_db["apc"]:
+                    data.append(
+                        {
+                            "year_published": work["year_published"] or 2020,
+                            "apc": source_db["apc"],
+                        }
                     )
-                    if source_db:
-                        if source_db["apc"]:
-                            data.append(
-                                {
-                                    "year_published": work["year_published"] or 2020,
-                                    "apc": source_db["apc"],
-                                }
-                            )
-        else:
-            for work in self.colav_db["works"].find(
-                {
-                    "authors.affiliations.id": ObjectId(idx),
-                    "year_published": {"$exists": 1},
-                    "source.id": {"$exists": 1},
-                },
-                {"year_published": 1, "source": 1},
-            ):
-                if not "source" in work.keys():
-                    continue
-                if not "id" in work["source"].keys():
-                    continue
-                source_db = self.colav_db["sources"].find_one(
-                    {"_id": work["source"]["id"]}
-                )
-                if source_db:
-                    if source_db["apc"]:
-                        data.append(
-                            {
-                                "year_published": work["year_published"] or 2020,
-                                "apc": source_db["apc"],
-                            }
-                        )
-        result = self.bars.apc_by_year(data, 2022)
+        result = charts.run("year_apc", self.bars.apc_by_year, data, 2022)
         if result:
             return {"plot": result}
         else:
             return {"plot": None}
 
+    @year_range(YearlyStatsRepository.oa_by_year)
     def get_oa_by_year(self, idx, typ=None, aff_type: str | None = None):
-        data = []
-        if typ in ["group", "department", "faculty"]:
-            for author in self.colav_db["person"].find(
-                {"affiliations.id": ObjectId(idx)}, {"affiliations": 1}
-            ):
-                for work in self.colav_db["works"].find(
-                    {
-                        "authors.id": author["_id"],
-                        "bibliographic_info.is_open_access": {"$ne": None},
-                        "year_published": {"$ne": None},
-                    },
-                    {"year_published": 1, "bibliographic_info.is_open_access": 1},
-                ):
-                    data.append(work)
-        else:
-            for work in self.colav_db["works"].find(
-                {
-                    "authors.affiliations.id": ObjectId(idx),
-                    "bibliographic_info.is_open_access": {"$ne": None},
-                    "year_published": {"$ne": None},
-                },
-                {"year_published": 1, "bibliographic_info.is_open_access": 1},
-            ):
-                data.append(work)
+        facts = self._facts(typ)
+        if facts is not None:
+            return {"plot": facts.oa_by_year(facts.affiliation_rows(idx)) or None}
+        data = self._iter_works(
+            idx,
+            typ,
+            {
+                "bibliographic_info.is_open_access": {"$ne": None},
+                "year_published": {"$ne": None},
+            },
+            {"year_published": 1, "bibliographic_info.is_open_access": 1},
+        )
 
         result = self.bars.oa_by_year(data)
         if result:
@@ -610,58 +712,32 @@ class AffiliationAppService:
     def get_products_by_year_by_publisher(
         self, idx, typ=None, aff_type: str | None = None
     ):
+        facts = self._facts(typ)
+        if facts is not None:
+            result = facts.products_by_year_by_publisher(facts.affiliation_rows(idx))
+            return {"plot": result or None}
         data = []
-        if typ in ["group", "department", "faculty"]:
-            for author in self.colav_db["person"].find(
-                {"affiliations.id": ObjectId(idx)}, {"affiliations": 1}
-            ):
-                for work in self.colav_db["works"].find(
-                    {
-                        "authors.id": author["_id"],
-                        "year_published": {"$exists": 1},
-                        "source.id": {"$exists": 1},
-                    },
-                    {"year_published": 1, "source.id": 1},
-                ):
-                    if not "source" in work.keys():
-                        continue
-                    if not "id" in work["source"].keys():
-                        continue
-                    source_db = self.colav_db["sources"].find_one(
-                        {"_id": work["source"]["id"]}
+        for work in self._iter_works(
+            idx,
+            typ,
+            {"year_published": {"$ne": None}, "source.id": {"$exists": 1}},
+            {"year_published": 1, "source.id": 1},
+        ):
+            if not "source" in work.keys():
+                continue
+            if not "id" in work["source"].keys():
+                continue
+            source_db = self.analytics_db["sources"].find_one(
+                {"_id": work["source"]["id"]}
+            )
+            if source_db:
+                if source_db["publisher"]:
+                    data.append(
+                        {
+                            "year_published": work["year_published"],
+                            "publisher": source_db["publisher"],
+                        }
                     )
-                    if source_db:
-                        if source_db["publisher"]:
-                            data.append(
-                                {
-                                    "year_published": work["year_published"],
-                                    "publisher": source_db["publisher"],
-                                }
-                            )
-        else:
-            for work in self.colav_db["works"].find(
-                {
-                    "authors.affiliations.id": ObjectId(idx),
-                    "year_published": {"$exists": 1},
-                    "source.id": {"$exists": 1},
-                },
-                {"year_published": 1, "source.id": 1},
-            ):
-                if not "source" in work.keys():
-                    continue
-                if not "id" in work["source"].keys():
-                    continue
-                source_db = self.colav_db["sources"].find_one(
-                    {"_id": work["source"]["id"]}
-                )
-                if source_db:
-                    if source_db["publisher"]:
-                        data.append(
-                            {
-                                "year_published": work["year_published"],
-                                "publisher": source_db["publisher"],
-                            }
-                        )
 
         result = self.bars.products_by_year_by_publisher(data)
         if result:
@@ -670,107 +746,53 @@ class AffiliationAppService:
             return {"plot": None}
 
     def get_h_by_year(self, idx, typ=None, aff_type: str | None = None):
-        data = []
-        if typ in ["group", "department", "faculty"]:
-            for author in self.colav_db["person"].find(
-                {"affiliations.id": ObjectId(idx)}, {"affiliations": 1}
-            ):
-                for work in self.colav_db["works"].find(
-                    {"authors.id": author["_id"], "citations_by_year": {"$ne": []}},
-                    {"citations_by_year": 1},
-                ):
-                    data.append(work)
-        else:
-            for work in self.colav_db["works"].find(
-                {
-                    "authors.affiliations.id": ObjectId(idx),
-                    "citations_by_year": {"$ne": []},
-                },
-                {"citations_by_year": 1},
-            ):
-                data.append(work)
-        result = self.bars.h_index_by_year(data)
+        data = self._iter_works(
+            idx, typ, {"citations_by_year": {"$ne": []}}, {"citations_by_year": 1}
+        )
+        result = charts.run("year_h", self.bars.h_index_by_year, data)
         if result:
             return {"plot": result}
         else:
             return {"plot": None}
 
+    @year_range(YearlyStatsRepository.products_by_year_by_researcher_category)
     def get_products_by_year_by_researcher_category(
         self, idx, typ=None, aff_type: str | None = None
     ):
+        result = YearlyStatsRepository.products_by_year_by_researcher_category(idx)
+        if result is not None:
+            return {"plot": result or None}
         data = []
-        if typ in ["group", "department", "faculty"]:
-            for author in self.colav_db["person"].find(
-                {"affiliations.id": ObjectId(idx)}, {"affiliations": 1}
-            ):
-                pipeline = [
-                    {
-                        "$match": {
-                            "authors.id": author["_id"],
-                            "year_published": {"$ne": None},
-                        }
-                    },
-                    {"$project": {"year_published": 1, "authors": 1}},
-                    {"$unwind": "$authors"},
-                    {
-                        "$lookup": {
-                            "from": "person",
-                            "localField": "authors.id",
-                            "foreignField": "_id",
-                            "as": "researcher",
-                        }
-                    },
-                    {
-                        "$project": {
-                            "year_published": 1,
-                            "researcher.ranking": 1,
-                            "researcher._id": 1,
-                        }
-                    },
-                    {"$match": {"researcher.ranking.source": "scienti"}},
-                ]
-                for work in self.colav_db["works"].aggregate(pipeline):
-                    for researcher in work["researcher"]:
-                        for rank in researcher["ranking"]:
-                            if rank["source"] == "scienti":
-                                data.append(
-                                    {
-                                        "year_published": work["year_published"],
-                                        "rank": rank["rank"],
-                                    }
-                                )
-        else:
-            pipeline = [
-                {
-                    "$match": {
-                        "authors.affiliations.id": ObjectId(idx),
-                        "year_published": {"$ne": None},
-                    }
-                },
-                {"$project": {"year_published": 1, "authors": 1}},
-                {"$unwind": "$authors"},
-                {"$match": {"authors.affiliations.id": ObjectId(idx)}},
-                {
-                    "$lookup": {
-                        "from": "person",
-                        "localField": "authors.id",
-                        "foreignField": "_id",
-                        "as": "researcher",
-                    }
-                },
-                {"$project": {"year_published": 1, "researcher.ranking": 1}},
-                {"$match": {"researcher.ranking.source": "scienti"}},
-            ]
-            for work in self.colav_db["works"].aggregate(pipeline):
-                for researcher in work["researcher"]:
-                    for rank in researcher["ranking"]:
-                        if rank["source"] == "scienti":
-                            data.append(
-                                {
-                                    "year_published": work["year_published"],
-                                    "rank": rank["rank"],
-                                }
-                            )
+        stages = [
+            {"$project": {"year_published": 1, "authors": 1}},
+            {"$unwind": "$authors"},
+        ]
+        if typ not in ["group", "department", "faculty"]:
+            stages += [{"$match": {"authors.affiliations.id": ObjectId(idx)}}]
+        stages += [
+            {
+                "$lookup": {
+                    "from": "person",
+                    "localField": "authors.id",
+                    "foreignField": "_id",
+                    "as": "researcher",
+                }
+            },
+            {"$project": {"year_published": 1, "researcher.ranking": 1}},
+            {"$match": {"researcher.ranking.source": "scienti"}},
+        ]
+        for work in self._aggregate_works(
+            idx, typ, {"year_published": {"$ne": None}}, stages
+        ):
+            for researcher in work["researcher"]:
+                for rank in researcher["ranking"]:
+                    if rank["source"] == "scienti":
+                        data.append(
+                            {
+                                "year_published": work["year_published"],
+                                "rank": rank["rank"],
+                            }
+                        )
         result = self.bars.products_by_year_by_researcher_category(data)
         if result:
             return {"plot": result}
@@ -780,72 +802,38 @@ class AffiliationAppService:
     def get_products_by_year_by_group_category(
         self, idx, typ=None, aff_type: str | None = None
     ):
+        node = affiliation_hierarchy.get(idx)
+        if node is None:
+            return {"plot": None}
         data = []
-        info_db = self.colav_db["affiliations"].find_one(
-            {"_id": ObjectId(idx)}, {"types": 1, "relations": 1, "ranking": 1}
-        )
-        db_type = ""
-        for typ in info_db["types"]:
-            if typ["type"] == "group":
-                db_type = typ["type"]
-                break
-            elif typ["type"] == "department":
-                db_type = typ["type"]
-                break
-            elif typ["type"] == "faculty":
-                db_type = typ["type"]
-                break
-            else:
-                db_type = "institution"
-                break
-
-        if db_type == "group":
-            for work in self.colav_db["works"].find(
+        if node.type == "group":
+            for work in self.analytics_db["works"].find(
                 {
                     "authors.affiliations.id": ObjectId(idx),
-                    "year_published": {"$exists": 1},
+                    "year_published": {"$ne": None},
                 },
                 {"year_published": 1},
             ):
-                work["ranking"] = info_db["ranking"]
-                data.append(work)
+                category = group_categories.category(node.id, work["year_published"])
+                if category is not None:
+                    data.append((work["year_published"], category))
         else:
-            groups = self.colav_db["affiliations"].find(
-                {"relations.id": ObjectId(idx), "types.type": "group"},
-                {"_id": 1, "ranking": 1},
-            )
-            for group in groups:
-                authors = self.colav_db["person"].find(
-                    {"affiliations.id": group["_id"]}, {"affiliations": 1}
-                )
-                for author in authors:
-                    aff_start_date = None
-                    aff_end_date = None
-                    for aff in author["affiliations"]:
-                        if aff["id"] == group["_id"]:
-                            aff_start_date = (
-                                aff["start_date"]
-                                if aff["start_date"] != -1
-                                else 9999999999
-                            )
-                            aff_end_date = (
-                                aff["end_date"] if aff["end_date"] != -1 else 9999999999
-                            )
-                            break
-                    query_dict = {
-                        "authors.id": author["_id"],
-                        "ranking": {"$ne": []},
-                        "$and": [
-                            {"date_published": {"$lte": aff_end_date}},
-                            {"date_published": {"$gte": aff_start_date}},
-                        ],
-                    }
-                    for work in self.colav_db["works"].find(
-                        query_dict, {"year_published": 1, "date_published": 1}
-                    ):
-                        work["ranking"] = group["ranking"]
-                        data.append(work)
-        # print(data)
+            groups = [
+                aff_id
+                for aff_id in node.referrers
+                if affiliation_hierarchy.get(aff_id).has_type("group")
+            ]
+            for group_id, works in self._works_by_affiliation_id(
+                groups,
+                {"ranking": {"$ne": []}, "year_published": {"$ne": None}},
+                {"year_published": 1},
+            ).items():
+                for work in works:
+                    category = group_categories.category(
+                        group_id, work["year_published"]
+                    )
+                    if category is not None:
+                        data.append((work["year_published"], category))
         result = self.bars.products_by_year_by_group_category(data)
         return {"plot": result}
 
@@ -866,196 +854,122 @@ class AffiliationAppService:
             return None
         affiliations = affiliation_repository.get_affiliations_related_type(idx, typ, aff_type)
 
-        data = {}
-        for aff in affiliations:
-            aff_id = aff.id
-            name = aff.name
-            data[name] = []
-            for author in self.colav_db["person"].find({"affiliations.id": ObjectId(aff_id)}):
-                aff_start_date = None
-                aff_end_date = None
-                for aff in author["affiliations"]:
-                    if aff["id"] == aff_id:
-                        aff_start_date = (
-                            aff["start_date"] if aff["start_date"] != -1 else 9999999999
-                        )
-                        aff_end_date = (
-                            aff["end_date"] if aff["end_date"] != -1 else 9999999999
-                        )
-                        break
-                query_dict = {
-                    "authors.id": author["_id"],
-                    "citations_count": {"$ne": []},
-                    "$and": [
-                        {"date_published": {"$lte": aff_end_date}},
-                        {"date_published": {"$gte": aff_start_date}},
-                    ],
-                }
-
-                for work in self.colav_db["works"].find(
-                    query_dict, {"citations_count": 1}
-                ):
-                    data[name].append(work)
+        facts = self._facts(typ)
+        if facts is not None:
+            counts = {
+                aff.name: facts.cited_products_count(facts.affiliation_rows(aff.id))
+                for aff in affiliations
+            }
+            return self.pies.from_counts(
+                {name: count for name, count in counts.items() if count}
+            )
+        data = self._works_by_affiliation(
+            affiliations, {"citations_count": {"$ne": []}}, {"citations_count": 1}
+        )
 
         return self.pies.citations_by_affiliation(data)
 
     def get_products_by_affiliations(self, idx, typ, aff_type: str | None = None):
         affiliations = affiliation_repository.get_affiliations_related_type(idx, typ, aff_type)
 
-        data = {}
-        for aff in affiliations:
-            aff_id = aff.id
-            name = aff.name
-            data[name] = 0
-            for author in self.colav_db["person"].find({"affiliations.id": ObjectId(aff_id)}):
-                aff_start_date = None
-                aff_end_date = None
-                for aff in author["affiliations"]:
-                    if aff["id"] == aff_id:
-                        aff_start_date = (
-                            aff["start_date"] if aff["start_date"] != -1 else 9999999999
-                        )
-                        aff_end_date = (
-                            aff["end_date"] if aff["end_date"] != -1 else 9999999999
-                        )
-                        break
-                query_dict = {
-                    "authors.id": author["_id"],
-                    "$and": [
-                        {"date_published": {"$lte": aff_end_date}},
-                        {"date_published": {"$gte": aff_start_date}},
-                    ],
-                }
-
-                data[name] += self.colav_db["works"].count_documents(query_dict)
+        facts = self._facts(typ)
+        if facts is not None:
+            return self.pies.products_by_affiliation(
+                {aff.name: len(facts.affiliation_rows(aff.id)) for aff in affiliations}
+            )
+        data = {
+            name: len(works)
+            for name, works in self._works_by_affiliation(
+                affiliations, {}, {"_id": 1}
+            ).items()
+        }
 
         return self.pies.products_by_affiliation(data)
 
     def get_apc_by_affiliations(self, idx, typ, aff_type: str | None = None):
         affiliations = affiliation_repository.get_affiliations_related_type(idx, typ, aff_type)
 
-        data = {}
-        for aff in affiliations:
-            aff_id = aff.id
-            name = aff.name
-            data[name] = []
-            for author in self.colav_db["person"].find({"affiliations.id": ObjectId(aff_id)}):
-                aff_start_date = None
-                aff_end_date = None
-                for aff in author["affiliations"]:
-                    if aff["id"] == aff_id:
-                        aff_start_date = (
-                            aff["start_date"] if aff["start_date"] != -1 else 9999999999
-                        )
-                        aff_end_date = (
-                            aff["end_date"] if aff["end_date"] != -1 else 9999999999
-                        )
-                        break
-                query_dict = {
-                    "authors.id": author["_id"],
-                    "source": {"$ne": []},
-                    "$and": [
-                        {"date_published": {"$lte": aff_end_date}},
-                        {"date_published": {"$gte": aff_start_date}},
-                    ],
-                }
-
-                for work in self.colav_db["works"].find(
-                    query_dict, {"source": 1, "year_published": 1}
-                ):
-                    if not "id" in work["source"].keys():
-                        continue
-                    source_db = self.colav_db["sources"].find_one(
-                        {"_id": work["source"]["id"]}
-                    )
-                    if source_db:
-                        if source_db["apc"]:
-                            source_db["apc"]["year_published"] = work["year_published"]
-                            data[name].append(source_db["apc"])
+        works = self._works_by_affiliation(
+            affiliations,
+            {"source.id": {"$exists": 1}},
+            {"source.id": 1, "year_published": 1},
+        )
+        source_ids = {
+            work["source"]["id"]
+            for affiliation_works in works.values()
+            for work in affiliation_works
+        }
+        apcs = {
+            source["_id"]: source["apc"]
+            for source in self.analytics_db["sources"].find(
+                {"_id": {"$in": list(source_ids)}}, {"apc": 1}
+            )
+            if source.get("apc")
+        }
+        data = {
+            name: [
+                {**apcs[work["source"]["id"]], "year_published": work["year_published"]}
+                for work in affiliation_works
+                if work["source"]["id"] in apcs
+            ]
+            for name, affiliation_works in works.items()
+        }
 
-        return self.pies.apc_by_affiliation(data, 2022)
+        return charts.run(f"apc,{typ}", self.pies.apc_by_affiliation, data, 2022)
 
     def get_h_by_affiliations(self, idx, typ, aff_type: str | None = None):
         affiliations = affiliation_repository.get_affiliations_related_type(idx, typ, aff_type)
 
+        facts = self._facts(typ)
+        if facts is not None:
+            return self.pies.hindex_by_affiliation(
+                {
+                    aff.name: facts.cited_products_citations(
+                        facts.affiliation_rows(aff.id)
+                    )
+                    for aff in affiliations
+                }
+            )
         data = {}
-        for aff in affiliations:
-            aff_id = aff.id
-            name = aff.name
+        for name, works in self._works_by_affiliation(
+            affiliations, {"citations_count": {"$ne": []}}, {"citations_count": 1}
+        ).items():
             data[name] = []
-            for author in self.colav_db["person"].find({"affiliations.id": ObjectId(aff_id)}):
-                aff_start_date = None
-                aff_end_date = None
-                for aff in author["affiliations"]:
-                    if aff["id"] == aff_id:
-                        aff_start_date = (
-                            aff["start_date"] if aff["start_date"] != -1 else 9999999999
-                        )
-                        aff_end_date = (
-                            aff["end_date"] if aff["end_date"] != -1 else 9999999999
-                        )
+            for work in works:
+                citations = 0
+                for count in work["citations_count"]:
+                    if count["source"] == "scholar":
+                        citations = count["count"]
                         break
-                query_dict = {
-                    "authors.id": author["_id"],
-                    "citation_count": {"$ne": []},
-                    "$and": [
-                        {"date_published": {"$lte": aff_end_date}},
-                        {"date_published": {"$gte": aff_start_date}},
-                    ],
-                }
-
-                for work in self.colav_db["works"].find(
-                    query_dict, {"citations_count": 1}
-                ):
-                    citations = 0
-                    for count in work["citations_count"]:
-                        if count["source"] == "scholar":
-                            citations = count["count"]
-                            break
-                        elif count["source"] == "openalex":
-                            citations = count["count"]
-                            break
-                    if citations == 0:
-                        continue
-                    data[name].append(citations)
+                    elif count["source"] == "openalex":
+                        citations = count["count"]
+                        break
+                if citations == 0:
+                    continue
+                data[name].append(citations)
 
-        return self.pies.hindex_by_affiliation(data)
+        return charts.run(f"h,{typ}", self.pies.hindex_by_affiliation, data)
 
     def get_products_by_publisher(self, idx, typ=None, aff_type: str | None = None):
+        facts = self._facts(typ)
+        if facts is not None:
+            return self.pies.from_counts(
+                facts.publisher_counts(facts.affiliation_rows(idx))
+            )
         data = []
-        if typ in ["group", "department", "faculty"]:
-            for author in self.colav_db["person"].find(
-                {"affiliations.id": ObjectId(idx)}, {"affiliations": 1}
-            ):
-                for work in self.colav_db["works"].find(
-                    {"authors.id": author["_id"], "source.id": {"$exists": 1}},
-                    {"source.id": 1},
-                ):
-                    if not "source" in work.keys():
-                        continue
-                    if not "id" in work["source"].keys():
-                        continue
-                    source_db = self.colav_db["sources"].find_one(
-                        {"_id": work["source"]["id"], "publisher.name": {"$ne": nan}}
-                    )
-                    if source_db:
-                        if source_db["publisher"]:
-                            data.append({"publisher": source_db["publisher"]})
-        else:
-            for work in self.colav_db["works"].find(
-                {"authors.affiliations.id": ObjectId(idx), "source.id": {"$exists": 1}},
-                {"source.id": 1},
-            ):
-                if not "source" in work.keys():
-                    continue
-                if not "id" in work["source"].keys():
-                    continue
-                source_db = self.colav_db["sources"].find_one(
-                    {"_id": work["source"]["id"], "publisher.name": {"$ne": nan}}
-                )
-                if source_db:
-                    if source_db["publisher"]:
-                        data.append({"publisher": source_db["publisher"]})
+        for work in self._iter_works(
+            idx, typ, {"source.id": {"$exists": 1}}, {"source.id": 1}
+        ):
+            if not "source" in work.keys():
+                continue
+            if not "id" in work["source"].keys():
+                continue
+            source_db = self.analytics_db["sources"].find_one(
+                {"_id": work["source"]["id"], "publisher.name": {"$ne": nan}}
+            )
+            if source_db:
+                if source_db["publisher"]:
+                    data.append({"publisher": source_db["publisher"]})
 
         result = self.pies.products_by_publisher(data)
         if result:
@@ -1066,64 +980,18 @@ class AffiliationAppService:
     def get_products_by_subject(
         self, idx, level: int = 0, typ: str = None, aff_type: str | None = None
     ):
-        if not level:
-            level = 0
-        data = []
-        if typ in ["group", "department", "faculty"]:
-            for author in self.colav_db["person"].find(
-                {"affiliations.id": ObjectId(idx)}, {"affiliations": 1}
-            ):
-                for work in self.colav_db["works"].find(
-                    {"authors.id": author["_id"], "subjects": {"$exists": 1}},
-                    {"subjects": 1},
-                ):
-                    if not "subjects" in work.keys():
-                        continue
-                    for subjects in work["subjects"]:
-                        if subjects["source"] != "openalex":
-                            continue
-                        for subject in subjects["subjects"]:
-                            if subject["level"] != level:
-                                continue
-                            name = subject.get("name", "No name specified")
-                            data.append({"subject": {"name": name}})
-        else:
-            for work in self.colav_db["works"].find(
-                {"authors.affiliations.id": ObjectId(idx), "subjects": {"$exists": 1}},
-                {"subjects": 1},
-            ):
-                if not "subjects" in work.keys():
-                    continue
-                for subjects in work["subjects"]:
-                    if subjects["source"] != "openalex":
-                        continue
-                    for subject in subjects["subjects"]:
-                        if subject["level"] != level:
-                            continue
-                        name = subject.get("name", "No name specified")
-                        data.append({"subject": {"name": name}})
-
-        result = self.pies.products_by_subject(data)
-        if result:
-            return result
-        else:
-            return {"plot": None}
+        counts = subjects_by_level(
+            ("affiliation", str(idx), typ),
+            lambda: self._iter_works(
+                idx, typ, {"subjects": {"$exists": 1}}, SUBJECT_PROJECTION
+            ),
+        )
+        return self.pies.from_counts(counts.get(int(level or 0), {}))
 
     def get_products_by_database(self, idx, typ=None, aff_type: str | None = None):
-        data = []
-        if typ in ["group", "department", "faculty"]:
-            for author in self.colav_db["person"].find(
-                {"affiliations.id": ObjectId(idx)}, {"affiliations": 1}
-            ):
-                for work in self.colav_db["works"].find(
-                    {"authors.id": author["_id"]}, {"updated": 1}
-                ):
-                    data.append(work["updated"])
-        else:
-            for work in self.colav_db["works"].find(
-                {"authors.affiliations.id": ObjectId(idx)}, {"updated": 1}
-            ):
-                data.append(work["updated"])
+        data = (
+            work["updated"] for work in self._iter_works(idx, typ, {}, {"updated": 1})
+        )
 
         result = self.pies.products_by_database(data)
         if result:
@@ -1134,79 +1002,43 @@ class AffiliationAppService:
     def get_products_by_open_access_status(
         self, idx, typ=None, aff_type: str | None = None
     ):
-        data = []
-        if typ in ["group", "department", "faculty"]:
-            for author in self.colav_db["person"].find(
-                {"affiliations.id": ObjectId(idx)}, {"affiliations": 1}
-            ):
-                for work in self.colav_db["works"].find(
-                    {
-                        "authors.id": author["_id"],
-                        "bibliographic_info.open_access_status": {
-                            "$exists": 1,
-                            "$ne": None,
-                        },
-                    },
-                    {"bibliographic_info.open_access_status": 1},
-                ):
-                    data.append(work["bibliographic_info"]["open_access_status"])
-        else:
-            for work in self.colav_db["works"].find(
-                {
-                    "authors.affiliations.id": ObjectId(idx),
-                    "bibliographic_info.open_access_status": {
-                        "$exists": 1,
-                        "$ne": None,
-                    },
-                },
+        facts = self._facts(typ)
+        if facts is not None:
+            return self.pies.from_counts(
+                facts.open_access_status_counts(facts.affiliation_rows(idx))
+            )
+        data = (
+            work["bibliographic_info"]["open_access_status"]
+            for work in self._iter_works(
+                idx,
+                typ,
+                {"bibliographic_info.open_access_status": {"$exists": 1, "$ne": None}},
                 {"bibliographic_info.open_access_status": 1},
-            ):
-                data.append(work["bibliographic_info"]["open_access_status"])
+            )
+        )
 
         result = self.pies.products_by_open_access_status(data)
         return result
 
     def get_products_by_author_sex(self, idx, typ=None, aff_type: str | None = None):
-        data = []
-        if typ in ["group", "department", "faculty"]:
-            for author in self.colav_db["person"].find(
-                {"affiliations.id": ObjectId(idx)}, {"affiliations": 1}
-            ):
-                pipeline = [
-                    {"$match": {"authors.id": author["_id"]}},
-                    {"$project": {"authors": 1}},
-                    {"$unwind": "$authors"},
-                    {
-                        "$lookup": {
-                            "from": "person",
-                            "localField": "authors.id",
-                            "foreignField": "_id",
-                            "as": "author",
-                        }
-                    },
-                    {"$project": {"author.sex": 1}},
-                    {"$match": {"author.sex": {"$ne": "", "$exists": 1}}},
-                ]
-                for work in self.colav_db["works"].aggregate(pipeline):
-                    data.append(work)
-        else:
-            pipeline = [
-                {"$match": {"authors.affiliations.id": ObjectId(idx)}},
-                {"$project": {"authors": 1}},
-                {"$unwind": "$authors"},
-                {
-                    "$lookup": {
-                        "from": "person",
-                        "localField": "authors.id",
-                        "foreignField": "_id",
-                        "as": "author",
-                    }
-                },
-                {"$project": {"author.sex": 1}},
-                {"$match": {"author.sex": {"$ne": "", "$exists": 1}}},
-            ]
-            for work in self.colav_db["works"].aggregate(pipeline):
-                data.append(work)
+        counts = YearlyStatsRepository.products_by_sex(idx)
+        if counts is not None:
+            return self.pies.from_counts(counts)
+        stages = [
+            {"$project": {"authors": 1}},
+            {"$unwind": "$authors"},
+            {
+                "$lookup": {
+                    "from": "person",
+                    "localField": "authors.id",
+                    "foreignField": "_id",
+                    "as": "author",
+                }
+            },
+            {"$project": {"author.sex": 1}},
+            {"$match": {"author.sex": {"$ne": "", "$exists": 1}}},
+        ]
+        data = self._aggregate_works(idx, typ, {}, stages)
 
         result = self.pies.products_by_sex(data)
         if result:
@@ -1215,100 +1047,43 @@ class AffiliationAppService:
             return {"plot": None}
 
     def get_products_by_author_age(self, idx, typ=None, aff_type: str | None = None):
-        data = []
-        if typ in ["group", "department", "faculty"]:
-            for author in self.colav_db["person"].find(
-                {"affiliations.id": ObjectId(idx)}, {"affiliations": 1}
-            ):
-                pipeline = [
-                    {
-                        "$match": {
-                            "authors.id": author["_id"],
-                            "date_published": {"$ne": None},
-                        },
-                    },
-                    {
-                        "$project": {
-                            "authors": 1,
-                            "date_published": 1,
-                            "year_published": 1,
-                        }
-                    },
-                    {"$unwind": "$authors"},
-                    # {"$match":{"authors.affiliations.id":ObjectId(idx)}},
-                    {
-                        "$lookup": {
-                            "from": "person",
-                            "localField": "authors.id",
-                            "foreignField": "_id",
-                            "as": "author",
-                        }
-                    },
-                    {
-                        "$project": {
-                            "author.birthdate": 1,
-                            "date_published": 1,
-                            "year_published": 1,
-                        }
-                    },
-                    {"$match": {"author.birthdate": {"$nin": [-1, ""], "$exists": 1}}},
-                ]
-                for work in self.colav_db["works"].aggregate(pipeline):
-                    data.append(work)
-        else:
-            pipeline = [
-                {
-                    "$match": {
-                        "authors.affiliations.id": ObjectId(idx),
-                        "date_published": {"$ne": None},
-                    }
-                },
-                {"$project": {"authors": 1, "date_published": 1, "year_published": 1}},
-                {"$unwind": "$authors"},
-                {"$match": {"authors.affiliations.id": ObjectId(idx)}},
-                {
-                    "$lookup": {
-                        "from": "person",
-                        "localField": "authors.id",
-                        "foreignField": "_id",
-                        "as": "author",
-                    }
-                },
-                {
-                    "$project": {
-                        "author.birthdate": 1,
-                        "date_published": 1,
-                        "year_published": 1,
-                    }
-                },
-                {"$match": {"author.birthdate": {"$nin": [-1, ""], "$exists": 1}}},
-            ]
-            for work in self.colav_db["works"].aggregate(pipeline):
-                data.append(work)
+        members_only = typ not in ["group", "department", "faculty"]
+        authors_birth_years, dates_published = [], []
+        for work in self._iter_works(
+            idx,
+            typ,
+            {"date_published": {"$ne": None}},
+            {"authors.id": 1, "authors.affiliations.id": 1, "date_published": 1},
+        ):
+            for author in work.get("authors") or []:
+                if members_only and not any(
+                    aff.get("id") == ObjectId(idx)
+                    for aff in author.get("affiliations") or []
+                ):
+                    continue
+                birth_year = birth_years.get(author.get("id"))
+                if birth_year is not None:
+                    authors_birth_years.append(birth_year)
+                    dates_published.append(work["date_published"])
 
-        result = self.pies.products_by_age(data)
+        result = self.pies.products_by_age(authors_birth_years, dates_published)
         if result:
             return result
         else:
             return {"plot": None}
 
     def get_products_by_scienti_rank(self, idx, typ=None, aff_type: str | None = None):
-        data = []
-        if typ in ["group", "department", "faculty"]:
-            for author in self.colav_db["person"].find(
-                {"affiliations.id": ObjectId(idx)}, {"affiliations": 1}
-            ):
-                for work in self.colav_db["works"].find(
-                    {"authors.id": author["_id"], "ranking": {"$ne": []}, "ranking.rank": {"$ne": None}},
-                    {"ranking": 1},
-                ):
-                    data.append(work)
-        else:
-            for work in self.colav_db["works"].find(
-                {"authors.affiliations.id": ObjectId(idx), "ranking": {"$ne": []}, "ranking.rank": {"$ne": None}},
-                {"ranking": 1},
-            ):
-                data.append(work)
+        facts = self._facts(typ)
+        if facts is not None:
+            return self.pies.from_counts(
+                facts.scienti_rank_counts(facts.affiliation_rows(idx))
+            )
+        data = self._iter_works(
+            idx,
+            typ,
+            {"ranking": {"$ne": []}, "ranking.rank": {"$ne": None}},
+            {"ranking": 1},
+        )
         result = self.pies.products_by_scienti_rank(data)
         if result:
             return result
@@ -1316,56 +1091,13 @@ class AffiliationAppService:
             return {"plot": None}
 
     def get_products_by_scimago_rank(self, idx, typ=None, aff_type: str | None = None):
-        data = []
-        if typ in ["group", "department", "faculty"]:
-            for author in self.colav_db["person"].find(
-                {"affiliations.id": ObjectId(idx)}, {"affiliations": 1}
-            ):
-                pipeline = [
-                    {
-                        "$match": {
-                            "authors.id": author["_id"],
-                            "date_published": {"$ne": None},
-                        }
-                    },
-                    {"$project": {"source": 1, "date_published": 1}},
-                    {
-                        "$lookup": {
-                            "from": "sources",
-                            "localField": "source.id",
-                            "foreignField": "_id",
-                            "as": "source",
-                        }
-                    },
-                    {"$unwind": "$source"},
-                    {"$project": {"source.ranking": 1, "date_published": 1}},
-                ]
-                for work in self.colav_db["works"].aggregate(pipeline):
-                    data.append(work)
-        else:
-            pipeline = [
-                {
-                    "$match": {
-                        "authors.affiliations.id": ObjectId(idx),
-                        "date_published": {"$ne": None},
-                    }
-                },
-                {"$project": {"source": 1, "date_published": 1}},
-                {
-                    "$lookup": {
-                        "from": "sources",
-                        "localField": "source.id",
-                        "foreignField": "_id",
-                        "as": "source",
-                    }
-                },
-                {"$unwind": "$source"},
-                {"$project": {"source.ranking": 1, "date_published": 1}},
-            ]
-            for work in self.colav_db["works"].aggregate(pipeline):
-                data.append(work)
-
-        result = self.pies.products_by_scimago_rank(data)
+        works = self._iter_works(
+            idx,
+            typ,
+            {"date_published": {"$ne": None}, "source.id": {"$exists": 1}},
+            {"source.id": 1, "date_published": 1},
+        )
+        result = self.pies.products_by_scimago_rank(scimago_quartiles.quartiles(works))
         if result:
             return result
         else:
@@ -1374,215 +1106,94 @@ class AffiliationAppService:
     def get_publisher_same_institution(
         self, idx, typ=None, aff_type: str | None = None
     ):
-        data = []
-        institution = self.colav_db["affiliations"].find_one(
-            {"_id": ObjectId(idx)}, {"names": 1}
+        works = self._iter_works(
+            idx, typ, {"source.id": {"$exists": 1}}, {"source.id": 1}
+        )
+        result = self.pies.products_editorial_same_institution(
+            publisher_keys.publishers(works), institution_name_keys(idx)
         )
-        pipeline = [
-            {
-                '$match': {
-                    'affiliations.id': ObjectId(idx)
-                }
-            }, {
-                '$project': {
-                    '_id': 1
-                }
-            }, {
-                '$lookup': {
-                    'from': 'works', 
-                    'localField': '_id', 
-                    'foreignField': 'authors.id', 
-                    'as': 'work'
-                }
-            }, {
-                '$unwind': '$work'
-            }, {
-                '$replaceRoot': {
-                    'newRoot': '$work'
-                }
-            },
-            {"$project": {"source": 1}},
-            {
-                "$lookup": {
-                    "from": "sources",
-                    "localField": "source.id",
-                    "foreignField": "_id",
-                    "as": "source",
-                }
-            },
-            {"$unwind": "$source"},
-            {"$project": {"source.publisher": 1}},
-            {
-                "$match": {
-                    "source.publisher": {"$exists": 1, "$not": {"$type": "string"}},
-                    "source.publisher.name": {"$type": "string"},
-                }
-            },
-        ]
-        for work in self.colav_db["person"].aggregate(pipeline):
-            data.append(work)
-        result = self.pies.products_editorial_same_institution(data, institution)
         if result:
             return result
         else:
             return {"plot": None}
 
-    def get_coauthorships_worldmap(self, idx, typ=None, aff_type: str | None = None):
-        data = []
-        if typ in ["group", "department", "faculty"]:
-            for author in self.colav_db["person"].find(
-                {"affiliations.id": ObjectId(idx)}, {"affiliations": 1}
-            ):
-                pipeline = [
-                    {"$match": {"authors.id": author["_id"]}},
-                    {"$unwind": "$authors"},
-                    {
-                        "$group": {
-                            "_id": "$authors.affiliations.id",
-                            "count": {"$sum": 1},
-                        }
-                    },
-                    {"$unwind": "$_id"},
-                    {
-                        "$lookup": {
-                            "from": "affiliations",
-                            "localField": "_id",
-                            "foreignField": "_id",
-                            "as": "affiliation",
-                        }
-                    },
-                    {
-                        "$project": {
-                            "count": 1,
-                            "affiliation.addresses.country_code": 1,
-                            "affiliation.addresses.country": 1,
-                        }
-                    },
-                    {"$unwind": "$affiliation"},
-                    {"$unwind": "$affiliation.addresses"},
-                ]
-                for work in self.colav_db["works"].aggregate(pipeline):
-                    data.append(work)
-        else:
-            pipeline = [
-                {"$match": {"authors.affiliations.id": ObjectId(idx)}},
-                {"$unwind": "$authors"},
-                {"$group": {"_id": "$authors.affiliations.id", "count": {"$sum": 1}}},
-                {"$unwind": "$_id"},
-                {
-                    "$lookup": {
-                        "from": "affiliations",
-                        "localField": "_id",
-                        "foreignField": "_id",
-                        "as": "affiliation",
-                    }
-                },
-                {
-                    "$project": {
-                        "count": 1,
-                        "affiliation.addresses.country_code": 1,
-                        "affiliation.addresses.country": 1,
-                    }
-                },
-                {"$unwind": "$affiliation"},
-                {"$unwind": "$affiliation.addresses"},
+    def _coauthor_counts(self, idx, typ) -> dict[ObjectId, int]:
+        """Coauthors of all the works of an affiliation per affiliation id."""
+        if self._uses_authors(typ):
+            members = [
+                author["_id"]
+                for author in self.analytics_db["person"].find(
+                    {"affiliations.id": ObjectId(idx)}, {"_id": 1}
+                )
             ]
-            for work in self.colav_db["works"].aggregate(pipeline):
-                data.append(work)
-        result = self.maps.get_coauthorship_world_map(data)
+            match = {"authors.id": {"$in": members}}
+        else:
+            match = self._works_match(idx, typ)
+        return WorkRepository.count_coauthors_by_affiliation(match)
+
+    def get_coauthorships_worldmap(self, idx, typ=None, aff_type: str | None = None):
+        countries = affiliation_locations.by_country(self._coauthor_counts(idx, typ))
+        result = charts.run(
+            "collaboration_worldmap", self.maps.get_coauthorship_world_map, countries
+        )
         if result:
             return {"plot": result}
         else:
             return {"plot": None}
 
     def get_coauthorships_colombiamap(self, idx, typ=None, aff_type: str | None = None):
-        data = []
-        if typ in ["group", "department", "faculty"]:
-            for author in self.colav_db["person"].find(
-                {"affiliations.id": ObjectId(idx)}, {"affiliations": 1}
-            ):
-                pipeline = [
-                    {"$match": {"authors.id": author["_id"]}},
-                    {"$unwind": "$authors"},
-                    {
-                        "$group": {
-                            "_id": "$authors.affiliations.id",
-                            "count": {"$sum": 1},
-                        }
-                    },
-                    {"$unwind": "$_id"},
-                    {
-                        "$lookup": {
-                            "from": "affiliations",
-                            "localField": "_id",
-                            "foreignField": "_id",
-                            "as": "affiliation",
-                        }
-                    },
-                    {
-                        "$project": {
-                            "count": 1,
-                            "affiliation.addresses.country_code": 1,
-                            "affiliation.addresses.city": 1,
-                        }
-                    },
-                    {"$unwind": "$affiliation"},
-                    {"$unwind": "$affiliation.addresses"},
-                ]
-                for work in self.colav_db["works"].aggregate(pipeline):
-                    data.append(work)
-        else:
-            pipeline = [
-                {"$match": {"authors.affiliations.id": ObjectId(idx)}},
-                {"$unwind": "$authors"},
-                {"$group": {"_id": "$authors.affiliations.id", "count": {"$sum": 1}}},
-                {"$unwind": "$_id"},
-                {
-                    "$lookup": {
-                        "from": "affiliations",
-                        "localField": "_id",
-                        "foreignField": "_id",
-                        "as": "affiliation",
-                    }
-                },
-                {
-                    "$project": {
-                        "count": 1,
-                        "affiliation.addresses.country_code": 1,
-                        "affiliation.addresses.city": 1,
-                    }
-                },
-                {"$unwind": "$affiliation"},
-                {"$unwind": "$affiliation.addresses"},
-            ]
-            for work in self.colav_db["works"].aggregate(pipeline):
-                data.append(work)
-        result = self.maps.get_coauthorship_colombia_map(data)
+        departments = affiliation_locations.by_department(
+            self._coauthor_counts(idx, typ)
+        )
+        result = charts.run(
+            "collaboration_colombiamap",
+            self.maps.get_coauthorship_colombia_map,
+            departments,
+        )
         return {"plot": result}
 
-    def get_coauthorships_network(self, idx, typ=None, aff_type: str | None = None):
+    def get_coauthorships_network(
+        self, idx, typ=None, aff_type: str | None = None, k: int | None = None
+    ):
         if typ in ["group", "department", "faculty"]:
             return {"plot": None}
-        data = self.impactu_db["affiliations"].find_one(
-            {"_id": ObjectId(idx)}, {"coauthorship_network": 1}
-        )
-        if data:
-            if "coauthorship_network" not in data.keys():
-                return {"plot": None}
-            data = data["coauthorship_network"]
-            nodes = sorted(data["nodes"], key=lambda x: x["degree"], reverse=True)[:50]
-            nodes_ids = [node["id"] for node in nodes]
-            edges = []
-            for edge in data["edges"]:
-                if edge["source"] in nodes_ids and edge["target"] in nodes_ids:
-                    edges.append(edge)
-            return {"plot": {"nodes": nodes, "edges": edges}}
-        else:
-            return {"plot": None}
+        return {
+            "plot": CoauthorshipNetworkRepository.get_top_network(
+                self.impactu_db["affiliations"], idx, k
+            )
+        }
+
+    work_plots = {**WORK_PLOTS, "scienti_rank": scienti_rank_plot(skip_null_ranks=True)}
+    #: Plots answered from the fact table when it is available
+    fact_plots = {
+        "year_type",
+        "year_oa",
+        "year_publisher",
+        "products_publisher",
+        "products_oa",
+        "scienti_rank",
+    }
+
+    def get_plots(
+        self, idx, plots: list[str], typ=None, aff_type: str | None = None
+    ) -> dict[str, dict[str, Any]]:
+        """
+        Charts of ``plots`` found in ``work_plots``, all computed from one
+        fetch of the affiliation works; the other plots are left out.
+        """
+        if self._facts(typ) is not None:
+            plots = [plot for plot in plots if plot not in self.fact_plots]
+        selected = {
+            plot: self.work_plots[plot] for plot in plots if plot in self.work_plots
+        }
+        if not selected:
+            return {}
+        works = self._iter_works(idx, typ, {}, work_projection(selected.values()))
+        return reduce_works(works, selected, self.analytics_db["sources"])
 
     @property
     def plot_mappings(self) -> dict[str, Callable[[Any, Any], dict[str, list] | None]]:
-        return {
+        mappings = {
             "year_type": self.get_products_by_year_by_type,
             "type,faculty": self.get_products_by_affiliation_by_type,
             "type,department": self.get_products_by_affiliation_by_type,
@@ -1620,6 +1231,7 @@ class AffiliationAppService:
             "collaboration_colombiamap": self.get_coauthorships_colombiamap,
             "collaboration_network": self.get_coauthorships_network,
         }
+        return {plot: single_flight.wrap(func) for plot, func in mappings.items()}
 
 
 affiliation_app_service = AffiliationAppService()
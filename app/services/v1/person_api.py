@@ -3,15 +3,18 @@ from typing import Any, Callable
 
 from bson import ObjectId
 from pymongo import ASCENDING, DESCENDING
-
-from infraestructure.mongo.utils.session import client
+from infraestructure.mongo.utils.session import ProfiledDatabase, get_database
 from core.config import settings
 
 
 class PersonApiService:
-    def __init__(self):
-        self.colav_db = client[settings.MONGO_INITDB_DATABASE]
-        self.impactu_db = client[settings.MONGO_IMPACTU_DB]
+    @property
+    def colav_db(self) -> ProfiledDatabase:
+        return get_database(settings.MONGO_INITDB_DATABASE)
+
+    @property
+    def impactu_db(self) -> ProfiledDatabase:
+        return get_database(settings.MONGO_IMPACTU_DB)
 
     def get_production(
         self,
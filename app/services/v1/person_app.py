@@ -3,23 +3,57 @@ from typing import Any, Callable
 
 from bson import ObjectId
 from pymongo import ASCENDING, DESCENDING
-
-from infraestructure.mongo.utils.session import client
+from infraestructure.mongo.utils.session import ProfiledDatabase, get_database
+from infraestructure.mongo.repositories.coauthorship import (
+    CoauthorshipNetworkRepository,
+)
+from infraestructure.mongo.repositories.facts import get_work_facts
+from infraestructure.mongo.repositories.lookups import (
+    affiliation_locations,
+    birth_years,
+    group_categories,
+    institution_name_keys,
+    publisher_keys,
+    scimago_quartiles,
+)
 from infraestructure.mongo.repositories.work import WorkRepository
+from infraestructure.mongo.repositories.yearly_stats import YearlyStatsRepository
 from core.config import settings
+from core.executor import charts
+from core.singleflight import single_flight
+from services.v1.work_plots import (
+    SUBJECT_PROJECTION,
+    WORK_PLOTS,
+    reduce_works,
+    scienti_rank_plot,
+    subjects_by_level,
+    work_projection,
+)
 from utils.bars import bars
 from utils.maps import maps
+from utils.membership import MembershipIndex
 from utils.pies import pies
+from utils.years import year_range
 
 
 class PersonAppService:
     def __init__(self):
-        self.colav_db = client[settings.MONGO_INITDB_DATABASE]
-        self.impactu_db = client[settings.MONGO_IMPACTU_DB]
         self.bars = bars()
         self.pies = pies()
         self.maps = maps()
 
+    @property
+    def colav_db(self) -> ProfiledDatabase:
+        return get_database(settings.MONGO_INITDB_DATABASE)
+
+    @property
+    def analytics_db(self) -> ProfiledDatabase:
+        return get_database(settings.MONGO_INITDB_DATABASE, "analytics")
+
+    @property
+    def impactu_db(self) -> ProfiledDatabase:
+        return get_database(settings.MONGO_IMPACTU_DB)
+
     def get_info(self, idx, start_year=None, end_year=None):
         initial_year = 9999
         final_year = 0
@@ -37,7 +71,23 @@ class PersonAppService:
                 print("Could not convert end year to int")
                 return None
 
-        person = self.colav_db["person"].find_one({"_id": ObjectId(idx)})
+        person = next(
+            self.colav_db["person"].aggregate(
+                [
+                    {"$match": {"_id": ObjectId(idx)}},
+                    {
+                        "$lookup": {
+                            "from": "affiliations",
+                            "localField": "affiliations.id",
+                            "foreignField": "_id",
+                            "as": "affiliations_data",
+                            "pipeline": [{"$project": {"external_urls": 1}}],
+                        }
+                    },
+                ]
+            ),
+            None,
+        )
         if person:
             aff_id = None
             affiliation = None
@@ -49,8 +99,13 @@ class PersonAppService:
                         aff_id = aff["id"]
                         break
             if aff_id:
-                affiliation = self.colav_db["affiliations"].find_one(
-                    {"_id": ObjectId(aff_id)}
+                affiliation = next(
+                    (
+                        aff
+                        for aff in person["affiliations_data"]
+                        if aff["_id"] == aff_id
+                    ),
+                    None,
                 )
             logo = ""
             if affiliation:
@@ -59,11 +114,23 @@ class PersonAppService:
                         if ext["source"] == "logo":
                             logo = ext["url"]
 
+            summary = WorkRepository.get_author_summary(author_id=idx)
+            if start_year or end_year:
+                in_range = YearlyStatsRepository.summarize(
+                    idx, start_year, end_year
+                ) or WorkRepository.get_author_summary(
+                    author_id=idx, start_year=start_year, end_year=end_year
+                )
+                summary = {
+                    **summary,
+                    "products_count": in_range["products_count"],
+                    "citations_count": in_range["citations_count"],
+                }
             entry = {
                 "id": person["_id"],
                 "name": person["full_name"],
-                "citations_count": WorkRepository.count_citations_by_author(author_id=idx),
-                "products_count": WorkRepository.count_papers_by_author(author_id=idx),
+                "citations_count": summary["citations_count"],
+                "products_count": summary["products_count"],
                 "external_urls": [
                     ext
                     for ext in person["external_urls"]
@@ -85,20 +152,10 @@ class PersonAppService:
             index_list = []
 
             filters = {"years": {}}
-            for reg in (
-                self.colav_db["works"]
-                .find({"authors.id": ObjectId(idx), "year_published": {"$exists": 1}})
-                .sort([("year_published", ASCENDING)])
-                .limit(1)
-            ):
-                filters["years"]["start_year"] = reg["year_published"]
-            for reg in (
-                self.colav_db["works"]
-                .find({"authors.id": ObjectId(idx), "year_published": {"$exists": 1}})
-                .sort([("year_published", DESCENDING)])
-                .limit(1)
-            ):
-                filters["years"]["end_year"] = reg["year_published"]
+            if summary["start_year"] is not None:
+                filters["years"]["start_year"] = summary["start_year"]
+            if summary["end_year"] is not None:
+                filters["years"]["end_year"] = summary["end_year"]
             filters["types"] = []
 
             return {"data": entry, "filters": filters}
@@ -410,36 +467,38 @@ class PersonAppService:
             "data": papers,
         }
 
+    @year_range(YearlyStatsRepository.products_by_year_by_type)
     def get_products_by_year_by_type(self, idx):
-        data = []
-        for work in self.colav_db["works"].find(
-            {"authors.id": ObjectId(idx), "year_published": {"$exists": 1}},
+        facts = get_work_facts()
+        if facts is not None:
+            result = facts.products_by_year_by_type(facts.author_rows(idx))
+            return {"plot": result or None}
+        data = self.analytics_db["works"].find(
+            {"authors.id": ObjectId(idx), "year_published": {"$ne": None}},
             {"year_published": 1, "types": 1},
-        ):
-            data.append(work)
+        )
         result = self.bars.products_by_year_by_type(data)
         return {"plot": result}
 
     def get_citations_by_year(self, idx):
-        data = []
-        for work in self.colav_db["works"].find(
+        data = self.analytics_db["works"].find(
             {
                 "authors.id": ObjectId(idx),
                 "citations_by_year": {"$ne": []},
-                "year_published": {"$exists": 1},
+                "year_published": {"$ne": None},
             },
             {"year_published": 1, "citations_by_year": 1},
-        ):
-            data.append(work)
+        )
         result = self.bars.citations_by_year(data)
         return {"plot": result}
 
+    @year_range(YearlyStatsRepository.apc_by_year)
     def get_apc_by_year(self, idx):
         data = []
-        for work in self.colav_db["works"].find(
+        for work in self.analytics_db["works"].find(
             {
                 "authors.id": ObjectId(idx),
-                "year_published": {"$exists": 1},
+                "year_published": {"$ne": None},
                 "source.id": {"$exists": 1},
             },
             {"year_published": 1, "source": 1},
@@ -448,7 +507,7 @@ class PersonAppService:
                 continue
             if not "id" in work["source"].keys():
                 continue
-            source_db = self.colav_db["sources"].find_one({"_id": work["source"]["id"]})
+            source_db = self.analytics_db["sources"].find_one({"_id": work["source"]["id"]})
             if source_db:
                 if source_db["apc"]:
                     data.append(
@@ -457,30 +516,34 @@ class PersonAppService:
                             "apc": source_db["apc"],
                         }
                     )
-        result = self.bars.apc_by_year(data, 2022)
+        result = charts.run("year_apc", self.bars.apc_by_year, data, 2022)
         return {"plot": result}
 
+    @year_range(YearlyStatsRepository.oa_by_year)
     def get_oa_by_year(self, idx):
-        data = []
-        for work in self.colav_db["works"].find(
+        data = self.analytics_db["works"].find(
             {
                 "authors.id": ObjectId(idx),
-                "year_published": {"$exists": 1},
+                "year_published": {"$ne": None},
                 "bibliographic_info.is_open_access": {"$exists": 1},
             },
             {"year_published": 1, "bibliographic_info.is_open_access": 1},
-        ):
-            data.append(work)
+        )
 
         result = self.bars.oa_by_year(data)
         return {"plot": result}
 
     def get_products_by_year_by_publisher(self, idx):
+        facts = get_work_facts()
+        if facts is not None:
+            return {
+                "plot": facts.products_by_year_by_publisher(facts.author_rows(idx))
+            }
         data = []
-        for work in self.colav_db["works"].find(
+        for work in self.analytics_db["works"].find(
             {
                 "authors.id": ObjectId(idx),
-                "year_published": {"$exists": 1},
+                "year_published": {"$ne": None},
                 "source.id": {"$exists": 1},
             },
             {"year_published": 1, "source.id": 1},
@@ -489,7 +552,7 @@ class PersonAppService:
                 continue
             if not "id" in work["source"].keys():
                 continue
-            source_db = self.colav_db["sources"].find_one({"_id": work["source"]["id"]})
+            source_db = self.analytics_db["sources"].find_one({"_id": work["source"]["id"]})
             if source_db:
                 if source_db["publisher"]:
                     data.append(
@@ -503,16 +566,18 @@ class PersonAppService:
         return {"plot": result}
 
     def get_h_by_year(self, idx):
-        data = []
-        for work in self.colav_db["works"].find(
+        data = self.analytics_db["works"].find(
             {"authors.id": ObjectId(idx), "citations_by_year": {"$ne": []}},
             {"citations_by_year": 1},
-        ):
-            data.append(work)
-        result = self.bars.h_index_by_year(data)
+        )
+        result = charts.run("year_h", self.bars.h_index_by_year, data)
         return {"plot": result}
 
+    @year_range(YearlyStatsRepository.products_by_year_by_researcher_category)
     def get_products_by_year_by_researcher_category(self, idx):
+        result = YearlyStatsRepository.products_by_year_by_researcher_category(idx)
+        if result is not None:
+            return {"plot": result or None}
         data = []
         pipeline = [
             {"$match": {"authors.id": ObjectId(idx)}},
@@ -530,7 +595,7 @@ class PersonAppService:
             {"$project": {"year_published": 1, "researcher.ranking": 1}},
             {"$match": {"researcher.ranking.source": "scienti"}},
         ]
-        for work in self.colav_db["works"].aggregate(pipeline):
+        for work in self.analytics_db["works"].aggregate(pipeline):
             for researcher in work["researcher"]:
                 for rank in researcher["ranking"]:
                     if rank["source"] == "scienti":
@@ -549,49 +614,31 @@ class PersonAppService:
             return {"plot": None}
 
     def get_products_by_year_by_group_category(self, idx):
-        data = []
-        info_db = self.colav_db["affiliations"].find_one(
-            {"_id": ObjectId(idx)}, {"types": 1, "relations": 1, "ranking": 1}
+        person = self.analytics_db["person"].find_one(
+            {"_id": ObjectId(idx)}, {"affiliations": 1}
         )
-        db_type = ""
-        for typ in info_db["types"]:
-            if typ["type"] == "group":
-                db_type = typ["type"]
-                break
-            elif typ["type"] == "department":
-                db_type = typ["type"]
-                break
-            elif typ["type"] == "faculty":
-                db_type = typ["type"]
-                break
-            else:
-                db_type = "institution"
-                break
-
-        if db_type == "group":
-            for work in self.colav_db["works"].find(
-                {"authors.id": ObjectId(idx), "year_published": {"$exists": 1}},
-                {"year_published": 1},
+        if person is None:
+            return {"plot": None}
+        memberships = MembershipIndex.from_authors(
+            [person],
+            [
+                aff["id"]
+                for aff in person.get("affiliations") or []
+                if any(typ.get("type") == "group" for typ in aff.get("types") or [])
+            ],
+        )
+        data = []
+        if memberships:
+            for work in self.analytics_db["works"].find(
+                {"authors.id": ObjectId(idx), "year_published": {"$ne": None}},
+                {"authors.id": 1, "date_published": 1, "year_published": 1},
             ):
-                work["ranking"] = info_db["ranking"]
-                data.append(work)
-        else:
-            for group in info_db["relations"]:
-                for typ in group["types"]:
-                    if "type" in typ.keys():
-                        if typ["type"] == "group":
-                            info_group = self.colav_db["affiliations"].find_one(
-                                {"_id": ObjectId(group["id"])}, {"ranking": 1}
-                            )
-                            for work in self.colav_db["works"].find(
-                                {
-                                    "authors.id": ObjectId(group["id"]),
-                                    "year_published": {"$exists": 1},
-                                },
-                                {"year_published": 1},
-                            ):
-                                work["ranking"] = info_group["ranking"]
-                                data.append(work)
+                for group_id in memberships.affiliations_of(work):
+                    category = group_categories.category(
+                        group_id, work["year_published"]
+                    )
+                    if category is not None:
+                        data.append((work["year_published"], category))
         return {"plot": self.bars.products_by_year_by_group_category(data)}
 
     def get_title_words(self, idx):
@@ -611,7 +658,7 @@ class PersonAppService:
         aff_ids = []
         if not typ in ["group", "department", "faculty"]:
             return None
-        for aff in self.colav_db["affiliations"].find(
+        for aff in self.analytics_db["affiliations"].find(
             {"relations.id": ObjectId(idx), "types.type": typ}
         ):
             name = aff["names"][0]["name"]
@@ -626,7 +673,7 @@ class PersonAppService:
         data = {}
         for aff_id, name in affiliations:
             data[name] = []
-            for author in self.colav_db["person"].find({"affiliations.id": aff_id}):
+            for author in self.analytics_db["person"].find({"affiliations.id": aff_id}):
                 aff_start_date = None
                 aff_end_date = None
                 for aff in author["affiliations"]:
@@ -647,7 +694,7 @@ class PersonAppService:
                     ],
                 }
 
-                for work in self.colav_db["works"].find(
+                for work in self.analytics_db["works"].find(
                     query_dict, {"citations_count": 1}
                 ):
                     data[name].append(work)
@@ -659,7 +706,7 @@ class PersonAppService:
         aff_ids = []
         if not typ in ["group", "department", "faculty"]:
             return None
-        for aff in self.colav_db["affiliations"].find(
+        for aff in self.analytics_db["affiliations"].find(
             {"relations.id": ObjectId(idx), "types.type": typ}
         ):
             name = aff["names"][0]["name"]
@@ -674,7 +721,7 @@ class PersonAppService:
         data = {}
         for aff_id, name in affiliations:
             data[name] = 0
-            for author in self.colav_db["person"].find({"affiliations.id": aff_id}):
+            for author in self.analytics_db["person"].find({"affiliations.id": aff_id}):
                 aff_start_date = None
                 aff_end_date = None
                 for aff in author["affiliations"]:
@@ -694,7 +741,7 @@ class PersonAppService:
                     ],
                 }
 
-                data[name] += self.colav_db["works"].count_documents(query_dict)
+                data[name] += self.analytics_db["works"].count_documents(query_dict)
 
         return self.pies.products_by_affiliation(data)
 
@@ -703,7 +750,7 @@ class PersonAppService:
         aff_ids = []
         if not typ in ["group", "department", "faculty"]:
             return None
-        for aff in self.colav_db["affiliations"].find(
+        for aff in self.analytics_db["affiliations"].find(
             {"relations.id": ObjectId(idx), "types.type": typ}
         ):
             name = aff["names"][0]["name"]
@@ -718,7 +765,7 @@ class PersonAppService:
         data = {}
         for aff_id, name in affiliations:
             data[name] = []
-            for author in self.colav_db["person"].find({"affiliations.id": aff_id}):
+            for author in self.analytics_db["person"].find({"affiliations.id": aff_id}):
                 aff_start_date = None
                 aff_end_date = None
                 for aff in author["affiliations"]:
@@ -739,12 +786,12 @@ class PersonAppService:
                     ],
                 }
 
-                for work in self.colav_db["works"].find(
+                for work in self.analytics_db["works"].find(
                     query_dict, {"source": 1, "year_published": 1}
                 ):
                     if not "id" in work["source"].keys():
                         continue
-                    source_db = self.colav_db["sources"].find_one(
+                    source_db = self.analytics_db["sources"].find_one(
                         {"_id": work["source"]["id"]}
                     )
                     if source_db:
@@ -752,14 +799,14 @@ class PersonAppService:
                             source_db["apc"]["year_published"] = work["year_published"]
                             data[name].append(source_db["apc"])
 
-        return self.pies.apc_by_affiliation(data, 2022)
+        return charts.run("apc_affiliations", self.pies.apc_by_affiliation, data, 2022)
 
     def get_h_by_affiliations(self, idx, typ):
         affiliations = []
         aff_ids = []
         if not typ in ["group", "department", "faculty"]:
             return None
-        for aff in self.colav_db["affiliations"].find(
+        for aff in self.analytics_db["affiliations"].find(
             {"relations.id": ObjectId(idx), "types.type": typ}
         ):
             name = aff["names"][0]["name"]
@@ -774,7 +821,7 @@ class PersonAppService:
         data = {}
         for aff_id, name in affiliations:
             data[name] = []
-            for author in self.colav_db["person"].find({"affiliations.id": aff_id}):
+            for author in self.analytics_db["person"].find({"affiliations.id": aff_id}):
                 aff_start_date = None
                 aff_end_date = None
                 for aff in author["affiliations"]:
@@ -795,7 +842,7 @@ class PersonAppService:
                     ],
                 }
 
-                for work in self.colav_db["works"].find(
+                for work in self.analytics_db["works"].find(
                     query_dict, {"citations_count": 1}
                 ):
                     citations = 0
@@ -810,18 +857,21 @@ class PersonAppService:
                         continue
                     data[name].append(citations)
 
-        return self.pies.hindex_by_affiliation(data)
+        return charts.run("h_affiliations", self.pies.hindex_by_affiliation, data)
 
     def get_products_by_publisher(self, idx):
+        facts = get_work_facts()
+        if facts is not None:
+            return self.pies.from_counts(facts.publisher_counts(facts.author_rows(idx)))
         data = []
-        for work in self.colav_db["works"].find(
+        for work in self.analytics_db["works"].find(
             {"authors.id": ObjectId(idx), "source.id": {"$exists": 1}}, {"source.id": 1}
         ):
             if not "source" in work.keys():
                 continue
             if not "id" in work["source"].keys():
                 continue
-            source_db = self.colav_db["sources"].find_one(
+            source_db = self.analytics_db["sources"].find_one(
                 {"_id": work["source"]["id"], "publisher.name": {"$ne": nan}}
             )
             if source_db:
@@ -831,49 +881,53 @@ class PersonAppService:
         return self.pies.products_by_publisher(data)
 
     def get_products_by_subject(self, idx, level=0):
-        if not level:
-            level = 0
-        data = []
-        for work in self.colav_db["works"].find(
-            {"authors.id": ObjectId(idx), "subjects": {"$exists": 1}}, {"subjects": 1}
-        ):
-            if not "subjects" in work.keys():
-                continue
-            for subjects in work["subjects"]:
-                if subjects["source"] != "openalex":
-                    continue
-                for subject in subjects["subjects"]:
-                    if subject["level"] != level:
-                        continue
-                    name = subject.get("name","No name specified in db")
-                    data.append({"subject": {"name": name}})
-
-        result = self.pies.products_by_subject(data)
-        return result
+        counts = subjects_by_level(
+            ("person", str(idx)),
+            lambda: self.analytics_db["works"].find(
+                {"authors.id": ObjectId(idx), "subjects": {"$exists": 1}},
+                SUBJECT_PROJECTION,
+            ),
+        )
+        return self.pies.from_counts(counts.get(int(level or 0), {}))
 
     def get_products_by_database(self, idx):
-        data = []
-        for work in self.colav_db["works"].find(
-            {"authors.id": ObjectId(idx)}, {"updated": 1}
-        ):
-            data.append(work["updated"])
+        data = (
+            work["updated"]
+            for work in self.analytics_db["works"].find(
+                {"authors.id": ObjectId(idx)}, {"updated": 1}
+            )
+        )
 
         result = self.pies.products_by_database(data)
         return result
 
     def get_products_by_open_access_status(self, idx):
-        data = []
-        for work in self.colav_db["works"].find(
-            {
-                "authors.id": ObjectId(idx),
-                "bibliographic_info.open_access_status": {"$exists": 1, "$ne": None},
-            },
-            {"bibliographic_info.open_access_status": 1},
-        ):
-            data.append(work["bibliographic_info"]["open_access_status"])
+        facts = get_work_facts()
+        if facts is not None:
+            result = self.pies.from_counts(
+                facts.open_access_status_counts(facts.author_rows(idx))
+            )
+        else:
+            data = (
+                work["bibliographic_info"]["open_access_status"]
+                for work in self.analytics_db["works"].find(
+                    {
+                        "authors.id": ObjectId(idx),
+                        "bibliographic_info.open_access_status": {
+                            "$exists": 1,
+                            "$ne": None,
+                        },
+                    },
+                    {"bibliographic_info.open_access_status": 1},
+                )
+            )
 
-        result = self.pies.products_by_open_access_status(data)
-        if result:
+            result = self.pies.products_by_open_access_status(data)
+        return self._with_open_sum(result)
+
+    @staticmethod
+    def _with_open_sum(result):
+        if result and result["plot"] is not None:
             return {
                 "plot": result["plot"],
                 "openSum": sum(
@@ -885,67 +939,45 @@ class PersonAppService:
             return {"plot": None, "openSum": 0}
 
     def get_products_by_author_age(self, idx):
-        data = []
-        pipeline = [
-            {"$match": {"authors.id": ObjectId(idx)}},
-            {"$project": {"authors": 1, "date_published": 1, "year_published": 1}},
-            {"$unwind": "$authors"},
-            {"$match": {"authors.id": ObjectId(idx)}},
-            {
-                "$lookup": {
-                    "from": "person",
-                    "localField": "authors.id",
-                    "foreignField": "_id",
-                    "as": "author",
-                }
-            },
-            {
-                "$project": {
-                    "author.birthdate": 1,
-                    "date_published": 1,
-                    "year_published": 1,
-                }
-            },
-            {"$match": {"author.birthdate": {"$ne": -1, "$exists": 1}}},
-        ]
-        for work in self.colav_db["works"].aggregate(pipeline):
-            data.append(work)
-        print(data)
-        result = self.pies.products_by_age(data)
-        return result
+        birth_year = birth_years.get(ObjectId(idx))
+        dates_published = []
+        if birth_year is not None:
+            dates_published = [
+                work["date_published"]
+                for work in self.analytics_db["works"].find(
+                    {"authors.id": ObjectId(idx), "date_published": {"$ne": None}},
+                    {"date_published": 1},
+                )
+            ]
+        return self.pies.products_by_age(
+            [birth_year] * len(dates_published), dates_published
+        )
 
     def get_products_by_scienti_rank(self, idx):
-        data = []
-        for work in self.colav_db["works"].find(
+        facts = get_work_facts()
+        if facts is not None:
+            return self.pies.from_counts(
+                facts.scienti_rank_counts(facts.author_rows(idx), skip_null_ranks=False)
+            )
+        data = self.analytics_db["works"].find(
             {"authors.id": ObjectId(idx), "ranking": {"$ne": []}}, {"ranking": 1}
-        ):
-            data.append(work)
+        )
         return self.pies.products_by_scienti_rank(data)
 
     def get_products_by_scimago_rank(self, idx):
-        data = []
-        pipeline = [
-            {"$match": {"authors.id": ObjectId(idx)}},
-            {"$project": {"source": 1, "date_published": 1}},
+        works = self.analytics_db["works"].find(
             {
-                "$lookup": {
-                    "from": "sources",
-                    "localField": "source.id",
-                    "foreignField": "_id",
-                    "as": "source",
-                }
+                "authors.id": ObjectId(idx),
+                "date_published": {"$ne": None},
+                "source.id": {"$exists": 1},
             },
-            {"$unwind": "$source"},
-            {"$project": {"source.ranking": 1, "date_published": 1}},
-        ]
-        for work in self.colav_db["works"].aggregate(pipeline):
-            data.append(work)
-        return self.pies.products_by_scimago_rank(data)
+            {"source.id": 1, "date_published": 1},
+        )
+        return self.pies.products_by_scimago_rank(scimago_quartiles.quartiles(works))
 
     def get_publisher_same_institution(self, idx):
-        data = []
         inst_id = None
-        person = self.colav_db["person"].find_one(
+        person = self.analytics_db["person"].find_one(
             {"_id": ObjectId(idx)}, {"affiliations": 1}
         )
         found = False
@@ -957,114 +989,73 @@ class PersonAppService:
                     inst_id = aff["id"]
                     found = True
                     break
-        institution = self.colav_db["affiliations"].find_one(
-            {"_id": ObjectId(inst_id)}, {"names": 1}
+        works = self.analytics_db["works"].find(
+            {"authors.id": ObjectId(idx), "source.id": {"$exists": 1}}, {"source.id": 1}
+        )
+        return self.pies.products_editorial_same_institution(
+            publisher_keys.publishers(works), institution_name_keys(inst_id)
         )
-        pipeline = [
-            {"$match": {"authors.id": ObjectId(idx)}},
-            {"$project": {"source": 1}},
-            {
-                "$lookup": {
-                    "from": "sources",
-                    "localField": "source.id",
-                    "foreignField": "_id",
-                    "as": "source",
-                }
-            },
-            {"$unwind": "$source"},
-            {"$project": {"source.publisher": 1}},
-            {
-                "$match": {
-                    "source.publisher": {"$ne": nan, "$exists": 1, "$ne": ""},
-                    "source.publisher.name": {"$ne": nan},
-                }
-            },
-        ]
-        for work in self.colav_db["works"].aggregate(pipeline):
-            data.append(work)
-        return self.pies.products_editorial_same_institution(data, institution)
 
     def get_coauthorships_worldmap(self, idx):
-        data = []
-        pipeline = [
-            {"$match": {"authors.id": ObjectId(idx)}},
-            {"$unwind": "$authors"},
-            {"$group": {"_id": "$authors.affiliations.id", "count": {"$sum": 1}}},
-            {"$unwind": "$_id"},
-            {
-                "$lookup": {
-                    "from": "affiliations",
-                    "localField": "_id",
-                    "foreignField": "_id",
-                    "as": "affiliation",
-                }
-            },
-            {
-                "$project": {
-                    "count": 1,
-                    "affiliation.addresses.country_code": 1,
-                    "affiliation.addresses.country": 1,
-                }
-            },
-            {"$unwind": "$affiliation"},
-            {"$unwind": "$affiliation.addresses"},
-        ]
-        for work in self.colav_db["works"].aggregate(pipeline):
-            data.append(work)
-        result = self.maps.get_coauthorship_world_map(data)
+        countries = affiliation_locations.by_country(
+            WorkRepository.count_coauthors_by_affiliation({"authors.id": ObjectId(idx)})
+        )
+        result = charts.run(
+            "collaboration_worldmap", self.maps.get_coauthorship_world_map, countries
+        )
         return {"plot": result}
 
     def get_coauthorships_colombiamap(self, idx):
-        data = []
-        pipeline = [
-            {"$match": {"authors.id": ObjectId(idx)}},
-            {"$unwind": "$authors"},
-            {"$group": {"_id": "$authors.affiliations.id", "count": {"$sum": 1}}},
-            {"$unwind": "$_id"},
-            {
-                "$lookup": {
-                    "from": "affiliations",
-                    "localField": "_id",
-                    "foreignField": "_id",
-                    "as": "affiliation",
-                }
-            },
-            {
-                "$project": {
-                    "count": 1,
-                    "affiliation.addresses.country_code": 1,
-                    "affiliation.addresses.city": 1,
-                }
-            },
-            {"$unwind": "$affiliation"},
-            {"$unwind": "$affiliation.addresses"},
-        ]
-        for work in self.colav_db["works"].aggregate(pipeline):
-            data.append(work)
-        result = self.maps.get_coauthorship_colombia_map(data)
+        departments = affiliation_locations.by_department(
+            WorkRepository.count_coauthors_by_affiliation({"authors.id": ObjectId(idx)})
+        )
+        result = charts.run(
+            "collaboration_colombiamap",
+            self.maps.get_coauthorship_colombia_map,
+            departments,
+        )
         return {"plot": result}
 
-    def get_coauthorships_network(self, idx):
-        data = self.impactu_db["person"].find_one(
-            {"_id": ObjectId(idx)}, {"coauthorship_network": 1}
+    def get_coauthorships_network(self, idx, k: int | None = None):
+        return {
+            "plot": CoauthorshipNetworkRepository.get_top_network(
+                self.impactu_db["person"], idx, k
+            )
+        }
+
+    work_plots = {**WORK_PLOTS, "scienti_rank": scienti_rank_plot(skip_null_ranks=False)}
+    #: Plots answered from the fact table when it is available
+    fact_plots = {
+        "year_type",
+        "year_publisher",
+        "products_publisher",
+        "products_oa",
+        "scienti_rank",
+    }
+
+    def get_plots(self, idx, plots: list[str]) -> dict[str, dict[str, Any]]:
+        """
+        Charts of ``plots`` found in ``work_plots``, all computed from one
+        fetch of the author works; the other plots are left out.
+        """
+        if get_work_facts() is not None:
+            plots = [plot for plot in plots if plot not in self.fact_plots]
+        selected = {
+            plot: self.work_plots[plot] for plot in plots if plot in self.work_plots
+        }
+        if not selected:
+            return {}
+        works = self.analytics_db["works"].find(
+            {"authors.id": ObjectId(idx)}, work_projection(selected.values())
         )
-        if data:
-            if "coauthorship_network" not in data.keys():
-                return {"plot": None}
-            data = data["coauthorship_network"]
-            nodes = sorted(data["nodes"], key=lambda x: x["degree"], reverse=True)[:50]
-            nodes_ids = [node["id"] for node in nodes]
-            edges = []
-            for edge in data["edges"]:
-                if edge["source"] in nodes_ids and edge["target"] in nodes_ids:
-                    edges.append(edge)
-            return {"plot": {"nodes": nodes, "edges": edges}}
-        else:
-            return {"plot": None}
+        result = reduce_works(works, selected, self.analytics_db["sources"])
+        if "products_oa" in result:
+            result["products_oa"] = self._with_open_sum(result["products_oa"])
+        return result
 
     @property
     def plot_mapping(self) -> dict[str, Callable[[Any, Any], dict[str, list] | None]]:
-        return {
+        mappings = {
             "year_type": self.get_products_by_year_by_type,
             "year_citations": self.get_citations_by_year,
             "year_apc": self.get_apc_by_year,
@@ -1091,6 +1082,7 @@ class PersonAppService:
             "collaboration_colombiamap": self.get_coauthorships_colombiamap,
             "collaboration_network": self.get_coauthorships_network,
         }
+        return {plot: single_flight.wrap(func) for plot, func in mappings.items()}
 
 
 person_app_service = PersonAppService()
@@ -1,14 +1,16 @@
 from bson import ObjectId
 from pymongo import ASCENDING, DESCENDING
-
-from infraestructure.mongo.utils.session import client
+from infraestructure.mongo.utils.session import ProfiledDatabase, get_database
 from core.config import settings
+from core.singleflight import coalesced
 
 
 class SearchApiService:
-    def __init__(self):
-        self.colav_db = client[settings.MONGO_INITDB_DATABASE]
+    @property
+    def colav_db(self) -> ProfiledDatabase:
+        return get_database(settings.MONGO_INITDB_DATABASE)
 
+    @coalesced
     def search_subjects(
         self,
         keywords="",
@@ -73,6 +75,7 @@ class SearchApiService:
         else:
             return None
 
+    @coalesced
     def search_person(
         self,
         keywords="",
@@ -190,6 +193,7 @@ class SearchApiService:
         else:
             return None
 
+    @coalesced
     def search_affiliations(
         self, keywords="", max_results=100, page=1, sort="citations", aff_type=None
     ):
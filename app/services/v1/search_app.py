@@ -1,16 +1,18 @@
 from bson import ObjectId
 from pymongo import ASCENDING, DESCENDING
-
-from infraestructure.mongo.utils.session import client
+from infraestructure.mongo.utils.session import ProfiledDatabase, get_database
 from infraestructure.mongo.repositories.work import WorkRepository
 from infraestructure.mongo.repositories.affiliation import AffiliationRepository
 from core.config import settings
+from core.singleflight import coalesced
 
 
 class SearchAppService:
-    def __init__(self):
-        self.colav_db = client[settings.MONGO_INITDB_DATABASE]
+    @property
+    def colav_db(self) -> ProfiledDatabase:
+        return get_database(settings.MONGO_INITDB_DATABASE)
 
+    @coalesced
     def search_subjects(
         self,
         keywords="",
@@ -84,6 +86,7 @@ class SearchAppService:
         else:
             return None
 
+    @coalesced
     def search_person(
         self,
         keywords="",
@@ -212,6 +215,7 @@ class SearchAppService:
         else:
             return None
 
+    @coalesced
     def search_affiliations(
         self, keywords="", max_results=100, page=1, sort="citations", aff_type=None
     ):
@@ -302,6 +306,7 @@ class SearchAppService:
         else:
             return None
 
+    @coalesced
     def search_work(
         self,
         keywords="",
@@ -0,0 +1,226 @@
+from dataclasses import dataclass
+from typing import Any, Callable, Hashable, Iterable
+
+from core.cache import LRUCache
+from core.config import settings
+from utils.bars import (
+    ApcByYear,
+    CitationsByYear,
+    HIndexByYear,
+    OaByYear,
+    ProductsByYearByPublisher,
+    ProductsByYearByType,
+)
+from utils.pies import (
+    ProductsByDatabase,
+    ProductsByOpenAccessStatus,
+    ProductsByPublisher,
+    ProductsByScientiRank,
+)
+from utils.reducers import Reducer
+from utils.subjects import SubjectIndex
+
+Sources = dict[Any, dict[str, Any]]
+
+subject_index = SubjectIndex()
+#: Per level subject counts of an entity, to move between levels without a new pass
+subject_counts = LRUCache(
+    maxsize=settings.SUBJECT_COUNTS_CACHE_SIZE, ttl=settings.SUBJECT_COUNTS_CACHE_TTL
+)
+
+#: Fields of the works read by ``subject_index``
+SUBJECT_PROJECTION = {
+    "subjects.source": 1,
+    "subjects.subjects.level": 1,
+    "subjects.subjects.name": 1,
+}
+
+
+@dataclass(frozen=True, slots=True)
+class WorkPlot:
+    """
+    Chart computed from the works of an entity.
+
+    ``collect`` maps every work, read with ``fields``, to the items fed to a
+    new ``reducer`` (none to leave it out); ``sources`` holds the source of
+    the works when ``uses_sources`` is set.
+    """
+
+    fields: tuple[str, ...]
+    collect: Callable[[dict[str, Any], Sources], Iterable[Any]]
+    reducer: Callable[[], Reducer]
+    chart: str = "bar"
+    uses_sources: bool = False
+
+    def result(self, reducer: Reducer) -> dict[str, Any]:
+        result = reducer.finalize()
+        if self.chart == "bar":
+            return {"plot": result or None}
+        return result or {"plot": None}
+
+
+def _source(work: dict[str, Any], sources: Sources) -> dict[str, Any]:
+    return sources.get((work.get("source") or {}).get("id")) or {}
+
+
+def _has_year(work: dict[str, Any]) -> bool:
+    """The ``{"year_published": {"$ne": None}}`` filter of the yearly charts."""
+    return work.get("year_published") is not None
+
+
+def _year_type(work, sources):
+    return [work] if _has_year(work) else []
+
+
+def _year_citations(work, sources):
+    if work.get("citations_by_year") and _has_year(work):
+        return [work]
+    return []
+
+
+def _year_apc(work, sources):
+    apc = _source(work, sources).get("apc")
+    if apc and _has_year(work):
+        return [{"year_published": work["year_published"], "apc": apc}]
+    return []
+
+
+def _year_oa(work, sources):
+    bibliographic_info = work.get("bibliographic_info") or {}
+    if bibliographic_info.get("is_open_access") is not None and _has_year(work):
+        return [work]
+    return []
+
+
+def _year_publisher(work, sources):
+    publisher = _source(work, sources).get("publisher")
+    if publisher and _has_year(work):
+        return [{"year_published": work["year_published"], "publisher": publisher}]
+    return []
+
+
+def _year_h(work, sources):
+    return [work] if work.get("citations_by_year") else []
+
+
+def _products_publisher(work, sources):
+    publisher = _source(work, sources).get("publisher")
+    if isinstance(publisher, dict) and publisher.get("name") == publisher.get("name"):
+        return [{"publisher": publisher}]
+    return []
+
+
+def _products_database(work, sources):
+    return [work["updated"]] if "updated" in work else []
+
+
+def _products_oa(work, sources):
+    status = (work.get("bibliographic_info") or {}).get("open_access_status")
+    return [status] if status is not None else []
+
+
+WORK_PLOTS: dict[str, WorkPlot] = {
+    "year_type": WorkPlot(
+        ("year_published", "types"), _year_type, ProductsByYearByType
+    ),
+    "year_citations": WorkPlot(
+        ("year_published", "citations_by_year"),
+        _year_citations,
+        CitationsByYear,
+    ),
+    "year_apc": WorkPlot(
+        ("year_published", "source.id"),
+        _year_apc,
+        lambda: ApcByYear(2022),
+        uses_sources=True,
+    ),
+    "year_oa": WorkPlot(
+        ("year_published", "bibliographic_info.is_open_access"),
+        _year_oa,
+        OaByYear,
+    ),
+    "year_publisher": WorkPlot(
+        ("year_published", "source.id"),
+        _year_publisher,
+        ProductsByYearByPublisher,
+        uses_sources=True,
+    ),
+    "year_h": WorkPlot(("citations_by_year",), _year_h, HIndexByYear),
+    "products_publisher": WorkPlot(
+        ("source.id",),
+        _products_publisher,
+        ProductsByPublisher,
+        chart="pie",
+        uses_sources=True,
+    ),
+    "products_database": WorkPlot(
+        ("updated",), _products_database, ProductsByDatabase, chart="pie"
+    ),
+    "products_oa": WorkPlot(
+        ("bibliographic_info.open_access_status",),
+        _products_oa,
+        ProductsByOpenAccessStatus,
+        chart="pie",
+    ),
+}
+
+
+def scienti_rank_plot(*, skip_null_ranks: bool) -> WorkPlot:
+    """``scienti_rank`` chart, leaving out the works with a null rank if asked."""
+
+    def collect(work, sources):
+        ranking = work.get("ranking") or []
+        if not ranking:
+            return []
+        if skip_null_ranks and any(r.get("rank") is None for r in ranking):
+            return []
+        return [work]
+
+    return WorkPlot(("ranking",), collect, ProductsByScientiRank, chart="pie")
+
+
+def work_projection(plots: Iterable[WorkPlot]) -> dict[str, int]:
+    """Union of the fields read by ``plots``."""
+    return {field: 1 for plot in plots for field in plot.fields}
+
+
+def reduce_works(
+    works: Iterable[dict[str, Any]], plots: dict[str, WorkPlot], sources_collection
+) -> dict[str, dict[str, Any]]:
+    """
+    Every chart of ``plots`` from a single pass over ``works``.
+
+    The works are streamed into the reducers, unless a chart needs their
+    sources: these are then read with one ``$in`` query instead of one
+    ``find_one`` per work.
+    """
+    sources: Sources = {}
+    if any(plot.uses_sources for plot in plots.values()):
+        works = list(works)
+        source_ids = {(work.get("source") or {}).get("id") for work in works}
+        source_ids.discard(None)
+        sources = {
+            source["_id"]: source
+            for source in sources_collection.find(
+                {"_id": {"$in": list(source_ids)}}, {"apc": 1, "publisher": 1}
+            )
+        }
+    reducers = {key: plot.reducer() for key, plot in plots.items()}
+    for reducer in reducers.values():
+        reducer.init()
+    for work in works:
+        for key, plot in plots.items():
+            for item in plot.collect(work, sources):
+                reducers[key].update(item)
+    return {key: plot.result(reducers[key]) for key, plot in plots.items()}
+
+
+def subjects_by_level(
+    key: Hashable, works: Callable[[], Iterable[dict[str, Any]]]
+) -> dict[Any, dict[str, int]]:
+    """Per level subject counts of the entity ``key``, from ``works`` once."""
+    counts = subject_counts.get(key)
+    if counts is None:
+        counts = subject_index.count_by_level(works())
+        subject_counts.set(key, counts)
+    return counts
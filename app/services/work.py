@@ -57,7 +57,10 @@ class WorkService(
             sort=sort,
         )
         total_works = WorkRepository.count_papers(
-            affiliation_id=affiliation_id, affiliation_type=affiliation_type
+            affiliation_id=affiliation_id,
+            affiliation_type=affiliation_type,
+            start_year=start_year,
+            end_year=end_year,
         )
         return {"data": works, "total_results": total_works, "count": len(works)}
 
@@ -73,7 +76,13 @@ class WorkService(
         sort: str | None = "title",
     ) -> list[dict[str, Any]]:
         return WorkRepository.get_research_products_by_affiliation_csv(
-            affiliation_id, affiliation_type, sort=sort, skip=skip, limit=limit
+            affiliation_id,
+            affiliation_type,
+            start_year=start_year,
+            end_year=end_year,
+            sort=sort,
+            skip=skip,
+            limit=limit,
         )
 
     def get_research_products_by_author(
@@ -0,0 +1,46 @@
+import json
+from functools import lru_cache
+from pathlib import Path
+
+from currency_converter import CurrencyConverter
+from pandas import DataFrame, read_csv
+
+ETC_PATH = Path(__file__).parent / "etc"
+
+
+@lru_cache(maxsize=None)
+def world_map() -> dict:
+    """GeoJSON of the world countries, shared read-only by every request."""
+    with open(ETC_PATH / "world_map.json", "r") as f:
+        return json.load(f)
+
+
+@lru_cache(maxsize=None)
+def colombia_map() -> dict:
+    """GeoJSON of the colombian departments, shared read-only by every request."""
+    with open(ETC_PATH / "colombia_map.json", "r") as f:
+        return json.load(f)
+
+
+@lru_cache(maxsize=None)
+def municipalities() -> DataFrame:
+    return read_csv(ETC_PATH / "Municipios_por_departamento.csv")
+
+
+@lru_cache(maxsize=None)
+def currency_converter() -> CurrencyConverter:
+    return CurrencyConverter()
+
+
+def preload() -> None:
+    """
+    Load every immutable asset in the current process.
+
+    Called by the production server before forking so the workers share
+    the pages holding the maps and currency tables instead of each one
+    parsing its own copy.
+    """
+    world_map()
+    colombia_map()
+    municipalities()
+    currency_converter()
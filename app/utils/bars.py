@@ -1,9 +1,167 @@
-import datetime
 
+from utils.assets import currency_converter
 from utils.cpi import inflate
-from currency_converter import CurrencyConverter
 
 from utils.hindex import hindex
+from utils.reducers import CountReducer, Reducer
+
+
+SCIENTI_ARTICLE = ("scienti", "Publicado en revista especializada")
+
+
+class ProductsByYearByType(CountReducer):
+    def keys(self, work):
+        year = work.get("year_published")
+        if not year:
+            return []
+        return [
+            (year, typ["type"])
+            for typ in work["types"]
+            if (typ["source"], typ["type"]) == SCIENTI_ARTICLE
+        ]
+
+    def finalize(self):
+        if not self.items:
+            return None
+        result_list = [
+            {"x": year, "y": count, "type": typ}
+            for (year, typ), count in self.counts.items()
+        ]
+        return sorted(result_list, key=lambda x: x.get("x", -99))
+
+
+class CitationsByYear(Reducer):
+    def init(self):
+        super().init()
+        self.result = {}
+
+    def update(self, work):
+        super().update(work)
+        for yearly in work["citations_by_year"]:
+            self.result[yearly["year"]] = (
+                self.result.get(yearly["year"], 0) + yearly["cited_by_count"]
+            )
+
+    def finalize(self):
+        return [{"x": x[0], "y": x[1]} for x in sorted(self.result.items())]
+
+
+class ApcByYear(Reducer):
+    def __init__(self, base_year):
+        self.base_year = base_year
+
+    def init(self):
+        super().init()
+        self.result = {}
+
+    def update(self, reg):
+        super().update(reg)
+        value = bars.apc_value(reg["apc"], reg["year_published"], self.base_year)
+        if value:
+            year = reg["year_published"]
+            self.result[year] = self.result.get(year, 0) + value
+
+    def finalize(self):
+        return [{"x": x[0], "y": int(x[1])} for x in sorted(self.result.items())]
+
+
+class OaByYear(Reducer):
+    def init(self):
+        super().init()
+        self.result = {}
+
+    def update(self, work):
+        super().update(work)
+        year = self.result.setdefault(work["year_published"], {"open": 0, "closed": 0})
+        if work["bibliographic_info"]["is_open_access"]:
+            year["open"] += 1
+        else:
+            year["closed"] += 1
+
+    def finalize(self):
+        result_list = [
+            {"x": year, "y": count, "type": typ}
+            for year, counts in self.result.items()
+            for typ, count in counts.items()
+        ]
+        return sorted(result_list, key=lambda x: x["x"])
+
+
+class ProductsByYearByPublisher(Reducer):
+    def __init__(self, top=5):
+        self.top = top
+
+    def init(self):
+        super().init()
+        self.result = {}
+        self.totals = {}
+
+    def update(self, work):
+        super().update(work)
+        year = int(work.get("year_published", 0) or 0)
+        name = work["publisher"]["name"]
+        publishers = self.result.setdefault(year, {})
+        publishers[name] = publishers.get(name, 0) + 1
+        self.totals[name] = self.totals.get(name, 0) + 1
+
+    def finalize(self):
+        top = [
+            name
+            for name, _ in sorted(self.totals.items(), key=lambda x: x[1], reverse=True)
+        ][: self.top]
+        result_list = [
+            {"x": year, "y": publishers.get(publisher, 0), "type": publisher}
+            for year, publishers in self.result.items()
+            for publisher in top
+        ]
+        return sorted(result_list, key=lambda x: x["x"])
+
+
+class HIndexByYear(Reducer):
+    def init(self):
+        super().init()
+        self.h_by_year = {}
+
+    def update(self, work):
+        super().update(work)
+        citations = 0
+        for citation in sorted(work["citations_by_year"], key=lambda x: x["year"]):
+            citations += citation["cited_by_count"]
+            self.h_by_year.setdefault(citation["year"], []).append(citations)
+
+    def finalize(self):
+        if not self.items:
+            return None
+        return [
+            {"x": year, "y": hindex(self.h_by_year[year])}
+            for year in sorted(self.h_by_year)
+        ]
+
+
+class ProductsByYearByResearcherCategory(CountReducer):
+    def keys(self, work):
+        if "year_published" not in work:
+            return []
+        return [(work["year_published"], work["rank"])]
+
+    def finalize(self):
+        result_list = [
+            {"x": year, "y": count, "type": rank}
+            for (year, rank), count in self.counts.items()
+        ]
+        return sorted(result_list, key=lambda x: x["x"])
+
+
+class ProductsByYearByGroupCategory(CountReducer):
+    def keys(self, product):
+        return [product]
+
+    def finalize(self):
+        result_list = [
+            {"x": year, "y": count, "type": group_category}
+            for (year, group_category), count in self.counts.items()
+        ]
+        return sorted(result_list, key=lambda x: x["x"])
 
 
 class bars:
@@ -19,39 +177,13 @@ class bars:
 
         Parameters
         -----------
-        data: list of works
+        data: iterable of works
 
         Returns
         --------
         list of dicts with the format {x:year, y:count, type:typ}
         """
-        if not isinstance(data, list):
-            print(type(data))
-            return None
-        if len(data) == 0:
-            return None
-        result = {}
-        for work in data:
-            if "year_published" in work.keys():
-                year = work["year_published"]
-                if year not in result.keys():
-                    result[year] = {}
-                for typ in work["types"]:
-                    if typ["source"] == "scienti" and typ["type"] == "Publicado en revista especializada":
-                        # if typ["level"] == 2:
-                        if typ["type"] not in result[year].keys():
-                            result[year][typ["type"]] = 1
-                        else:
-                            result[year][typ["type"]] += 1
-        # turn the dict into a list of dicts with the format {x:year, y:count, type:typ} sorted by year in ascending order
-        result_list = []
-        for year in result.keys():
-            for typ in result[year].keys():
-                result_list += (
-                    [{"x": year, "y": result[year][typ], "type": typ}] if year else []
-                )
-        result_list = sorted(result_list, key=lambda x: x.get("x", -99))
-        return result_list
+        return ProductsByYearByType().reduce(data)
 
     def products_by_affiliation_by_type(self, data):
         """
@@ -61,7 +193,7 @@ class bars:
 
         Parameters
         -----------
-        data: list of works
+        data: iterable of works
 
         Returns
         --------
@@ -105,24 +237,40 @@ class bars:
 
         Parameters
         -----------
-        data: list of citations by year
+        data: iterable of citations by year
 
         Returns
         --------
         list of dicts with the format {x:year, y:count}
         """
+        return CitationsByYear().reduce(data)
 
-        result = {}
-        for work in data:
-            for yearly in work["citations_by_year"]:
-                if yearly["year"] in result.keys():
-                    result[yearly["year"]] += yearly["cited_by_count"]
-                else:
-                    result[yearly["year"]] = yearly["cited_by_count"]
-        result_list = sorted(result.items(), key=lambda x: x[0])
-        result_list = [{"x": x[0], "y": x[1]} for x in result_list]
-
-        return result_list
+    @staticmethod
+    def apc_value(apc, year_published, base_year):
+        """
+        APC charges in USD of ``year_published``, inflated to ``base_year``
+        (or to the publication year when it is later). 0 when the currency
+        can not be converted.
+        """
+        if apc["currency"] == "USD":
+            raw_value = apc["charges"]
+            return inflate(
+                raw_value,
+                year_published,
+                to=max(base_year, year_published),
+            )
+        try:
+            raw_value = currency_converter().convert(
+                apc["xcharges"], apc["currency"], "USD"
+            )
+            return inflate(
+                raw_value,
+                year_published,
+                to=max(base_year, year_published),
+            )
+        except Exception as e:
+            # print("Could not convert currency with error: ",e)
+            return 0
 
     # anual APC costs
     def apc_by_year(self, data, base_year):
@@ -132,45 +280,14 @@ class bars:
 
         Parameters
         -----------
-        data: list of works with the information about the journal
+        data: iterable of works with the information about the journal
         base_year: int with the year to which the costs will be inflated
 
         Returns
         --------
         list of dicts with the format {x:year, y:cost}
         """
-        c = CurrencyConverter()
-        now = datetime.date.today()
-        result = {}
-        for reg in data:
-            if reg["apc"]["currency"] == "USD":
-                raw_value = reg["apc"]["charges"]
-                value = inflate(
-                    raw_value,
-                    reg["year_published"],
-                    to=max(base_year, reg["year_published"]),
-                )
-            else:
-                try:
-                    raw_value = c.convert(
-                        reg["apc"]["xcharges"], reg["apc"]["currency"], "USD"
-                    )
-                    value = inflate(
-                        raw_value,
-                        reg["year_published"],
-                        to=max(base_year, reg["year_published"]),
-                    )
-                except Exception as e:
-                    # print("Could not convert currency with error: ",e)
-                    value = 0
-            if value:
-                if reg["year_published"] not in result.keys():
-                    result[reg["year_published"]] = value
-                else:
-                    result[reg["year_published"]] += value
-        sorted_result = sorted(result.items(), key=lambda x: x[0])
-        result_list = [{"x": x[0], "y": int(x[1])} for x in sorted_result]
-        return result_list
+        return ApcByYear(base_year).reduce(data)
 
     # number of papers in openaccess or closed access
     def oa_by_year(self, data):
@@ -180,31 +297,13 @@ class bars:
 
         Parameters
         -----------
-        data: list of works with bibliographic info
+        data: iterable of works with bibliographic info
 
         Returns
         --------
         list of dicts with the format {x:year, y:count}
         """
-        result = {}
-        for work in data:
-            year = work["year_published"]
-            if year in result.keys():
-                if work["bibliographic_info"]["is_open_access"]:
-                    result[year]["open"] += 1
-                else:
-                    result[year]["closed"] += 1
-            else:
-                if work["bibliographic_info"]["is_open_access"]:
-                    result[year] = {"open": 1, "closed": 0}
-                else:
-                    result[year] = {"open": 0, "closed": 1}
-        result_list = []
-        for year in result.keys():
-            for typ in result[year].keys():
-                result_list.append({"x": year, "y": result[year][typ], "type": typ})
-        result_list = sorted(result_list, key=lambda x: x["x"])
-        return result_list
+        return OaByYear().reduce(data)
 
     # number of papers by publisher (top 5) in total
     def products_by_year_by_publisher(self, data):
@@ -215,44 +314,13 @@ class bars:
 
         Parameters
         -----------
-        data: list of works with sources info
+        data: iterable of works with sources info
 
         Returns
         --------
         list of dicts with the format {x:year, y:count, type:publisher}
         """
-        result = {}
-        top5 = {}  # total
-        for work in data:
-            year = int(work.get("year_published", 0) or 0)
-            if year in result.keys():
-                if work["publisher"]["name"] not in result[year].keys():
-                    result[year][work["publisher"]["name"]] = 1
-                else:
-                    result[year][work["publisher"]["name"]] += 1
-            else:
-                result[year] = {work["publisher"]["name"]: 1}
-            if work["publisher"]["name"] not in top5.keys():
-                top5[work["publisher"]["name"]] = 1
-            else:
-                top5[work["publisher"]["name"]] += 1
-
-        top5 = [
-            top[0] for top in sorted(top5.items(), key=lambda x: x[1], reverse=True)
-        ][:5]
-
-        result_list = []
-        for year in result.keys():
-            for publisher in top5:
-                if publisher in result[year].keys():
-                    result_list.append(
-                        {"x": year, "y": result[year][publisher], "type": publisher}
-                    )
-                else:
-                    result_list.append({"x": year, "y": 0, "type": publisher})
-
-        result_list = sorted(result_list, key=lambda x: x["x"])
-        return result_list
+        return ProductsByYearByPublisher().reduce(data)
 
     # Anual H index from (temporarily) openalex citations
     def h_index_by_year(self, data):
@@ -262,55 +330,13 @@ class bars:
 
         Parameters
         -----------
-        data: list of citations by year
+        data: iterable of citations by year
 
         Returns
         --------
         list of dicts with the format {x:year, y:h_index}
         """
-        if len(data) <= 0:
-            return None
-        h_by_year = {}
-        works_total_citations_by_year = []
-        for work in data:
-            acc_citations_by_year = []
-            years = []
-            sorted_citations = sorted(
-                work["citations_by_year"], key=lambda x: x["year"]
-            )
-            for citation in sorted_citations:
-                if len(acc_citations_by_year) == 0:
-                    acc_citations_by_year.append(
-                        {
-                            "year": citation["year"],
-                            "citations": citation["cited_by_count"],
-                        }
-                    )
-                else:
-                    acc_citations_by_year.append(
-                        {
-                            "year": citation["year"],
-                            "citations": citation["cited_by_count"]
-                            + acc_citations_by_year[-1]["citations"],
-                        }
-                    )
-            works_total_citations_by_year.append(acc_citations_by_year)
-
-        for work in works_total_citations_by_year:
-            for citations in work:
-                year = citations["year"]
-                citations = citations["citations"]
-                if not year in h_by_year.keys():
-                    h_by_year[year] = [citations]
-                else:
-                    h_by_year[year].append(citations)
-
-        index_by_year = []
-        years = set([x[0] for x in h_by_year.items()])
-        for year in years:
-            index_by_year.append({"x": year, "y": hindex(h_by_year[year])})
-        sorted_index_by_year = sorted(index_by_year, key=lambda x: x["x"])
-        return sorted_index_by_year
+        return HIndexByYear().reduce(data)
 
     # Anual products count by researcher category
     def products_by_year_by_researcher_category(self, data):
@@ -321,28 +347,13 @@ class bars:
 
         Parameters
         -----------
-        data: list of works with author info
+        data: iterable of works with author info
 
         Returns
         --------
         list of dicts with the format {x:year, y:count, type:researcher_type}
         """
-        result = {}
-        for work in data:
-            if "year_published" in work.keys():
-                year = work["year_published"]
-                if year not in result.keys():
-                    result[year] = {}
-                if work["rank"] not in result[year].keys():
-                    result[year][work["rank"]] = 1
-                else:
-                    result[year][work["rank"]] += 1
-        result_list = []
-        for year in result.keys():
-            for rank in result[year].keys():
-                result_list.append({"x": year, "y": result[year][rank], "type": rank})
-        result_list = sorted(result_list, key=lambda x: x["x"])
-        return result_list
+        return ProductsByYearByResearcherCategory().reduce(data)
 
     # Anual products count by group category
     def products_by_year_by_group_category(self, data):
@@ -353,47 +364,10 @@ class bars:
 
         Parameters
         -----------
-        data: list of works with group info
+        data: iterable of (year, group category) pairs, one per product and group
 
         Returns
         --------
         list of dicts with the format {x:year, y:count, type:group_category}
         """
-        result = {}
-        for work in data:
-            if "date_published" in work.keys() and "year_published" in work.keys():
-                year = work["year_published"]
-                year_timestamp = datetime.datetime.strptime(str(year), "%Y").timestamp()
-                date = work["date_published"]
-                rank_name = ""
-                # print(year,year_timestamp, date)
-                for rank in work["ranking"]:
-                    if rank["source"] == "scienti":
-                        # print(rank["rank"],rank["from_date"],rank["to_date"])
-                        if (
-                            rank["from_date"] < year_timestamp
-                            and rank["to_date"] > year_timestamp
-                        ):
-                            rank_name = rank["rank"]
-                            break
-                if rank_name != "":
-                    # print(rank["rank"],rank["from_date"],rank["to_date"])
-                    if year not in result.keys():
-                        result[year] = {}
-                    if rank_name not in result[year].keys():
-                        result[year][rank_name] = 1
-                    else:
-                        result[year][rank_name] += 1
-        result_list = []
-        for year in result.keys():
-            for group_category in result[year].keys():
-                result_list.append(
-                    {
-                        "x": year,
-                        "y": result[year][group_category],
-                        "type": group_category,
-                    }
-                )
-
-        result_list = sorted(result_list, key=lambda x: x["x"])
-        return result_list
+        return ProductsByYearByGroupCategory().reduce(data)
@@ -1,69 +1,46 @@
-import json
-from pandas import read_csv
-from pathlib import Path
 from math import log
 
+from utils.assets import world_map, colombia_map
+
 class maps():
     def __init__(self):
-        utils_path=str(Path(__file__).parent)
-        self.worldmap=json.load(open(utils_path+"/etc/world_map.json","r"))
-        self.colombiamap=json.load(open(utils_path+"/etc/colombia_map.json","r"))
-        self.municipios_departamentos=read_csv(utils_path+"/etc/Municipios_por_departamento.csv")
+        # the assets are loaded once per process and must stay read-only,
+        # every response is built over a shallow copy of the features
+        self.worldmap=world_map()
+        self.colombiamap=colombia_map()
+
+    @staticmethod
+    def copy_features(geojson):
+        return {
+            **geojson,
+            "features":[{**feat,"properties":{**feat["properties"]}} for feat in geojson["features"]]
+        }
 
-    # Map of world procedence of coauthors
-    def get_coauthorship_world_map(self,data):
-        countries={}
-        for work in data:
-            if not "country_code" in work["affiliation"]["addresses"].keys():
-                continue
-            if work["affiliation"]["addresses"]["country_code"] and work["affiliation"]["addresses"]["country"]:
-                alpha2=work["affiliation"]["addresses"]["country_code"]
-                country_name=work["affiliation"]["addresses"]["country"]
-                if alpha2 in countries.keys():
-                    countries[alpha2]["count"]+=work["count"]
-                else:
-                    countries[alpha2]={
-                        "count":work["count"],
-                        "name":country_name
-                    }
+    # Map of world procedence of coauthors, from the counts and names per country code
+    def get_coauthorship_world_map(self,countries):
         for key,val in countries.items():
             countries[key]["log_count"]=log(val["count"])
-        for i,feat in enumerate(self.worldmap["features"]):
+        worldmap=self.copy_features(self.worldmap)
+        for i,feat in enumerate(worldmap["features"]):
             if feat["properties"]["country_code"] in countries.keys():
                alpha2=feat["properties"]["country_code"]
-               self.worldmap["features"][i]["properties"]["count"]=countries[alpha2]["count"]
-               self.worldmap["features"][i]["properties"]["log_count"]=countries[alpha2]["log_count"]
+               worldmap["features"][i]["properties"]["count"]=countries[alpha2]["count"]
+               worldmap["features"][i]["properties"]["log_count"]=countries[alpha2]["log_count"]
 
-        return self.worldmap
+        return worldmap
 
-    #map of colombian coauthors
-    def get_coauthorship_colombia_map(self,data):
-        departments={}
-        for work in data:
-            if not "country_code" in work["affiliation"]["addresses"].keys():
-                continue
-            if work["affiliation"]["addresses"]["country_code"] and work["affiliation"]["addresses"]["city"]:
-                city=work["affiliation"]["addresses"]["city"]
-                department=self.municipios_departamentos[self.municipios_departamentos["MUNICIPIO"]==city]["DEPARTAMENTO"]
-                if len(department)==0:
-                    continue
-                department=department.iloc[0]
-                if department in departments.keys():
-                    departments[department]["count"]+=work["count"]
-                else:
-                    departments[department]={
-                        "count":work["count"],
-                        "name":department
-                    }
+    #map of colombian coauthors, from the counts per department
+    def get_coauthorship_colombia_map(self,departments):
         for key,val in departments.items():
             departments[key]["log_count"]=log(val["count"])
-        for i,feat in enumerate(self.colombiamap["features"]):
+        colombiamap=self.copy_features(self.colombiamap)
+        for i,feat in enumerate(colombiamap["features"]):
             dep_name=feat["properties"]["NOMBRE_DPT"].capitalize() if "bogota" not in feat["properties"]["NOMBRE_DPT"].lower() else "Bogotá D.C."
             if dep_name in departments.keys():
-                self.colombiamap["features"][i]["properties"]["count"]=departments[dep_name]["count"]
-                self.colombiamap["features"][i]["properties"]["log_count"]=departments[dep_name]["log_count"]
+                colombiamap["features"][i]["properties"]["count"]=departments[dep_name]["count"]
+                colombiamap["features"][i]["properties"]["log_count"]=departments[dep_name]["log_count"]
             else:
-                self.colombiamap["features"][i]["properties"]["count"]=0
-                self.colombiamap["features"][i]["properties"]["log_count"]=0
+                colombiamap["features"][i]["properties"]["count"]=0
+                colombiamap["features"][i]["properties"]["log_count"]=0
 
-        return self.colombiamap
\ No newline at end of file
+        return colombiamap
\ No newline at end of file
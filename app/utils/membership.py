@@ -0,0 +1,79 @@
+from typing import Any, Iterable
+
+from bson import ObjectId
+
+#: Open ended membership dates are stored as -1
+OPEN_DATE = -1
+
+Interval = tuple[ObjectId, int, int]
+
+
+def is_member(date_published: int | None, start_date: int, end_date: int) -> bool:
+    """
+    Works without a ``date_published`` keep every affiliation of their
+    authors, as the per author queries did. Year ranges are not checked
+    here: callers match them on ``year_published``.
+    """
+    if date_published is None:
+        return True
+    if start_date not in (OPEN_DATE, None) and date_published < start_date:
+        return False
+    if end_date not in (OPEN_DATE, None) and date_published > end_date:
+        return False
+    return True
+
+
+class MembershipIndex:
+    """
+    Membership intervals ``(affiliation, start_date, end_date)`` of every
+    author, restricted to ``affiliation_ids`` when given.
+
+    ``affiliations_of`` tells which of these affiliations a work counts
+    toward: those its authors belonged to when it was published. Built from
+    one read of the authors, it assigns a whole batch of works to their
+    affiliations without a query per author.
+    """
+
+    def __init__(self, affiliation_ids: Iterable[ObjectId] | None = None):
+        self.affiliation_ids = (
+            set(affiliation_ids) if affiliation_ids is not None else None
+        )
+        self.intervals: dict[ObjectId, list[Interval]] = {}
+
+    @classmethod
+    def from_authors(
+        cls,
+        authors: Iterable[dict[str, Any]],
+        affiliation_ids: Iterable[ObjectId] | None = None,
+    ) -> "MembershipIndex":
+        """Index of ``person`` documents read with their ``affiliations``."""
+        index = cls(affiliation_ids)
+        for author in authors:
+            index.add(author)
+        return index
+
+    def add(self, author: dict[str, Any]) -> None:
+        intervals = [
+            (aff["id"], aff.get("start_date", OPEN_DATE), aff.get("end_date", OPEN_DATE))
+            for aff in author.get("affiliations") or []
+            if aff.get("id")
+            and (self.affiliation_ids is None or aff["id"] in self.affiliation_ids)
+        ]
+        if intervals:
+            self.intervals[author["_id"]] = intervals
+
+    def authors(self) -> list[ObjectId]:
+        return list(self.intervals)
+
+    def affiliations_of(self, work: dict[str, Any]) -> set[ObjectId]:
+        """Affiliations of a work read with ``authors.id`` and ``date_published``."""
+        result = set()
+        date_published = work.get("date_published")
+        for author in work.get("authors") or []:
+            for aff_id, start_date, end_date in self.intervals.get(author.get("id"), ()):
+                if is_member(date_published, start_date, end_date):
+                    result.add(aff_id)
+        return result
+
+    def __len__(self) -> int:
+        return len(self.intervals)
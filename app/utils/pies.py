@@ -1,9 +1,95 @@
 import datetime
+from typing import Iterable
 
+import numpy as np
+
+from utils.assets import currency_converter
 from utils.cpi import inflate
-from currency_converter import CurrencyConverter
 
 from utils.hindex import hindex
+from utils.reducers import CountReducer
+
+
+SCIENTI_RANKS = ["A", "A1", "B", "C", "D"]
+AGE_RANGES = {"14-26": (14, 26), "27-59": (27, 59), "60+": (60, 999)}
+
+
+class PieCounts(CountReducer):
+    """Counts as a pie chart with the percentage of every slice."""
+
+    def finalize(self):
+        return pies.get_percentage(
+            [{"name": name, "value": value} for name, value in self.counts.items()]
+        )
+
+
+class ProductsByPublisher(PieCounts):
+    def keys(self, work):
+        name = work["publisher"]["name"]
+        return [name] if name else []
+
+
+class ProductsByDatabase(PieCounts):
+    def keys(self, work):
+        return [source["source"] for source in work]
+
+
+class ProductsByOpenAccessStatus(PieCounts):
+    def keys(self, status):
+        return [status]
+
+
+class ProductsBySex(PieCounts):
+    def keys(self, work):
+        return [work["author"][0]["sex"]]
+
+
+def age_counts(
+    birth_years: Iterable[int], dates_published: Iterable[int]
+) -> dict[str, int]:
+    """
+    Products per author age range from paired birth years and publication
+    timestamps, one pair per product author.
+    """
+    birth_years = np.fromiter(birth_years, dtype=np.int64)
+    publication_years = (
+        np.fromiter(dates_published, dtype=np.int64)
+        .astype("datetime64[s]")
+        .astype("datetime64[Y]")
+        .astype(np.int64)
+        + 1970
+    )
+    ages = publication_years - birth_years
+    return {
+        name: int(np.count_nonzero((ages > date_low) & (ages < date_high)))
+        for name, (date_low, date_high) in AGE_RANGES.items()
+    }
+
+
+class ProductsByScientiRank(PieCounts):
+    def keys(self, work):
+        for ranking in work["ranking"]:
+            if ranking["source"] == "scienti" and ranking["rank"] is not None:
+                rank = ranking["rank"].split("_")[-1]
+                return [rank] if rank in SCIENTI_RANKS else []
+        return []
+
+
+class ProductsByScimagoRank(PieCounts):
+    def keys(self, rank):
+        return [rank]
+
+
+class ProductsEditorialSameInstitution(PieCounts):
+    def __init__(self, name_keys):
+        self.names = name_keys
+
+    def init(self):
+        super().init()
+        self.counts = {"same": 0, "different": 0}
+
+    def keys(self, publisher_key):
+        return ["same" if publisher_key in self.names else "different"]
 
 
 class pies:
@@ -20,6 +106,14 @@ class pies:
         result = {"plot": data, "sum": total}
         return result
 
+    @classmethod
+    def from_counts(
+        cls, counts: dict[str, int]
+    ) -> dict[str, list[dict[str, str | int]] | int]:
+        return cls.get_percentage(
+            [{"name": name, "value": value} for name, value in counts.items()]
+        )
+
     # Accumulated citations for each faculty department or group
     def citations_by_affiliation(self, data):
         results = {}
@@ -56,7 +150,7 @@ class pies:
 
     # APC cost for each faculty department or group
     def apc_by_affiliation(self, data, base_year):
-        c = CurrencyConverter()
+        c = currency_converter()
         now = datetime.date.today()
         result = {}
         for name, costs in data.items():
@@ -101,155 +195,35 @@ class pies:
 
     # Ammount of papers per publisher
     def products_by_publisher(self, data):
-        results = {}
-        for work in data:
-            if work["publisher"]["name"]:
-                if work["publisher"]["name"] in results.keys():
-                    results[work["publisher"]["name"]] += 1
-                else:
-                    results[work["publisher"]["name"]] = 1
-        result_list = []
-        for idx, value in results.items():
-            result_list.append({"name": idx, "value": value})
-        result_list = self.get_percentage(result_list)
-        return result_list
-
-    # ammount of papers per openalex subject
-    def products_by_subject(self, data):
-        results = {}
-        for subject in data:
-            if subject["subject"]["name"] in results.keys():
-                results[subject["subject"]["name"]] += 1
-            else:
-                results[subject["subject"]["name"]] = 1
-        result_list = []
-        for idx, value in results.items():
-            result_list.append({"name": idx, "value": value})
-        result_list = self.get_percentage(result_list)
-        return result_list
+        return ProductsByPublisher().reduce(data)
 
     # Ammount of papers per database
     def products_by_database(self, data):
-        results = {}
-        for work in data:
-            for source in work:
-                if source["source"] in results.keys():
-                    results[source["source"]] += 1
-                else:
-                    results[source["source"]] = 1
-        result_list = []
-        for idx, value in results.items():
-            result_list.append({"name": idx, "value": value})
-        result_list = self.get_percentage(result_list)
-        return result_list
+        return ProductsByDatabase().reduce(data)
 
     # Ammount of papers per open access status
     def products_by_open_access_status(self, data):
-        results = {}
-        for status in data:
-            if status in results:
-                results[status] += 1
-            else:
-                results[status] = 1
-        result_list = []
-        for idx, value in results.items():
-            result_list.append({"name": idx, "value": value})
-        result_list = self.get_percentage(result_list)
-        return result_list
+        return ProductsByOpenAccessStatus().reduce(data)
 
     # Ammount of papers per author sex
     def products_by_sex(self, data):
-        results = {}
-        for work in data:
-            if work["author"][0]["sex"] in results.keys():
-                results[work["author"][0]["sex"]] += 1
-            else:
-                results[work["author"][0]["sex"]] = 1
-        result_list = []
-        for idx, value in results.items():
-            result_list.append({"name": idx, "value": value})
-        result_list = self.get_percentage(result_list)
-        return result_list
+        return ProductsBySex().reduce(data)
 
     # Ammount of papers per author age intervals 14-26 años, 27-59 años 60 años en adelante
-    def products_by_age(self, data):
-        ranges = {"14-26": (14, 26), "27-59": (27, 59), "60+": (60, 999)}
-        results = {"14-26": 0, "27-59": 0, "60+": 0}
-        for work in data:
-            if work["author"][0]["birthdate"]:
-                birthdate = datetime.datetime.fromtimestamp(
-                    work["author"][0]["birthdate"]
-                ).year
-                date_published = datetime.datetime.fromtimestamp(
-                    work["date_published"]
-                ).year
-                age = date_published - birthdate
-                for name, (date_low, date_high) in ranges.items():
-                    if age < date_high and age > date_low:
-                        results[name] += 1
-        result_list = []
-        for idx, value in results.items():
-            result_list.append({"name": idx, "value": value})
-        result_list = self.get_percentage(result_list)
-        return result_list
+    def products_by_age(self, birth_years, dates_published):
+        return self.from_counts(age_counts(birth_years, dates_published))
 
     # Ammount of papers per scienti rank
     def products_by_scienti_rank(self, data):
-        results = {}
-        for work in data:
-            rank = None
-            for ranking in work["ranking"]:
-                if ranking["source"] == "scienti" and ranking["rank"] is not None:
-                    rank = ranking["rank"].split("_")[-1]
-                    break
-            if rank in ["A", "A1", "B", "C", "D"]:
-                if rank in results.keys():
-                    results[rank] += 1
-                else:
-                    results[rank] = 1
-        result_list = []
-        for idx, value in results.items():
-            result_list.append({"name": idx, "value": value})
-        result_list = self.get_percentage(result_list)
-        return result_list
+        return ProductsByScientiRank().reduce(data)
 
     # Ammount of papers per journal on scimago
     def products_by_scimago_rank(self, data):
-        results = {}
-        for work in data:
-            for ranking in work["source"]["ranking"]:
-                if ranking["source"] == "scimago Best Quartile":
-                    if (
-                        ranking["from_date"] < work["date_published"]
-                        and ranking["to_date"] > work["date_published"]
-                    ):
-                        if ranking["rank"] in results.keys():
-                            results[ranking["rank"]] += 1
-                        else:
-                            results[ranking["rank"]] = 1
-                        break
-        result_list = []
-        for idx, value in results.items():
-            result_list.append({"name": idx, "value": value})
-        result_list = self.get_percentage(result_list)
-        return result_list
+        return ProductsByScimagoRank().reduce(data)
 
     # Ammmount of papers published on a journal of the same institution
-    def products_editorial_same_institution(self, data, institution):
-        results = {"same": 0, "different": 0}
-        names = list(set([n["name"].lower() for n in institution["names"]]))
-
-        for work in data:
-            if work["source"]["publisher"]["name"]:
-                if work["source"]["publisher"]["name"].lower() in names:
-                    results["same"] += 1
-                else:
-                    results["different"] += 1
-        result_list = []
-        for idx, value in results.items():
-            result_list.append({"name": idx, "value": value})
-        result_list = self.get_percentage(result_list)
-        return result_list
-    
+    def products_editorial_same_institution(self, publisher_keys, name_keys):
+        return ProductsEditorialSameInstitution(name_keys).reduce(publisher_keys)
+
     def title_words(self, data: list[dict[str, str | int]]) -> dict[str, list[dict[str, int | str ]] | int]:
         return self.get_percentage(data)
\ No newline at end of file
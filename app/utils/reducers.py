@@ -0,0 +1,43 @@
+from typing import Any, Hashable, Iterable
+
+
+class Reducer:
+    """
+    Chart built incrementally: ``init`` resets the state, ``update`` folds
+    one item into it and ``finalize`` returns the chart.
+
+    ``reduce`` drives the three over any iterable, so a cursor is consumed
+    batch by batch and only the state of the chart is held in memory. A
+    reducer instance holds the state of one chart at a time.
+    """
+
+    def init(self) -> None:
+        self.items = 0
+
+    def update(self, item: Any) -> None:
+        self.items += 1
+
+    def finalize(self) -> Any:
+        raise NotImplementedError
+
+    def reduce(self, data: Iterable[Any]) -> Any:
+        self.init()
+        for item in data:
+            self.update(item)
+        return self.finalize()
+
+
+class CountReducer(Reducer):
+    """Counts of the ``keys`` of every item, in first seen order."""
+
+    def init(self) -> None:
+        super().init()
+        self.counts: dict[Hashable, int] = {}
+
+    def keys(self, item: Any) -> Iterable[Hashable]:
+        raise NotImplementedError
+
+    def update(self, item: Any) -> None:
+        super().update(item)
+        for key in self.keys(item):
+            self.counts[key] = self.counts.get(key, 0) + 1
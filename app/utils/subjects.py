@@ -0,0 +1,62 @@
+from threading import Lock
+from typing import Any, Iterable, Iterator
+
+import numpy as np
+
+NO_NAME = "No name specified"
+
+
+class SubjectIndex:
+    """
+    Dense integer codes of the openalex subjects found in the works, with the
+    level and name of every code.
+
+    ``count_by_level`` counts the products of every subject of every level in
+    a single pass over the works of an entity, so moving between levels does
+    not walk the works again. Codes are shared by all the entities and only
+    ever added.
+    """
+
+    def __init__(self):
+        self.codes: dict[tuple[Any, str], int] = {}
+        self.levels: list[Any] = []
+        self.names: list[str] = []
+        self._lock = Lock()
+
+    def code(self, level: Any, name: str) -> int:
+        key = (level, name)
+        code = self.codes.get(key)
+        if code is None:
+            with self._lock:
+                code = self.codes.get(key)
+                if code is None:
+                    code = len(self.names)
+                    self.levels.append(level)
+                    self.names.append(name)
+                    self.codes[key] = code
+        return code
+
+    def work_codes(self, work: dict[str, Any]) -> Iterator[int]:
+        for subjects in work.get("subjects") or []:
+            if subjects.get("source") != "openalex":
+                continue
+            for subject in subjects.get("subjects") or []:
+                yield self.code(subject.get("level"), subject.get("name", NO_NAME))
+
+    def count_by_level(
+        self, works: Iterable[dict[str, Any]]
+    ) -> dict[Any, dict[str, int]]:
+        """Products per subject name of every level."""
+        codes = np.fromiter(
+            (code for work in works for code in self.work_codes(work)), dtype=np.int64
+        )
+        counts = np.bincount(codes)
+        by_level: dict[Any, dict[str, int]] = {}
+        for code in np.flatnonzero(counts):
+            by_level.setdefault(self.levels[code], {})[self.names[code]] = int(
+                counts[code]
+            )
+        return by_level
+
+    def __len__(self) -> int:
+        return len(self.names)
@@ -0,0 +1,53 @@
+from functools import wraps
+from typing import Any, Callable
+
+from core.logging import get_logger
+
+log = get_logger(__name__)
+
+
+def parse_year(year: Any) -> int | None:
+    if year in (None, ""):
+        return None
+    try:
+        return int(year)
+    except (TypeError, ValueError):
+        log.warning(f"could not convert the year {year!r} to int")
+        return None
+
+
+def year_range(
+    stats_plot: Callable[[Any, int | None, int | None], list[dict] | None]
+) -> Callable:
+    """
+    Let a yearly plot method take ``start_year``/``end_year``.
+
+    The range is answered by ``stats_plot`` from the yearly partial
+    aggregates when the entity has them; otherwise the full plot is computed
+    and the points outside the range are dropped.
+    """
+
+    def decorator(method: Callable) -> Callable:
+        @wraps(method)
+        def wrapper(self, idx, *args, start_year=None, end_year=None, **kwargs):
+            start_year, end_year = parse_year(start_year), parse_year(end_year)
+            if start_year is None and end_year is None:
+                return method(self, idx, *args, **kwargs)
+            result = stats_plot(idx, start_year, end_year)
+            if result is not None:
+                return {"plot": result or None}
+            response = method(self, idx, *args, **kwargs)
+            if not response or not response.get("plot"):
+                return response
+            plot = [
+                point
+                for point in response["plot"]
+                if (start_year is None or point["x"] >= start_year)
+                and (end_year is None or point["x"] <= end_year)
+            ]
+            return {**response, "plot": plot or None}
+
+        wrapper.year_range = True
+        return wrapper
+
+    return decorator
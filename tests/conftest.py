@@ -0,0 +1,38 @@
+import importlib
+import os
+import sys
+from pathlib import Path
+from types import ModuleType
+
+import pytest
+
+# The application imports its modules relative to the app directory
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+# Settings required to import the application; no test connects to MongoDB
+for key, value in {
+    "MONGO_SERVER": "localhost",
+    "MONGO_INITDB_ROOT_USERNAME": "test",
+    "MONGO_INITDB_ROOT_PASSWORD": "test",
+    "MONGO_INITDB_DATABASE": "colav",
+    "MONGO_IMPACTU_DB": "impactu",
+}.items():
+    os.environ.setdefault(key, value)
+
+
+@pytest.fixture(scope="session")
+def work_repository() -> ModuleType:
+    """
+    ``infraestructure.mongo.repositories.work``. Where the odmantic models
+    can not be built (pydantic 2.6 fails on their unions under Python 3.11)
+    they are replaced by placeholders, which these tests never query.
+    """
+    for name, model in [("work", "Work"), ("person", "Person")]:
+        module = f"infraestructure.mongo.models.{name}"
+        try:
+            importlib.import_module(module)
+        except TypeError:
+            placeholder = ModuleType(module)
+            setattr(placeholder, model, type(model, (), {}))
+            sys.modules[module] = placeholder
+    return importlib.import_module("infraestructure.mongo.repositories.work")
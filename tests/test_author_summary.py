@@ -0,0 +1,65 @@
+import pytest
+from bson import ObjectId
+
+
+class FakeCollection:
+    def __init__(self, result):
+        self.result = result
+        self.pipelines = []
+
+    def aggregate(self, pipeline):
+        self.pipelines.append(pipeline)
+        return iter([self.result])
+
+
+@pytest.fixture
+def work(work_repository):
+    return work_repository
+
+
+@pytest.fixture
+def works(monkeypatch, work):
+    collection = FakeCollection(
+        {
+            "products": [{"total": 3}],
+            "citations": [{"source": "openalex", "count": 5}],
+            "years": [{"start_year": 2001, "end_year": 2020}],
+        }
+    )
+    monkeypatch.setattr(work, "get_collection", lambda model, profile: collection)
+    work.author_summaries.clear()
+    yield collection
+    work.author_summaries.clear()
+
+
+def test_summary_of_one_facet(work, works):
+    author_id = ObjectId()
+    assert work.WorkRepository.get_author_summary(author_id=str(author_id)) == {
+        "products_count": 3,
+        "citations_count": [{"source": "openalex", "count": 5}],
+        "start_year": 2001,
+        "end_year": 2020,
+    }
+    (pipeline,) = works.pipelines
+    assert pipeline[0] == {"$match": {"authors.id": author_id}}
+    assert set(pipeline[1]["$facet"]) == {"products", "citations", "years"}
+
+
+def test_summary_is_cached_per_author_and_range(work, works):
+    author_id = str(ObjectId())
+    work.WorkRepository.get_author_summary(author_id=author_id)
+    work.WorkRepository.get_author_summary(author_id=author_id)
+    assert len(works.pipelines) == 1
+    work.WorkRepository.get_author_summary(author_id=author_id, start_year=2010)
+    assert len(works.pipelines) == 2
+    assert works.pipelines[1][0]["$match"]["year_published"] == {"$gte": 2010}
+
+
+def test_summary_of_an_author_without_works(work, works):
+    works.result = {"products": [], "citations": [], "years": []}
+    assert work.WorkRepository.get_author_summary(author_id=str(ObjectId())) == {
+        "products_count": 0,
+        "citations_count": [],
+        "start_year": None,
+        "end_year": None,
+    }
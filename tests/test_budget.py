@@ -0,0 +1,93 @@
+from time import sleep
+
+import pytest
+from pymongo.errors import ExecutionTimeout
+
+from core.budget import (
+    PARTIAL_PLOT,
+    last_results,
+    remaining_ms,
+    run_with_budget,
+    time_budget,
+    without_budget,
+)
+from core.exceptions import BudgetExceeded
+
+
+@pytest.fixture(autouse=True)
+def clear_last_results():
+    last_results.clear()
+    yield
+    last_results.clear()
+
+
+def exceed_budget():
+    raise BudgetExceeded()
+
+
+def test_returns_and_stores_the_result():
+    assert run_with_budget("key", lambda: {"plot": [1]}, budget_ms=1000) == {
+        "plot": [1]
+    }
+    assert last_results.get("key") == {"plot": [1]}
+
+
+def test_falls_back_to_partial_plot_without_a_previous_result():
+    assert run_with_budget("key", exceed_budget, budget_ms=1000) == PARTIAL_PLOT
+
+
+def test_falls_back_to_the_given_value():
+    assert run_with_budget("key", exceed_budget, budget_ms=1000, fallback=None) is None
+
+
+def test_serves_the_last_result_flagged_stale():
+    run_with_budget("key", lambda: {"plot": [1]}, budget_ms=1000)
+    assert run_with_budget("key", exceed_budget, budget_ms=1000) == {
+        "plot": [1],
+        "stale": True,
+    }
+
+
+def test_serves_the_last_non_dict_result_as_is():
+    run_with_budget("key", lambda: [1, 2], budget_ms=1000)
+    assert run_with_budget("key", exceed_budget, budget_ms=1000) == [1, 2]
+
+
+def test_falls_back_on_mongo_timeouts():
+    def timeout():
+        raise ExecutionTimeout("operation exceeded time limit")
+
+    assert run_with_budget("key", timeout, budget_ms=1000) == PARTIAL_PLOT
+
+
+def test_does_not_store_none():
+    run_with_budget("key", lambda: None, budget_ms=1000)
+    assert "key" not in last_results
+
+
+def test_lets_other_errors_through():
+    def fail():
+        raise ValueError()
+
+    with pytest.raises(ValueError):
+        run_with_budget("key", fail, budget_ms=1000)
+
+
+def test_remaining_ms_raises_once_the_deadline_passes():
+    with time_budget(10):
+        sleep(0.02)
+        with pytest.raises(BudgetExceeded):
+            remaining_ms()
+
+
+def test_nested_budgets_never_extend_the_deadline():
+    with time_budget(100):
+        with time_budget(10000):
+            assert remaining_ms() <= 100
+
+
+def test_without_budget_lifts_the_deadline():
+    with time_budget(100):
+        with without_budget():
+            assert remaining_ms() is None
+        assert remaining_ms() is not None
@@ -0,0 +1,143 @@
+from bson import ObjectId
+
+from core.config import settings
+from infraestructure.mongo.repositories.coauthorship import (
+    CoauthorshipNetworkRepository,
+)
+
+
+class FakeCollection:
+    """Records the pipelines it is given and answers with ``results``."""
+
+    def __init__(self, results):
+        self.results = results
+        self.pipelines = []
+
+    def aggregate(self, pipeline):
+        self.pipelines.append(pipeline)
+        return iter(self.results)
+
+
+def test_clamp():
+    clamp = CoauthorshipNetworkRepository.clamp
+    assert clamp(None) == settings.COAUTHORSHIP_NETWORK_SIZE
+    assert clamp("many") == settings.COAUTHORSHIP_NETWORK_SIZE
+    assert clamp("10") == 10
+    assert clamp(0) == 1
+    assert clamp(10**6) == settings.COAUTHORSHIP_NETWORK_MAX_SIZE
+
+
+NETWORK = {
+    "nodes": [
+        {"id": "a", "degree": 1},
+        {"id": "b", "degree": 3},
+        {"id": "c", "degree": 2},
+        {"id": "d"},
+    ],
+    "edges": [
+        {"source": "a", "target": "b"},
+        {"source": "b", "target": "c"},
+        {"source": "c", "target": "d"},
+        {"source": "b", "target": "d"},
+        {"source": "b", "target": "x"},
+    ],
+}
+
+
+def brute_force_top_k(network, k):
+    nodes = sorted(network["nodes"], key=lambda node: -node.get("degree", 0))[:k]
+    ids = {node["id"] for node in nodes}
+    edges = [
+        edge
+        for edge in network["edges"]
+        if edge["source"] in ids and edge["target"] in ids
+    ]
+    return nodes, edges
+
+
+def test_rank_orders_the_edges_by_their_lowest_ranked_end():
+    ranked = CoauthorshipNetworkRepository.rank(NETWORK)
+    assert [node["id"] for node in ranked["nodes"]] == ["b", "c", "a", "d"]
+    assert ranked["edges"] == [
+        {"source": "b", "target": "c"},
+        {"source": "a", "target": "b"},
+        {"source": "c", "target": "d"},
+        {"source": "b", "target": "d"},
+    ]
+    assert ranked["edge_counts"] == [0, 1, 2, 4]
+
+
+def test_top_k_matches_the_subgraph_of_the_k_highest_degree_nodes():
+    ranked = CoauthorshipNetworkRepository.rank(NETWORK)
+    for k in range(1, 7):
+        top = CoauthorshipNetworkRepository.top_k(ranked, k)
+        nodes, edges = brute_force_top_k(NETWORK, k)
+        assert top["nodes"] == nodes
+        assert sorted(map(str, top["edges"])) == sorted(map(str, edges))
+
+
+def test_top_k_expression_slices_the_ranked_network():
+    assert CoauthorshipNetworkRepository.top_k_expression(7) == {
+        "nodes": {"$slice": ["$coauthorship_network_ranked.nodes", 7]},
+        "edges": {
+            "$slice": [
+                "$coauthorship_network_ranked.edges",
+                {
+                    "$ifNull": [
+                        {
+                            "$arrayElemAt": [
+                                "$coauthorship_network_ranked.edge_counts",
+                                6,
+                            ]
+                        },
+                        {"$size": "$coauthorship_network_ranked.edges"},
+                    ]
+                },
+            ]
+        },
+    }
+
+
+def test_get_top_network_reads_the_ranked_network_inside_the_aggregation():
+    idx = ObjectId()
+    network = {"nodes": [{"id": 1, "degree": 2}], "edges": []}
+    collection = FakeCollection([{"ranked": True, "network": network}])
+    result = CoauthorshipNetworkRepository.get_top_network(collection, str(idx), 7)
+    assert result == network
+    match, project = collection.pipelines[0]
+    assert match == {"$match": {"_id": idx, "coauthorship_network": {"$exists": 1}}}
+    ranked = {"$gt": ["$coauthorship_network_ranked", None]}
+    assert project == {
+        "$project": {
+            "_id": 0,
+            "ranked": ranked,
+            "network": {
+                "$cond": [
+                    ranked,
+                    CoauthorshipNetworkRepository.top_k_expression(7),
+                    "$coauthorship_network",
+                ]
+            },
+        }
+    }
+
+
+def test_get_top_network_ranks_the_networks_the_job_has_not_ranked():
+    collection = FakeCollection([{"ranked": False, "network": NETWORK}])
+    result = CoauthorshipNetworkRepository.get_top_network(
+        collection, str(ObjectId()), 2
+    )
+    assert result == {
+        "nodes": [{"id": "b", "degree": 3}, {"id": "c", "degree": 2}],
+        "edges": [{"source": "b", "target": "c"}],
+    }
+
+
+def test_get_top_network_is_none_without_nodes():
+    idx = str(ObjectId())
+    missing = FakeCollection([])
+    assert CoauthorshipNetworkRepository.get_top_network(missing, idx) is None
+    empty = FakeCollection([{"ranked": True, "network": {"nodes": [], "edges": []}}])
+    assert CoauthorshipNetworkRepository.get_top_network(empty, idx) is None
+    unranked = FakeCollection([{"ranked": False, "network": None}])
+    assert CoauthorshipNetworkRepository.get_top_network(unranked, idx) is None
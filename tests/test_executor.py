@@ -0,0 +1,40 @@
+from time import monotonic, sleep
+
+import pytest
+
+from core.budget import time_budget
+from core.exceptions import BudgetExceeded
+from core.executor import ChartExecutor
+
+
+@pytest.fixture
+def charts():
+    charts = ChartExecutor(["pooled"], workers=1)
+    yield charts
+    charts.shutdown()
+
+
+def test_other_plots_run_inline(charts):
+    assert charts.run("inline", lambda values: sum(values), iter([1, 2])) == 3
+    assert charts._pool is None
+
+
+def test_pooled_plots_run_in_the_pool(charts):
+    assert charts.run("pooled", sorted, iter([3, 1, 2])) == [1, 2, 3]
+
+
+def test_charts_held_by_overrunning_plots_are_rejected(charts):
+    charts.run("pooled", abs, -1)  # start the pool
+    with time_budget(100):
+        with pytest.raises(BudgetExceeded):
+            charts.run("pooled", sleep, 1)
+    assert len(charts._overrunning) == 1
+    with pytest.raises(BudgetExceeded):
+        charts.run("pooled", abs, -2)
+    (future,) = charts._overrunning
+    future.result(5)
+    deadline = monotonic() + 5
+    while charts._overrunning and monotonic() < deadline:
+        sleep(0.01)  # the done callbacks run after the result is set
+    assert charts._overrunning == set()
+    assert charts.run("pooled", abs, -3) == 3
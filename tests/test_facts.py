@@ -0,0 +1,60 @@
+import numpy as np
+from bson import ObjectId
+
+from infraestructure.mongo.repositories.facts import WorkFactTable
+from utils.bars import ProductsByYearByPublisher
+
+ELSEVIER, SPRINGER, UNKNOWN = ObjectId(), ObjectId(), ObjectId()
+SOURCES = [
+    {"_id": ELSEVIER, "publisher": {"name": "Elsevier"}},
+    {"_id": SPRINGER, "publisher": {"name": "Springer"}},
+    {"_id": UNKNOWN, "publisher": None},
+]
+WORKS = [
+    {"year_published": 2020, "source": {"id": ELSEVIER}},
+    {"year_published": 2020, "source": {"id": SPRINGER}},
+    {"year_published": 2021, "source": {"id": ELSEVIER}},
+    {"year_published": None, "source": {"id": SPRINGER}},
+    {"year_published": None, "source": {"id": SPRINGER}},
+    {"source": {"id": SPRINGER}},
+    {"year_published": 2021, "source": {"id": UNKNOWN}},
+    {"year_published": 2022},
+]
+
+
+class FakeDatabase(dict):
+    """Collections answering every ``find`` with their documents."""
+
+    def __getitem__(self, name):
+        documents = self.get(name, [])
+        return type("Collection", (), {"find": lambda self, *args: documents})()
+
+
+def reducer_output():
+    """
+    Chart of the Mongo path: the works with a year and a known publisher,
+    as ``work_plots`` collects them, through the reducer.
+    """
+    sources = {source["_id"]: source for source in SOURCES}
+    reducer = ProductsByYearByPublisher()
+    reducer.init()
+    for work in WORKS:
+        source = sources.get(work.get("source", {}).get("id"), {})
+        if work.get("year_published") is None or not source.get("publisher"):
+            continue
+        reducer.update(
+            {"year_published": work["year_published"], "publisher": source["publisher"]}
+        )
+    return reducer.finalize()
+
+
+def points(chart):
+    return sorted((point["x"], point["type"], point["y"]) for point in chart)
+
+
+def test_products_by_year_by_publisher_matches_the_reducer():
+    facts = WorkFactTable.build(FakeDatabase(sources=SOURCES, works=WORKS))
+    rows = np.arange(len(facts), dtype=np.int32)
+    result = facts.products_by_year_by_publisher(rows)
+    assert points(result) == points(reducer_output())
+    assert {point["x"] for point in result} == {2020, 2021}
@@ -0,0 +1,137 @@
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+
+from infraestructure.mongo.repositories.lookups import (
+    GroupCategories,
+    RankingIntervals,
+    ScimagoQuartiles,
+)
+
+SOURCE = ObjectId()
+
+
+class FakeDatabase(dict):
+    """Collections answering every ``find`` with their documents."""
+
+    def __getitem__(self, name):
+        documents = self.get(name, [])
+        return type("Collection", (), {"find": lambda self, *args: documents})()
+
+
+def build(cls: type[RankingIntervals], documents: list[dict]) -> RankingIntervals:
+    lookup = cls.__new__(cls)
+    table = lookup.load(FakeDatabase({cls.collection: documents}))
+    lookup.get = lambda key, default=None: table.get(key, default)
+    return lookup
+
+
+def ranking(rank, from_date, to_date, source="scimago Best Quartile"):
+    return {"source": source, "rank": rank, "from_date": from_date, "to_date": to_date}
+
+
+@pytest.fixture
+def quartiles():
+    return build(
+        ScimagoQuartiles,
+        [
+            {
+                "_id": SOURCE,
+                "ranking": [
+                    ranking("Q3", 200, 300),
+                    ranking("Q1", 0, 100),
+                    ranking("Q2", 100, 200),
+                    ranking("A1", 0, 300, source="scienti"),
+                ],
+            }
+        ],
+    )
+
+
+@pytest.mark.parametrize(
+    "date, rank",
+    [
+        (-1, None),
+        (0, "Q1"),
+        (99, "Q1"),
+        (100, "Q2"),
+        (199.5, "Q2"),
+        (200, "Q3"),
+        (299, "Q3"),
+        (300, None),
+    ],
+)
+def test_rank_at_includes_the_start_and_excludes_the_end(quartiles, date, rank):
+    assert quartiles.rank_at(SOURCE, date) == rank
+
+
+def test_rank_at_unknown_documents(quartiles):
+    assert quartiles.rank_at(ObjectId(), 50) is None
+
+
+def test_overlapping_intervals_take_the_first_of_the_list():
+    lookup = build(
+        ScimagoQuartiles,
+        [
+            {
+                "_id": SOURCE,
+                "ranking": [
+                    ranking("long", 0, 1000),
+                    ranking("short", 10, 20),
+                    ranking("later", 500, 2000),
+                ],
+            }
+        ],
+    )
+    assert lookup.rank_at(SOURCE, 15) == "long"
+    assert lookup.rank_at(SOURCE, 600) == "long"
+    assert lookup.rank_at(SOURCE, 1000) == "later"
+    assert lookup.rank_at(SOURCE, 2000) is None
+
+
+def test_a_later_interval_wins_when_the_first_has_ended():
+    lookup = build(
+        ScimagoQuartiles,
+        [
+            {
+                "_id": SOURCE,
+                "ranking": [ranking("short", 10, 20), ranking("long", 0, 100)],
+            }
+        ],
+    )
+    assert lookup.rank_at(SOURCE, 15) == "short"
+    assert lookup.rank_at(SOURCE, 50) == "long"
+
+
+def test_quartiles_of_works(quartiles):
+    works = [
+        {"source": {"id": SOURCE}, "date_published": 150},
+        {"source": {"id": SOURCE}, "date_published": 500},
+        {"source": {"id": SOURCE}},
+        {"date_published": 150},
+    ]
+    assert list(quartiles.quartiles(works)) == ["Q2"]
+
+
+def test_group_category_at_the_start_of_the_year():
+    group = ObjectId()
+    start_2020 = datetime(2020, 1, 1).timestamp()
+    start_2021 = datetime(2021, 1, 1).timestamp()
+    categories = build(
+        GroupCategories,
+        [
+            {
+                "_id": group,
+                "ranking": [
+                    ranking("A", start_2020, start_2021, source="scienti"),
+                    ranking("", start_2021, start_2021 + 10**8, source="scienti"),
+                    ranking("B", 0, start_2021 + 10**8, source="scienti"),
+                ],
+            }
+        ],
+    )
+    assert categories.category(group, 2020) == "A"
+    assert categories.category(group, 2019) == "B"
+    assert categories.category(group, 2021) is None
+    assert categories.category(group, None) is None
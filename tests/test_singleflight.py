@@ -0,0 +1,172 @@
+from threading import Event, Semaphore, Thread
+
+import pytest
+from pymongo.errors import PyMongoError
+
+from core.config import settings
+from core.singleflight import SingleFlight
+
+
+def count_waits(flight: SingleFlight) -> Semaphore:
+    """Semaphore released every time a follower starts waiting on ``flight``."""
+    waiting = Semaphore(0)
+
+    def wait(call):
+        waiting.release()
+        return SingleFlight._wait(call)
+
+    flight._wait = wait
+    return waiting
+
+
+def test_concurrent_calls_run_once():
+    flight = SingleFlight()
+    started, release = Event(), Event()
+    waiting = count_waits(flight)
+    calls, results = [], []
+
+    def compute():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return {"plot": [1]}
+
+    def call():
+        results.append(flight.do("key", compute))
+
+    threads = [Thread(target=call) for _ in range(5)]
+    threads[0].start()
+    started.wait(5)
+    for thread in threads[1:]:
+        thread.start()
+    for _ in threads[1:]:
+        assert waiting.acquire(timeout=5)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert len(calls) == 1
+    assert results == [{"plot": [1]}] * 5
+
+
+def test_followers_get_the_error_of_the_leader():
+    flight = SingleFlight()
+    started, release = Event(), Event()
+    waiting = count_waits(flight)
+    calls, errors = [], []
+
+    def fail():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        raise ValueError("failed")
+
+    def call():
+        try:
+            flight.do("key", fail)
+        except ValueError as error:
+            errors.append(error)
+
+    threads = [Thread(target=call) for _ in range(4)]
+    threads[0].start()
+    started.wait(5)
+    for thread in threads[1:]:
+        thread.start()
+    for _ in threads[1:]:
+        assert waiting.acquire(timeout=5)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert len(calls) == 1
+    assert len(errors) == 4
+
+
+def test_calls_after_completion_run_again():
+    flight = SingleFlight()
+    calls = []
+    for _ in range(2):
+        flight.do("key", lambda: calls.append(1))
+    assert len(calls) == 2
+    assert flight._calls == {}
+
+
+def test_wrap_keys_on_the_arguments():
+    flight = SingleFlight()
+    calls = []
+
+    @flight.wrap
+    def double(value):
+        calls.append(value)
+        return value * 2
+
+    assert double(2) == 4
+    assert double(3) == 6
+    assert calls == [2, 3]
+
+
+class FakeLocks:
+    """Lock collection of a leader that never meets a concurrent worker."""
+
+    def __init__(self, fail_update=False):
+        self.fail_update = fail_update
+        self.documents = {}
+        self.deleted = []
+
+    def insert_one(self, document):
+        self.documents[document["_id"]] = document
+
+    def update_one(self, query, update):
+        if self.fail_update:
+            raise PyMongoError("document too large")
+        self.documents[query["_id"]].update(update["$set"])
+
+    def delete_one(self, query):
+        self.deleted.append(query["_id"])
+        self.documents.pop(query["_id"], None)
+
+
+@pytest.fixture
+def shared(monkeypatch):
+    monkeypatch.setattr(settings, "SINGLEFLIGHT_SHARED", True)
+
+    def flight_with(locks):
+        flight = SingleFlight()
+        flight._collection = lambda: locks
+        return flight
+
+    return flight_with
+
+
+def test_shared_result_is_stored(shared):
+    locks = FakeLocks()
+    assert shared(locks).do("key", lambda: {"plot": [1]}) == {"plot": [1]}
+    (document,) = locks.documents.values()
+    assert "result" in document
+    assert locks.deleted == []
+
+
+def test_result_is_returned_when_it_can_not_be_stored(shared):
+    locks = FakeLocks(fail_update=True)
+    assert shared(locks).do("key", lambda: {"plot": [1]}) == {"plot": [1]}
+    assert locks.documents == {}
+    assert len(locks.deleted) == 1
+
+
+def test_results_over_the_size_cap_are_not_shared(shared, monkeypatch):
+    monkeypatch.setattr(settings, "SINGLEFLIGHT_MAX_RESULT_BYTES", 16)
+    locks = FakeLocks()
+    assert shared(locks).do("key", lambda: {"plot": list(range(100))}) == {
+        "plot": list(range(100))
+    }
+    assert locks.documents == {}
+    assert len(locks.deleted) == 1
+
+
+def test_lock_is_released_when_the_leader_fails(shared):
+    locks = FakeLocks()
+
+    def fail():
+        raise ValueError()
+
+    with pytest.raises(ValueError):
+        shared(locks).do("key", fail)
+    assert locks.documents == {}
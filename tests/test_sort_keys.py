@@ -0,0 +1,84 @@
+import pytest
+
+from core.config import settings
+from jobs.sort_keys import citations_key, name_key, title_key
+
+
+@pytest.fixture
+def WorkRepository(work_repository):
+    return work_repository.WorkRepository
+
+
+@pytest.fixture
+def sort_keys(monkeypatch):
+    monkeypatch.setattr(settings, "USE_SORT_KEYS", True)
+
+
+def test_citations_key_takes_the_first_scholar_or_openalex_count():
+    assert citations_key(None) == 0
+    assert citations_key([{"source": "scienti", "count": 9}]) == 0
+    assert (
+        citations_key(
+            [
+                {"source": "scienti", "count": 9},
+                {"source": "openalex", "count": 4},
+                {"source": "scholar", "count": 7},
+            ]
+        )
+        == 4
+    )
+    assert citations_key([{"source": "scholar", "count": None}]) == 0
+
+
+def test_name_key_strips_accents_case_and_extra_whitespace():
+    assert name_key(" Universidad  de\nAntioquia ") == "universidad de antioquia"
+    assert name_key("Éditions Législatives") == "editions legislatives"
+
+
+def test_title_key_normalizes_the_first_title():
+    assert title_key(None) == ""
+    titles = [{"title": "  Ánálisis  de\tDatos "}, {"title": "Other"}]
+    assert title_key(titles) == "analisis de datos"
+
+
+@pytest.mark.parametrize(
+    "sort, field, direction",
+    [
+        ("citations", "citations_count.count", 1),
+        ("citations-", "citations_count.count", -1),
+        ("year-", "year_published", -1),
+        ("title", "titles.0.title", 1),
+        ("alphabetical-", "titles.0.title", -1),
+        ("unknown", "titles.0.title", 1),
+    ],
+)
+def test_sort_direction(monkeypatch, WorkRepository, sort, field, direction):
+    monkeypatch.setattr(settings, "USE_SORT_KEYS", False)
+    assert WorkRepository.get_sort_direction(sort)[-1] == {"$sort": {field: direction}}
+
+
+@pytest.mark.parametrize(
+    "sort, field, direction",
+    [
+        ("citations", "sort_keys.citations", 1),
+        ("citations-", "sort_keys.citations", -1),
+        ("year-", "year_published", -1),
+        ("title-", "sort_keys.title", -1),
+        ("alphabetical", "sort_keys.title", 1),
+        ("unknown", "sort_keys.title", 1),
+    ],
+)
+def test_sort_direction_on_sort_keys(WorkRepository, sort_keys, sort, field, direction):
+    assert WorkRepository.get_sort_direction(sort)[-1] == {"$sort": {field: direction}}
+
+
+def test_sort_direction_leaves_out_works_without_the_sorted_value(
+    WorkRepository, sort_keys
+):
+    assert WorkRepository.get_sort_direction("year")[0] == {
+        "$match": {"year_published": {"$ne": None}}
+    }
+    assert WorkRepository.get_sort_direction("citations-")[0] == {
+        "$match": {"citations_count": {"$ne": []}}
+    }
+    assert len(WorkRepository.get_sort_direction("title")) == 1
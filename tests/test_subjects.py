@@ -0,0 +1,51 @@
+from utils.subjects import NO_NAME, SubjectIndex
+
+
+def work(*subjects, source="openalex"):
+    return {
+        "subjects": [
+            {
+                "source": source,
+                "subjects": [
+                    {"level": level, "name": name} if name else {"level": level}
+                    for level, name in subjects
+                ],
+            }
+        ]
+    }
+
+
+def test_count_by_level_in_one_pass():
+    index = SubjectIndex()
+    works = iter(
+        [
+            work((0, "Biology"), (1, "Genetics")),
+            work((0, "Biology"), (1, "Ecology")),
+            work((0, "Physics")),
+            work((0, "Physics"), source="scienti"),
+            {"subjects": None},
+            {},
+        ]
+    )
+    assert index.count_by_level(works) == {
+        0: {"Biology": 2, "Physics": 1},
+        1: {"Genetics": 1, "Ecology": 1},
+    }
+
+
+def test_subjects_without_a_name():
+    assert SubjectIndex().count_by_level([work((2, None))]) == {2: {NO_NAME: 1}}
+
+
+def test_count_by_level_without_subjects():
+    assert SubjectIndex().count_by_level([]) == {}
+
+
+def test_codes_are_shared_and_only_added():
+    index = SubjectIndex()
+    first = index.code(0, "Biology")
+    assert index.code(1, "Biology") != first
+    assert index.code(0, "Biology") == first
+    index.count_by_level([work((0, "Chemistry"))])
+    assert len(index) == 3
+    assert index.count_by_level([work((0, "Biology"))]) == {0: {"Biology": 1}}
@@ -0,0 +1,85 @@
+from threading import Event
+from time import monotonic
+
+import pytest
+
+from core.swr import FrequencyCounter, StaleWhileRevalidate
+
+
+@pytest.fixture
+def cache():
+    cache = StaleWhileRevalidate(
+        maxsize=16, fresh_s=60, stale_s=600, workers=1, max_pending=1, hot_hits=2
+    )
+    yield cache
+    cache._pool.shutdown(wait=True)
+
+
+def age(cache, key, seconds=120):
+    computed_at, value = cache.entries.get(key)
+    cache.entries.set(key, (computed_at - seconds, value))
+
+
+class Counter:
+    def __init__(self):
+        self.calls = 0
+        self.done = Event()
+
+    def __call__(self):
+        self.calls += 1
+        self.done.set()
+        return {"plot": [self.calls]}
+
+
+def test_fresh_entries_are_served_from_the_cache(cache):
+    compute = Counter()
+    assert cache.get("key", compute) == {"plot": [1]}
+    assert cache.get("key", compute) == {"plot": [1]}
+    assert compute.calls == 1
+
+
+def test_stale_entries_of_cold_keys_are_recomputed_by_the_caller(cache):
+    compute = Counter()
+    cache.get("key", compute)
+    age(cache, "key")
+    cache.frequency = FrequencyCounter(sample_size=100)
+    assert cache.get("key", compute) == {"plot": [2]}
+
+
+def test_stale_entries_of_hot_keys_are_served_and_refreshed(cache):
+    compute = Counter()
+    cache.get("key", compute)
+    age(cache, "key")
+    compute.done.clear()
+    assert cache.get("key", compute) == {"plot": [1]}
+    assert compute.done.wait(5)
+    cache._pool.submit(lambda: None).result(5)
+    computed_at, value = cache.entries.get("key")
+    assert value == {"plot": [2]}
+    assert monotonic() - computed_at < 60
+    assert cache._pending == set()
+
+
+@pytest.mark.parametrize(
+    "value", [None, {"plot": None, "partial": True}, {"plot": [1], "stale": True}]
+)
+def test_partial_and_stale_results_are_not_cached(cache, value):
+    cache.get("key", lambda: value)
+    assert cache.entries.get("key") is None
+
+
+def test_refreshes_are_bounded(cache):
+    release = Event()
+    assert cache.schedule("a", release.wait, 5)
+    assert not cache.schedule("a", release.wait, 5)
+    assert not cache.schedule("b", release.wait, 5)
+    release.set()
+
+
+def test_frequency_counts_fade_out():
+    frequency = FrequencyCounter(sample_size=4)
+    for key in ["a", "a", "a", "b"]:
+        frequency.add(key)
+    assert frequency.get("a") == 1
+    assert frequency.get("b") == 0
+    assert frequency.most_common(1) == [("a", 1)]